@@ -1,20 +1,24 @@
 from pathlib import Path
-from src.read_write import load_yaml, load_experiments, \
-    load_statistics_to_dataframe
+from src.lazy import lazy_import
+from src.config import load_config
+from src.session import DatasetSession
 from posixpath import split
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.transforms as mtransforms
-plt.rc('font', **{ 'family': 'serif', 'size': 12, })
-plt.rc('text', **{ 'usetex': True, 'latex.preamble': r""" \usepackage{physics} \usepackage{siunitx} """ })
-import seaborn as sns
-import pandas as pd
 import click
 
 
+def set_plot_style(plt):
+    plt.rc('font', **{ 'family': 'serif', 'size': 12, })
+    plt.rc('text', **{ 'usetex': True, 'latex.preamble': r""" \usepackage{physics} \usepackage{siunitx} """ })
+
+
+plt = lazy_import('matplotlib.pyplot', on_import=set_plot_style)
+mtransforms = lazy_import('matplotlib.transforms')
+sns = lazy_import('seaborn')
+
 THESIS_DIR = Path(__file__).resolve().parent.parent.parent
 FIGS_DIR = THESIS_DIR / 'results/figs'
-CONFIG = load_yaml(THESIS_DIR / 'scripts', '/config_mt.yaml')
+CONFIG_FILE = 'config_mt.yaml'
 
 
 @click.command()
@@ -32,47 +36,39 @@ CONFIG = load_yaml(THESIS_DIR / 'scripts', '/config_mt.yaml')
               help='Print summary statistics of the dataframe to the terminal')
 def main(show_plots, dimension, tolerance, highest_fidelity,
          print_non_converged, print_summary):
-    tolerances = np.array(CONFIG['tolerances'])
-    if tolerance not in tolerances:
-        raise Exception(f"Invalid tolerance level, chose from {tolerances}")
+    make_figure(DatasetSession(), show_plots, dimension, tolerance,
+                highest_fidelity, print_non_converged, print_summary)
+
+
+def make_figure(session, show_plots=False, dimension='2D', tolerance=0.23,
+                highest_fidelity='uhf', print_non_converged=False,
+                print_summary=False):
+    """Plots the boxplots of the multi-task experiments with the run summary
+    of a DatasetSession, see main for the arguments."""
     #config = CONFIG[f'TL_experiment_plots_{dimension}']
-    config = CONFIG[f'MT_experiment_plots_{dimension}']
+    config = load_config(CONFIG_FILE).experiment_plots('MT', dimension)
 
-    tl_experiments = [THESIS_DIR / 'data/multi_task_learning' / 'processed' /
-                      exp for exp in config.keys()]
+    tl_experiments = list(config.keys())
 
     # Don't load baseline experiments multiple times
-    bl_experiment_keys = list(set([config[exp][0] for exp in config]))
-    bl_experiments = [THESIS_DIR / 'data/multi_task_learning' / 'processed' /
-                      exp for exp in bl_experiment_keys]
-    tl_exp_data = load_experiments(tl_experiments)
-    bl_exp_data = load_experiments(bl_experiments)
-    df = load_statistics_to_dataframe(bl_exp_data, tl_exp_data, num_exp=5)
+    bl_experiments = list(set([config[exp][0] for exp in config]))
+    summary = session.get_summary('multi_task_learning')
+    df = summary.to_dataframe([*bl_experiments, *tl_experiments], tolerance,
+                              num_runs=5)
 #    df.to_csv('mt_test.csv')
     plot_convergence_as_boxplot(
-        df, tolerance, dimension, highest_fidelity, show_plots,
-        print_non_converged, print_summary)
+        df, dimension, highest_fidelity, show_plots, print_non_converged,
+        print_summary)
 
 
 def plot_convergence_as_boxplot(
-        df, tolerance, dimension, highest_fidelity, show_plots,
-        print_not_converged, print_summary):
-    tolerance_idx = np.argwhere(
-        tolerance == np.array(np.array(CONFIG['tolerances']))).squeeze()
-
-    plot_df = df[['name', 'iterations_to_gmp_convergence',
-                  'totaltime_to_gmp_convergence',
-                  'highest_fidelity_iterations_to_gmp_convergence']]
-
-    plot_df['iterations'] = plot_df[
-        'iterations_to_gmp_convergence'].map(lambda x: x[tolerance_idx])
-    plot_df['BO iter.'] = plot_df[
-        'highest_fidelity_iterations_to_gmp_convergence'].map(
-            lambda x: x[tolerance_idx])
-    plot_df
-    plot_df['CPU t [h]'] = plot_df[
-        'totaltime_to_gmp_convergence'].map(
-            lambda x: chose_value_with_tolerance(x, tolerance_idx))
+        df, dimension, highest_fidelity, show_plots, print_not_converged,
+        print_summary):
+    plot_df = df[['name', 'iterations', 'totaltime',
+                  'highest_fidelity_iterations']]
+
+    plot_df['BO iter.'] = plot_df['highest_fidelity_iterations']
+    plot_df['CPU t [h]'] = plot_df['totaltime'] / 3600
 
     if highest_fidelity == 'uhf':
         plot_df = plot_df[plot_df['name'].str.contains('UHF') == True]
@@ -128,14 +124,8 @@ def plot_convergence_as_boxplot(
     else:
         name = f'MT_convergence_boxplot_{dimension}_{highest_fidelity}'
         plt.savefig(FIGS_DIR / f'{name}.pdf')
+    plt.close()
 
 
-def chose_value_with_tolerance(x, tolerance_idx, time_in_h=True):
-    if x[tolerance_idx] is None:
-        return None
-    else:
-        x_tol = x[tolerance_idx] / 3600 if time_in_h else x[tolerance_idx]
-        return x_tol
-
 if __name__ == '__main__':
     main()
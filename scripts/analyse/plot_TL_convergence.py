@@ -1,15 +1,18 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import argparse
-from scipy import stats
 from pathlib import Path
 
-from src.read_write import load_yaml, load_json
+from src.lazy import lazy_import
+from src.config import load_config
+from src.session import DatasetSession
+
+plt = lazy_import('matplotlib.pyplot')
+stats = lazy_import('scipy.stats')
 
 
 THESIS_DIR = Path(__file__).resolve().parent.parent.parent
 FIGS_DIR = THESIS_DIR / 'results/figs'
-CONFIG = load_yaml(THESIS_DIR / 'scripts', '/config_tl.yaml')
+CONFIG_FILE = 'config_tl.yaml'
 #print(CONFIG["tolerances"])
 #TOL_IDX = 3         # 5 : 0.1 kcal/mol, 3 : 0.5 kcal/mol
 BLUE, RED = '#000082', '#FE0000'
@@ -35,19 +38,23 @@ SMALL_SIZE, MEDIUM_SIZE, LARGE_SIZE = 12, 20, 25
 
 
 def main(args):
-    tolerance = args.tolerance
-    tolerances = np.array(CONFIG['tolerances'])
-    if tolerance not in tolerances:
-        raise Exception(f"Invalid tolerance level, chose from {tolerances}")
-    TOL_IDX = np.argwhere(args.tolerance == tolerances).squeeze()
-    config = CONFIG[f'TL_experiment_plots_{args.dimension}']
-    figname = args.dimension + '_tol_' + str(tolerance) + '_TL.png'
-    tl_experiments = [THESIS_DIR / 'data/transfer_learning' / 'processed' /
-                      exp for exp in config.keys()]
-    bl_experiments = [THESIS_DIR / 'data/transfer_learning' / 'processed' /
-                            config[exp][0] for exp in config]
-    tl_exp_data = load_experiments(tl_experiments)
-    bl_exp_data = load_experiments(bl_experiments)
+    make_figure(DatasetSession(), args.show_plots, args.dimension,
+                args.tolerance)
+
+
+def make_figure(session, show_plots=False, dimension='2D', tolerance=0.1):
+    """Plots the convergence of the transfer learning experiments with the
+    runs of a DatasetSession, see the command line arguments."""
+    tl_config = load_config(CONFIG_FILE)
+    TOL_IDX = tl_config.tolerance_index(tolerance)
+    config = tl_config.experiment_plots('TL', dimension)
+    figname = dimension + '_tol_' + str(tolerance) + '_TL.png'
+    tl_experiments = list(config.keys())
+    bl_experiments = [config[exp][0] for exp in config]
+    tl_exp_data = session.load_experiments('transfer_learning',
+                                           tl_experiments)
+    bl_exp_data = session.load_experiments('transfer_learning',
+                                           bl_experiments)
     data_dict = {
         'bl': load_values_to_dict(bl_exp_data),
         'tl': load_values_to_dict(tl_exp_data)
@@ -55,22 +62,12 @@ def main(args):
     # plot_TL_convergence(figname, data_dict, tol_idx=TOL_IDX,
     #                     show_plots=args.show_plots)
     plot_tl_convergence(figname, bl_exp_data, tl_exp_data,
-                        tol_idx=TOL_IDX, show_plots=args.show_plots)
+                        tol_idx=TOL_IDX, show_plots=show_plots,
+                        dimension=dimension, tolerance=tolerance)
     # plot_tl_convergence_abstract(figname, bl_exp_data, tl_exp_data,
     #                     tol_idx=TOL_IDX, show_plots=args.show_plots)
 
 
-def load_experiments(experiments):
-    experiments_data = []
-    for experiment in experiments:
-        exp_data = []
-        for exp in experiment.iterdir():
-            if exp.is_file():
-                exp_data.append(load_json('', exp))
-        experiments_data.append(exp_data)
-    return experiments_data
-
-
 def load_values_to_dict(data, tol_idx=5):
     # dict (key: bl/tl) -> dict (key: values,times) -> list -> dict (key: initpts[1])
     # Example for baseline strucutres:
@@ -98,7 +95,8 @@ def load_values_to_dict(data, tol_idx=5):
 
 
 def plot_tl_convergence(figname, baseline_experiments, tl_experiments,
-                        tol_idx=5, show_plots=False):
+                        tol_idx=5, show_plots=False, dimension='2D',
+                        tolerance=0.1):
     N = len(tl_experiments)
     fig, axs = plt.subplots(2, 3, figsize=(9, 6))
 
@@ -118,7 +116,7 @@ def plot_tl_convergence(figname, baseline_experiments, tl_experiments,
             if data_idx > 10:
                 break
             name = tl['name']
-            idx = PLOT_IDX_DICT[args.dimension][name]
+            idx = PLOT_IDX_DICT[dimension][name]
             bl_initpts, tl_initpts = bl['initpts'][1], tl['initpts'][1]
             bl_conv, tl_conv = bl['iterations_to_gmp_convergence'][tol_idx], \
                 tl['iterations_to_gmp_convergence'][tol_idx]
@@ -155,7 +153,7 @@ def plot_tl_convergence(figname, baseline_experiments, tl_experiments,
         axs[1, idx].scatter(tl_initpts, np.mean(tl_times), **MEANS_DICT)
         axs[1, idx].text(0.78*tl_initpts, 1.04*np.mean(tl_times),
                          f'{round(np.mean(tl_times), 2)}', c='r')
-        setup = TITLE_DICT[args.dimension][name]
+        setup = TITLE_DICT[dimension][name]
         if setup not in linear_reg_data:
             linear_reg_data[setup] = np.array([]).reshape(0, 2)
 
@@ -165,7 +163,7 @@ def plot_tl_convergence(figname, baseline_experiments, tl_experiments,
         linear_reg_data[setup] = np.vstack((linear_reg_data[setup], tmp))
         axs[0, idx].set_ylim([0, max_iterations+0.1*max_iterations])
         axs[1, idx].set_ylim([0, max_time+0.1*max_time])
-        axs[0, idx].set_title(f'{TITLE_DICT[args.dimension][name]}',
+        axs[0, idx].set_title(f'{TITLE_DICT[dimension][name]}',
                     fontsize=SMALL_SIZE)
         axs[0, idx].set_xticks([])
     for setup_idx, setup in enumerate(linear_reg_data):
@@ -183,7 +181,7 @@ def plot_tl_convergence(figname, baseline_experiments, tl_experiments,
     axs[1,0].set_ylabel('CPU time [h]', fontsize=SMALL_SIZE)
     for ax in axs[1, :]:
         ax.set_xlabel('secondary initpoints', fontsize=SMALL_SIZE)
-    fig.suptitle(f'{args.dimension} TL experiments (tolerance: {args.tolerance} kcal/mol)',
+    fig.suptitle(f'{dimension} TL experiments (tolerance: {tolerance} kcal/mol)',
                  fontsize=MEDIUM_SIZE)
     plt.tight_layout()
     if not show_plots:
@@ -194,7 +192,8 @@ def plot_tl_convergence(figname, baseline_experiments, tl_experiments,
 
 
 def plot_tl_convergence_abstract(figname, baseline_experiments, tl_experiments,
-                                 tol_idx=5, show_plots=False):
+                                 tol_idx=5, show_plots=False,
+                                 dimension='2D', tolerance=0.1):
     N = len(tl_experiments)
     fig, axs = plt.subplots(2, 3, figsize=(9, 6))
 
@@ -214,7 +213,7 @@ def plot_tl_convergence_abstract(figname, baseline_experiments, tl_experiments,
             if data_idx > 10:
                 break
             name = tl['name']
-            idx = PLOT_IDX_DICT[args.dimension][name]
+            idx = PLOT_IDX_DICT[dimension][name]
             bl_initpts, tl_initpts = bl['initpts'][1], tl['initpts'][1]
             bl_conv, tl_conv = bl['iterations_to_gmp_convergence'][tol_idx], \
                 tl['iterations_to_gmp_convergence'][tol_idx]
@@ -258,7 +257,7 @@ def plot_tl_convergence_abstract(figname, baseline_experiments, tl_experiments,
         axs[1, idx].text(0.78*tl_initpts + shift_x,
                          1.25*np.mean(tl_times) + shift_y,
                          f'{round(np.mean(tl_times), 2)}', c=RED)
-        setup = TITLE_DICT[args.dimension][name]
+        setup = TITLE_DICT[dimension][name]
         if setup not in linear_reg_data:
             linear_reg_data[setup] = np.array([]).reshape(0, 2)
 
@@ -268,7 +267,7 @@ def plot_tl_convergence_abstract(figname, baseline_experiments, tl_experiments,
         linear_reg_data[setup] = np.vstack((linear_reg_data[setup], tmp))
         axs[0, idx].set_ylim([0, max_iterations+0.1*max_iterations])
         axs[1, idx].set_ylim([0, max_time+0.1*max_time])
-        axs[0, idx].set_title(f'{TITLE_DICT[args.dimension][name]}',
+        axs[0, idx].set_title(f'{TITLE_DICT[dimension][name]}',
                     fontsize=SMALL_SIZE)
         axs[0, idx].set_xticks([])
         #axs[1, idx].set_title(f'TL: {round(100, 1)} % baseline resources',
@@ -299,7 +298,7 @@ def plot_tl_convergence_abstract(figname, baseline_experiments, tl_experiments,
         axs[tuple_].remove()
     for ax in axs[1, :]:
         ax.set_xlabel('Number of DFT Samples', fontsize=SMALL_SIZE)
-    fig.suptitle(f'{args.dimension} TL experiments (tolerance: {args.tolerance} kcal/mol)',
+    fig.suptitle(f'{dimension} TL experiments (tolerance: {tolerance} kcal/mol)',
                  fontsize=MEDIUM_SIZE)
     plt.tight_layout()
     if not show_plots:
@@ -1,20 +1,23 @@
 from pathlib import Path
-from src.read_write import load_yaml, load_experiments, \
-    load_statistics_to_dataframe
+from src.lazy import lazy_import
+from src.config import load_config
+from src.session import DatasetSession
 from posixpath import split
-import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.transforms as mtransforms
-plt.rc('font', **{ 'family': 'serif', 'size': 12, })
-plt.rc('text', **{ 'usetex': True, 'latex.preamble': r""" \usepackage{physics} \usepackage{siunitx} """ })
-import seaborn as sns
-import pandas as pd
 import click
 
 
+def set_plot_style(plt):
+    plt.rc('font', **{ 'family': 'serif', 'size': 12, })
+    plt.rc('text', **{ 'usetex': True, 'latex.preamble': r""" \usepackage{physics} \usepackage{siunitx} """ })
+
+
+plt = lazy_import('matplotlib.pyplot', on_import=set_plot_style)
+mtransforms = lazy_import('matplotlib.transforms')
+sns = lazy_import('seaborn')
+
 THESIS_DIR = Path(__file__).resolve().parent.parent.parent
 FIGS_DIR = THESIS_DIR / 'results/figs'
-CONFIG = load_yaml(THESIS_DIR / 'scripts', '/config_tl.yaml')
+CONFIG_FILE = 'config_tl.yaml'
 
 
 ax_labels = [['a)', 'b)'], ['c)', 'd)']]
@@ -50,25 +53,26 @@ titles = [r'LF $\rightarrow$ HF', r'LF $\rightarrow$ UHF',
 @click.option('--print_summary', default=False, is_flag=True,
               help='Print summary statistics of the dataframe to the terminal')
 def main(show_plots, dimension, tolerance, print_summary):
-    tolerances = np.array(CONFIG['tolerances'])
-    if tolerance not in tolerances:
-        raise Exception(f"Invalid tolerance level, chose from {tolerances}")
-    config = CONFIG[f'TL_experiment_plots_{dimension}']
-    tl_experiments = [THESIS_DIR / 'data/transfer_learning' / 'processed' /
-                      exp for exp in config.keys()]
-    bl_experiments = [THESIS_DIR / 'data/transfer_learning' / 'processed' /
-                      config[exp][0] for exp in config]
-    tl_exp_data = load_experiments(tl_experiments)
-    bl_exp_data = load_experiments(bl_experiments)
-    df = load_statistics_to_dataframe(bl_exp_data, tl_exp_data, num_exp=5)
-    plot_convergence_as_boxplot(
-        df, tolerance, dimension, show_plots, print_summary)
-
-
-def plot_convergence_as_boxplot(df, tolerance, dimension, show_plots,
-                                print_summary):
-
-    plot_df = create_plot_dataframe(df, tolerance)
+    make_figure(DatasetSession(), show_plots, dimension, tolerance,
+                print_summary)
+
+
+def make_figure(session, show_plots=False, dimension='2D', tolerance=0.23,
+                print_summary=False):
+    """Plots the boxplots of the transfer learning experiments with the run
+    summary of a DatasetSession, see main for the arguments."""
+    config = load_config(CONFIG_FILE).experiment_plots('TL', dimension)
+    tl_experiments = list(config.keys())
+    bl_experiments = [config[exp][0] for exp in config]
+    summary = session.get_summary('transfer_learning')
+    df = summary.to_dataframe([*bl_experiments, *tl_experiments], tolerance,
+                              num_runs=5)
+    plot_convergence_as_boxplot(df, dimension, show_plots, print_summary)
+
+
+def plot_convergence_as_boxplot(df, dimension, show_plots, print_summary):
+
+    plot_df = create_plot_dataframe(df)
     dataframes = sub_dataframes_2D if dimension == '2D' else sub_dataframes_4D
     fig, axs = plt.subplot_mosaic([['a)', 'c)', 'c)'], ['b)', 'd)', 'd)']],
                                    figsize=(6.5, 4.5), constrained_layout=True)
@@ -121,26 +125,17 @@ def plot_convergence_as_boxplot(df, tolerance, dimension, show_plots,
         plt.show()
     else:
         plt.savefig(f'results/figs/transfer_learning_boxplots_{dimension}.pdf')
+    plt.close()
 
 
-def create_plot_dataframe(df, tolerance):
-    tolerance_idx = np.argwhere(
-        tolerance == np.array(np.array(CONFIG['tolerances']))).squeeze()
-    plot_df = df[['name', 'iterations_to_gmp_convergence',
-                  'totaltime_to_gmp_convergence', 'initpts',
-                  'cumulative_num_highest_fidelity_samples']]
-    plot_df['iterations'] = plot_df[
-        'iterations_to_gmp_convergence'].map(
-            lambda x: chose_value_with_tolerance(x, tolerance_idx))
-    plot_df['totaltime'] = plot_df[
-        'totaltime_to_gmp_convergence'].map(
-            lambda x: chose_value_with_tolerance(x, tolerance_idx,
-                                                 time_in_h=True))
-    plot_df['tl_initpts'] = plot_df[
-        'initpts'].map(lambda x: x[1])
+def create_plot_dataframe(df):
+    plot_df = df[['name', 'iterations', 'totaltime', 'secondary_initpts']]
+    plot_df['totaltime'] = plot_df['totaltime'] / 3600
+    plot_df['tl_initpts'] = plot_df['secondary_initpts']
     plot_df.drop_duplicates(
         subset=['totaltime', 'tl_initpts', 'name'], inplace=True)
-    plot_df['setup'] = plot_df['name'].map(lambda x: convert_strings[x])
+    plot_df['setup'] = plot_df['name'].astype(str).map(
+        lambda x: convert_strings[x])
     plot_df.rename(
         columns={'tl_initpts': 'Lower fid. samples',
                  'totaltime': 'CPU time [h]',
@@ -150,13 +145,5 @@ def create_plot_dataframe(df, tolerance):
     return plot_df
 
 
-def chose_value_with_tolerance(x, tolerance_idx, time_in_h=False):
-    if x[tolerance_idx] is None:
-        return None
-    else:
-        x_tol = x[tolerance_idx] / 3600 if time_in_h else x[tolerance_idx]
-        return x_tol
-
-
 if __name__ == '__main__':
     main()
@@ -1,20 +1,22 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import sys
 from pathlib import Path
 # Add path to py
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from read_write import load_yaml, load_json, save_json
+from src.lazy import lazy_import
+from src.config import load_config
+from src.ragged import RaggedArray
+from src.read_write import save_json
+from src.session import DatasetSession
 
 THESIS_DIR = Path(__file__).resolve().parent.parent.parent
 FIGS_DIR = THESIS_DIR / 'results/figs'
-PROCESSED_DIR = THESIS_DIR / 'data/processed'
-SCRIPTS_DIR = THESIS_DIR / 'scripts'
-
-tolerances = np.array(load_yaml(SCRIPTS_DIR, '/config_tl.yaml')['tolerances'])
-TOLERANCE = tolerances[5]  # kcal/mol
-TOLERANCE_IDX = np.argwhere(tolerances == TOLERANCE).squeeze()
+SETUP = 'transfer_learning'
+# Entries of the runs needed for the plot
+FIELDS = ['name', 'gmp', 'iterations_to_gmp_convergence']
+# Index of the tolerance in config_tl.yaml, see get_tolerance
+TOLERANCE_IDX = 5
 AXIS_FONTSIZE = 15
 TITLE_FONTSIZE = 15
 SMALL_SIZE = 15
@@ -47,23 +49,43 @@ PLOT_STYLE = {
                              'color': 'k',
                              'linestyle': 'dotted'},
             }
-plt.rc('axes', labelsize=AXIS_FONTSIZE)
-plt.rc('axes', titlesize=TITLE_FONTSIZE)
-plt.rc('xtick', labelsize=SMALL_SIZE)    # fontsize of the tick labels
-plt.rc('ytick', labelsize=SMALL_SIZE)    # fontsize of the tick labels
-plt.rc('legend', fontsize=SMALL_SIZE)    # legend fontsize
+
+
+def set_plot_style(plt):
+    plt.rc('axes', labelsize=AXIS_FONTSIZE)
+    plt.rc('axes', titlesize=TITLE_FONTSIZE)
+    plt.rc('xtick', labelsize=SMALL_SIZE)    # fontsize of the tick labels
+    plt.rc('ytick', labelsize=SMALL_SIZE)    # fontsize of the tick labels
+    plt.rc('legend', fontsize=SMALL_SIZE)    # legend fontsize
+
+
+plt = lazy_import('matplotlib.pyplot', on_import=set_plot_style)
+
+
+def get_tolerance():
+    """Returns the tolerance (kcal/mol) the plot is made for."""
+    return load_config('config_tl.yaml')['tolerances'][TOLERANCE_IDX]
 
 
 def main():
-    experiment_paths = [PROCESSED_DIR.joinpath(exp) for exp in sys.argv[1:]]
+    make_figure(DatasetSession(), sys.argv[1:])
+
+
+def make_figure(session, experiments):
+    """Plots the global minimum predictions of the transfer learning
+    experiments with the runs of a DatasetSession.
+
+    Args:
+        session (DatasetSession): Session the runs are taken from.
+        experiments (list): Names of experiments.
+    """
     fig, axs = plt.subplots(figsize=(8, 5))
-    for exp_idx, experiment_path in enumerate(experiment_paths):
-        experiment_runs = [exp for exp in
-                           experiment_path.iterdir() if exp.is_file()]
-        data = [load_json(run, '') for run in experiment_runs]
-        for (exp_run, exp_data) in zip(experiment_runs, data):
-            name = str(exp_run).split('/')[-1].split('.json')[0]
+    for exp_idx, experiment in enumerate(experiments):
+        runs = session.get_runs(SETUP, experiment, FIELDS)
+        data = []
+        for name, exp_data in runs.items():
             exp_data['exp_run'] = name
+            data.append(exp_data)
         data.sort(key=sort_data_by_convergence)
         plot_gmp_statistics(data, fig, axs, exp_idx)
 #    plt.savefig(FIGS_DIR.joinpath('4DUHF_no_baseline.pdf'), dpi=300)
@@ -71,24 +93,21 @@ def main():
 
 
 def plot_gmp_statistics(data, fig, ax, idx):
-    gmps = np.zeros((len(data), len(data[0]['gmp'])))
-    for exp_run_idx, exp_run in enumerate(data):
-        padded_array = padd_1d_array_with_zeros(
-            np.array(data[exp_run_idx]['gmp'])[:, -2],
-            gmps[exp_run_idx, :].shape
-        )
-        gmps[exp_run_idx, :] = padded_array
-    gmp_mean = np.mean(gmps, axis=0)
-    gmp_var = np.var(gmps, axis=0)
+    # Iterations after the end of a run are masked (instead of padded with
+    # zeros), so the statistics only use the runs which reached them
+    gmps = RaggedArray.from_records(data, 'gmp', column=-2).align()
+    gmp_mean = gmps.mean(axis=0)
+    gmp_var = gmps.var(axis=0)
     # name = TITLE_DICT[data[0]["name"]]
     x_range = np.arange(gmp_mean.shape[0])
     plt.plot(x_range, gmp_mean, **PLOT_STYLE[data[0]["name"]])
     color = PLOT_STYLE[data[0]["name"]]['color']
     plt.fill_between(x_range, gmp_mean - 2*gmp_var, gmp_mean + 2*gmp_var,
                      alpha=.1, color=color)
-    plt.axhline(TOLERANCE, alpha=.1, color='k', linestyle='dashed')
-    plt.axhline(-TOLERANCE, alpha=.1, color='k', linestyle='dashed')
-    upper_bound = 1.6 if TOLERANCE == 0.1 else 2.6
+    tolerance = get_tolerance()
+    plt.axhline(tolerance, alpha=.1, color='k', linestyle='dashed')
+    plt.axhline(-tolerance, alpha=.1, color='k', linestyle='dashed')
+    upper_bound = 1.6 if tolerance == 0.1 else 2.6
     plt.ylim(-1, upper_bound)
     if data[0]["name"] in ['2LF', '2HF', '2UHF']:
         plt.xlim(0, 30)
@@ -100,21 +119,6 @@ def plot_gmp_statistics(data, fig, ax, idx):
     plt.title(title)
 
 
-def padd_1d_array_with_zeros(array, shape):
-    """Padd an array with zeros.
-
-    Args:
-        array (np.array): original array
-        shape (tuple): shape of the padded array
-
-    Returns:
-        np.array: Padded array
-    """
-    padded_array = np.zeros(shape)
-    padded_array[:array.shape[0]] = array
-    return padded_array
-
-
 def sort_data_by_convergence(data):
     if data['iterations_to_gmp_convergence'][TOLERANCE_IDX] is None:
         return np.infty
@@ -1,28 +1,36 @@
 import numpy as np
-import matplotlib.pyplot as plt
-plt.rc('font', **{ 'family': 'serif', 'size': 12, })
-plt.rc('text', **{ 'usetex': True, 'latex.preamble': r""" \usepackage{physics} \usepackage{siunitx} """ })
 import sys
 import click
 from pathlib import Path
 # Add path to use read_write.py
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
-from src.read_write import load_yaml, load_json, save_json
+from src.lazy import lazy_import
+from src.config import load_config
+from src.read_write import save_json
+from src.session import DatasetSession
 
 SMALL_SIZE = 12
 MEDIUM_SIZE = 12
 LARGE_SIZE = 12
-plt.rc('font', size=SMALL_SIZE)          # controls default text sizes
-plt.rc('axes', titlesize=LARGE_SIZE)     # fontsize of the axes title
-plt.rc('axes', labelsize=MEDIUM_SIZE)    # fontsize of the x and y labels
-plt.rc('xtick', labelsize=MEDIUM_SIZE)    # fontsize of the tick labels
-plt.rc('ytick', labelsize=MEDIUM_SIZE)    # fontsize of the tick labels
-plt.rc('legend', fontsize=MEDIUM_SIZE)    # legend fontsize
-plt.rc('figure', titlesize=LARGE_SIZE)  # fontsize of the figure title
+
+
+def set_plot_style(plt):
+    plt.rc('font', **{ 'family': 'serif', 'size': 12, })
+    plt.rc('text', **{ 'usetex': True, 'latex.preamble': r""" \usepackage{physics} \usepackage{siunitx} """ })
+    plt.rc('font', size=SMALL_SIZE)          # controls default text sizes
+    plt.rc('axes', titlesize=LARGE_SIZE)     # fontsize of the axes title
+    plt.rc('axes', labelsize=MEDIUM_SIZE)    # fontsize of the x and y labels
+    plt.rc('xtick', labelsize=MEDIUM_SIZE)    # fontsize of the tick labels
+    plt.rc('ytick', labelsize=MEDIUM_SIZE)    # fontsize of the tick labels
+    plt.rc('legend', fontsize=MEDIUM_SIZE)    # legend fontsize
+    plt.rc('figure', titlesize=LARGE_SIZE)  # fontsize of the figure title
+
+
+plt = lazy_import('matplotlib.pyplot', on_import=set_plot_style)
 
 THESIS_DIR = Path(__file__).resolve().parent.parent.parent
 FIGS_DIR = THESIS_DIR / 'results/figs/'
-CONFIG = load_yaml(THESIS_DIR.joinpath('scripts'), '/config_tl.yaml')
+CONFIG_FILE = 'config_tl.yaml'
 # cyan: #3EE1D1, orange: #FF8C00
 # blue: #000082, red: #FE0000
 SCATTER_DICT_2D = {'marker': 'x', 'color': '#000082', 'alpha': 1, 's': 10}
@@ -33,12 +41,18 @@ COLORS = ['blue', 'orange']
 @click.command()
 @click.option('--show_plots', is_flag=True, default=False)
 def main(show_plots):
-    exp_list_2D = [THESIS_DIR / 'data/multi_task_learning' / 'processed' /
-                   exp for exp in CONFIG['correlation_data']['2D']]
-    exp_list_4D = [THESIS_DIR / 'data/multi_task_learning' / 'processed' /
-                   exp for exp in CONFIG['correlation_data']['4D']]
-    y_values_2D, acq_times = load_2D_y_values_and_acq_times(exp_list_2D)
-    y_values_4D = load_4D_y_values(exp_list_4D)
+    make_figure(DatasetSession(), show_plots)
+
+
+def make_figure(session, show_plots=False):
+    """Plots the acquisition times and the correlation of the fidelities
+    with the runs of a DatasetSession."""
+    correlation_data = load_config(CONFIG_FILE)['correlation_data']
+    exp_list_2D = correlation_data['2D']
+    exp_list_4D = correlation_data['4D']
+    y_values_2D, acq_times = load_2D_y_values_and_acq_times(session,
+                                                            exp_list_2D)
+    y_values_4D = load_4D_y_values(session, exp_list_4D)
     plot_acq_times_comparison(acq_times, show_plots=show_plots)
     # plot_acq_times_histograms(acq_times, NAMES, show_plots=args.show_plots)
     for y_values in [y_values_2D, y_values_4D]:
@@ -49,11 +63,12 @@ def main(show_plots):
     # plot_correlation_coefficient([y_values_2D, y_values_4D], show_plots)
 
 
-def load_2D_y_values_and_acq_times(exp_list, num_points=100):
+def load_2D_y_values_and_acq_times(session, exp_list, num_points=100):
     """This amount of data wrangling deserves it's own function.
 
     Args:
-        exp_list (list): List containing paths to experiments.
+        session (DatasetSession): Session the runs are taken from.
+        exp_list (list): List containing names of multi-task experiments.
         num_points (int, optional): Number of data points. Defaults to 100.
 
     Returns:
@@ -61,11 +76,12 @@ def load_2D_y_values_and_acq_times(exp_list, num_points=100):
     """
     N = len(exp_list)
     y_values, acq_times = np.zeros((N, num_points)), np.zeros((N, num_points))
-    for idx, exp_path in enumerate(exp_list):
-        exp_runs = [exp for exp in exp_path.iterdir() if exp.is_file()]
-        exp_runs.sort()
+    for idx, exp in enumerate(exp_list):
+        runs = session.get_runs('multi_task_learning', exp,
+                                ['xy', 'acq_times'])
+        exp_runs = sorted(runs)
         for exp_idx, exp_run in enumerate(exp_runs):
-            data = load_json(exp_run, '')
+            data = runs[exp_run]
             if len(exp_runs) > 1:
                 # idxs sets the correct indexes to fill in y_values array
                 if 'exp_5' in str(exp_run):
@@ -82,11 +98,12 @@ def load_2D_y_values_and_acq_times(exp_list, num_points=100):
     return y_values, acq_times
 
 
-def load_4D_y_values(exp_list, num_points=200):
+def load_4D_y_values(session, exp_list, num_points=200):
     """This amount of data wrangling deserves it's own function.
 
     Args:
-        exp_list (list): List containing paths to experiments.
+        session (DatasetSession): Session the runs are taken from.
+        exp_list (list): List containing names of multi-task experiments.
         num_points (int, optional): Number of data points. Defaults to 200.
 
     Returns:
@@ -95,10 +112,9 @@ def load_4D_y_values(exp_list, num_points=200):
     N = len(exp_list)
     # y_values, acq_times = np.zeros((N, num_points)), np.zeros((N, num_points))
     y_values = np.zeros((N, num_points))
-    for idx, exp_path in enumerate(exp_list):
-        exp_runs = [exp for exp in exp_path.iterdir() if exp.is_file()]
-        exp_runs.sort()
-        data = load_json(exp_runs[0], '')
+    for idx, exp in enumerate(exp_list):
+        runs = session.get_runs('multi_task_learning', exp, ['xy'])
+        data = runs[sorted(runs)[0]]
         y_values[idx, :] = np.array(data['xy'])[:num_points, -1]
         # acq_times[idx, :] = np.array(data['acq_times'][:num_points])
     return y_values    # return y_values, acq_times
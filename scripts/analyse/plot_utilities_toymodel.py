@@ -1,14 +1,22 @@
 import numpy as np
-import matplotlib.pyplot as plt
-plt.rc('font', **{ 'family': 'serif', 'size': 12, })
-plt.rc('text', **{ 'usetex': True, 'latex.preamble': r""" \usepackage{physics} \usepackage{siunitx} """ })
-import seaborn as sns
 import click
 
-from collections import defaultdict, OrderedDict
 from pathlib import Path
 
-from src.read_toymodel_outputs import OutputFileParser, ParserToDataFrame
+from src.lazy import lazy_import
+from src.read_toymodel_outputs import OutputFileParser, ParserToDataFrame, \
+    set_disk_cache_dir
+from src.aggregation import aggregate_by_cost
+from src.ragged import RaggedArray
+
+
+def set_plot_style(plt):
+    plt.rc('font', **{ 'family': 'serif', 'size': 12, })
+    plt.rc('text', **{ 'usetex': True, 'latex.preamble': r""" \usepackage{physics} \usepackage{siunitx} """ })
+
+
+plt = lazy_import('matplotlib.pyplot', on_import=set_plot_style)
+sns = lazy_import('seaborn')
 
 THESIS_FOLDER = Path(__file__).resolve().parent.parent.parent
 FIGS_DIR = THESIS_FOLDER / 'results/figs'
@@ -49,43 +57,30 @@ titles = {'uhf_lf': r'LF $\rightarrow$ UHF',
               help='Show (and don\'t save) plots.')
 @click.option('--fidelities', default='uhf_hf', type=str,
               help="Chose between 'uhf_hf' or 'uhf_lf'.")
-def main(show_plots, fidelities):
+@click.option('--cache_dir', default=None, type=str,
+              help='Folder to cache the parsed output files between calls.')
+def main(show_plots, fidelities, cache_dir):
     plot_settings['fidelities'] = fidelities
+    set_disk_cache_dir(cache_dir)
 
     plot_cost_to_reach_convergence(plot_settings, TOYMODEL_FOLDER, show_plots)
 
-def get_discretized_dict(dictionary, rounding_function):
-    """
-    This utility function returns a dictionary, where the keys
-    of the original dictionary are 'discretized' and the values
-    of the previous keys are collected and paired with the
-    discretized keys.
-
-    Examples for the rounding_function:
-        1) round_to_half = lambda x: round(x * 2) / 2, or
-        2) round_to_int = lambda x: round(x)
-        3) def round_to_multiple(number, multiple=12000/4):
-               return int(np.ceil(number/multiple)*multiple)
-    """
-    ordered_dict, rounded_dict = OrderedDict(), defaultdict(list)
-    for key in sorted(dictionary.keys()):
-        ordered_dict[key] = dictionary[key]
-    rounded_keys = [rounding_function(key) for key in dictionary.keys()]
-    cost_to_rounded_cost_map = {
-        key: val for key, val in zip(dictionary.keys(), rounded_keys)}
-    for key in dictionary.keys():
-        rounded_key = cost_to_rounded_cost_map[key]
-        rounded_dict[rounded_key] += dictionary[key]
-    rounded_sorted_dict = OrderedDict()
-    for key in sorted(rounded_dict.keys()):
-        rounded_sorted_dict[key] = rounded_dict[key]
-    return rounded_sorted_dict
-
-
 def round_to_multiple(number, multiple=12000/4):
     return int(np.ceil(number/multiple)*multiple)
 
 
+def collect_costs_and_regrets(parsers):
+    """Returns the cumulative costs and predicted global minima of the runs
+    as RaggedArrays (see src.ragged), which aggregate_by_cost accepts."""
+    costs, regrets = [], []
+    for parser in parsers:
+        initpts = parser.data['initpts']
+        costs.append(parser.data['cumulative_cost'][initpts-1:])
+        regrets.append(np.array(parser.data['gmp'])[:, -2])
+    return RaggedArray.from_sequences(costs, dtype=float), \
+        RaggedArray.from_sequences(regrets, dtype=float)
+
+
 def plot_singletask_sample_locations(experiment, num_experiments, folder):
     """Plot single-task sample locations in search space.
 
@@ -218,24 +213,14 @@ def plot_timing_data(experiments, folder, labels, artificial_acq_times=False):
 def plot_strategies(fidelities, acqfn, folder='out', range_bound=10,
                     plot_filling=True):
     fig = plt.figure(figsize=(16, 9))
-    cost_regret_pairs = defaultdict(list)
 
     # Single-task
-    for idx in range(10):
-        parser = OutputFileParser(f'uhf_2d_{acqfn}_st_run{idx}', folder=folder)
-        ypred = np.array(parser.data['gmp'])[:, -2]
-        initpts = parser.data['initpts']
-        cumulative_costs = parser.data['cumulative_cost'][initpts-1:]
-        for cost, regret in zip(cumulative_costs, ypred):
-            cost_regret_pairs[float(round(cost, 1))].append(regret)
-    for cost in cost_regret_pairs:
-        cost_regret_pairs[cost] = np.mean(cost_regret_pairs[cost]), \
-            np.sqrt(np.var(cost_regret_pairs[cost]))
-    costs = np.array(list(cost_regret_pairs.keys()))
-    #true_min = np.array(list(cost_regret_pairs.values()))[-1, 0]
+    parsers = [OutputFileParser(f'uhf_2d_{acqfn}_st_run{idx}', folder=folder)
+               for idx in range(10)]
+    statistics = aggregate_by_cost(*collect_costs_and_regrets(parsers))
+    costs = statistics['cost']
     true_min = -202861.3237
-    regrets = np.array(list(cost_regret_pairs.values()))
-    regret_means, regrets_sd = regrets[:, 0].squeeze(), regrets[:, 1].squeeze()
+    regret_means, regrets_sd = statistics['mean'], statistics['sd']
     plt.plot(costs, regret_means-true_min, c='gray')
     if plot_filling:
         plt.fill_between(costs, regret_means-true_min - 1.96*regrets_sd,
@@ -244,25 +229,14 @@ def plot_strategies(fidelities, acqfn, folder='out', range_bound=10,
 
     strategies = range(1, 7)
     for strategy, color in zip(strategies, ['b', 'g', 'r', 'c', 'm', 'y']):
-        unordered_cost_regret_pairs = defaultdict(list)
-        for idx in range(range_bound):
-            parser = OutputFileParser(
-                f'{fidelities}_2d_{acqfn}_strategy{strategy}_run{idx}',
-                folder=folder)
-            ypred = np.array(parser.data['gmp'])[:, -2]
-            initpts = parser.data['initpts']
-            cumulative_costs = parser.data['cumulative_cost'][initpts-1:]
-            for cost, regret in zip(cumulative_costs, ypred):
-                unordered_cost_regret_pairs[float(round(cost, 1))].append(regret)
+        parsers = [OutputFileParser(
+            f'{fidelities}_2d_{acqfn}_strategy{strategy}_run{idx}',
+            folder=folder) for idx in range(range_bound)]
         rounding_func = lambda x: round(x)
-        discretized_dict = get_discretized_dict(
-            unordered_cost_regret_pairs, rounding_func)
-        costs = np.array([key for key in discretized_dict.keys()])
-        regrets = np.array([np.mean(discretized_dict[key])
-                            for key in discretized_dict.keys()])
-        regrets_sd = np.array(
-            [np.sqrt(np.var(discretized_dict[key]))
-             for key in discretized_dict.keys()])
+        statistics = aggregate_by_cost(*collect_costs_and_regrets(parsers),
+                                       rounding_function=rounding_func)
+        costs = statistics['cost']
+        regrets, regrets_sd = statistics['mean'], statistics['sd']
         plt.plot(costs, regrets - true_min, c=color, ls='solid',
                  label=f'{fidelities}_2d_{acqfn}_strategy{strategy}')
         if plot_filling:
@@ -279,43 +253,27 @@ def plot_strategies(fidelities, acqfn, folder='out', range_bound=10,
 
 def plot_mumbo(fidelities, folder='out', true_min=-202861.3237):
     fig = plt.figure(figsize=(16, 9 ))
-    cost_regret_pairs = defaultdict(list)
 
     # Single-task
-    for idx in range(10):
-        parser = OutputFileParser(f'uhf_2d_elcb_st_run{idx}', folder)
-        ypred = np.array(parser.data['gmp'])[:, -2]
-        initpts = parser.data['initpts']
-        cumulative_costs = parser.data['cumulative_cost'][initpts-1:]
-        for cost, regret in zip(cumulative_costs, ypred):
-            cost_regret_pairs[float(round(cost, 1))].append(regret)
-    for cost in cost_regret_pairs:
-        cost_regret_pairs[cost] = np.mean(cost_regret_pairs[cost]), \
-            np.sqrt(np.var(cost_regret_pairs[cost]))
-    costs = np.array(list(cost_regret_pairs.keys()))
-    regrets = np.array(list(cost_regret_pairs.values()))
-    regret_means, regrets_sd = regrets[:, 0].squeeze(), regrets[:, 1].squeeze()
+    parsers = [OutputFileParser(f'uhf_2d_elcb_st_run{idx}', folder)
+               for idx in range(10)]
+    statistics = aggregate_by_cost(*collect_costs_and_regrets(parsers))
+    costs = statistics['cost']
+    regret_means, regrets_sd = statistics['mean'], statistics['sd']
     plt.plot(costs, regret_means-true_min, c='gray')
     plt.fill_between(costs, regret_means-true_min - 1.96*regrets_sd,
                      regret_means-true_min + 1.96*regrets_sd,
                      color='gray', alpha=.2)
 
     color = 'r'
-    unordered_cost_regret_pairs = defaultdict(list)
-    for idx in range(10):
-        parser = OutputFileParser(
-            f'{fidelities}_2d_mumbo_inseparable_run{idx}', folder)
-        ypred = np.array(parser.data['gmp'])[:, -2]
-        initpts = parser.data['initpts']
-        cumulative_costs = parser.data['cumulative_cost'][initpts-1:]
-        for cost, regret in zip(cumulative_costs, ypred):
-            unordered_cost_regret_pairs[float(round(cost, 1))].append(regret)
+    parsers = [OutputFileParser(
+        f'{fidelities}_2d_mumbo_inseparable_run{idx}', folder)
+        for idx in range(10)]
     rounding_func = lambda x: round(x)
-    discretized_dict = get_discretized_dict(unordered_cost_regret_pairs, rounding_func)
-    costs = np.array([key for key in discretized_dict.keys()])
-    regrets = np.array([np.mean(discretized_dict[key]) for key in discretized_dict.keys()])
-    regrets_sd = np.array(
-        [np.sqrt(np.var(discretized_dict[key])) for key in discretized_dict.keys()])
+    statistics = aggregate_by_cost(*collect_costs_and_regrets(parsers),
+                                   rounding_function=rounding_func)
+    costs = statistics['cost']
+    regrets, regrets_sd = statistics['mean'], statistics['sd']
     plt.plot(costs, regrets - true_min, c=color, ls='solid',
              label=f'{fidelities}_2d_mumbo_inseparable')
     plt.fill_between(costs, regrets - true_min - 1.96*regrets_sd, regrets - true_min + 1.96*regrets_sd,
@@ -450,24 +408,14 @@ def plot_cost_to_reach_convergence(plot_settings, folder, show_plots):
 def plot_regret(fidelities, acqfn, folder='out', range_bound=10, plot_filling=True,
                 rounding_func=None):
     fig = plt.figure(figsize=(16, 9 ))
-    cost_regret_pairs = defaultdict(list)
 
     # Single-task
-    for idx in range(10):
-        parser = OutputFileParser(f'uhf_2d_{acqfn}_st_run{idx}', folder=folder)
-        ypred = np.array(parser.data['gmp'])[:, -2]
-        initpts = parser.data['initpts']
-        cumulative_costs = parser.data['cumulative_cost'][initpts-1:]
-        for cost, regret in zip(cumulative_costs, ypred):
-            cost_regret_pairs[float(round(cost, 1))].append(regret)
-    for cost in cost_regret_pairs:
-        cost_regret_pairs[cost] = np.mean(cost_regret_pairs[cost]), \
-            np.sqrt(np.var(cost_regret_pairs[cost]))
-    costs = np.array(list(cost_regret_pairs.keys()))
-    #true_min = np.array(list(cost_regret_pairs.values()))[-1, 0]
+    parsers = [OutputFileParser(f'uhf_2d_{acqfn}_st_run{idx}', folder=folder)
+               for idx in range(10)]
+    statistics = aggregate_by_cost(*collect_costs_and_regrets(parsers))
+    costs = statistics['cost']
     true_min = -202861.3237
-    regrets = np.array(list(cost_regret_pairs.values()))
-    regret_means, regrets_sd = regrets[:, 0].squeeze(), regrets[:, 1].squeeze()
+    regret_means, regrets_sd = statistics['mean'], statistics['sd']
     costs *= 12000  # True cost for single task
     plt.plot(costs, regret_means-true_min, c='gray', label=f'{acqfn} single-task')
     if plot_filling:
@@ -477,22 +425,15 @@ def plot_regret(fidelities, acqfn, folder='out', range_bound=10, plot_filling=Tr
 
     strategies = [1,6]
     for strategy, color in zip(strategies, ['b', 'g', 'r', 'c', 'm', 'y']):
-        unordered_cost_regret_pairs = defaultdict(list)
-        for idx in range(range_bound):
-            parser = OutputFileParser(
-                f'{fidelities}_2d_{acqfn}_strategy{strategy}_run{idx}', folder=folder)
-            ypred = np.array(parser.data['gmp'])[:, -2]
-            initpts = parser.data['initpts']
-            cumulative_costs = parser.data['cumulative_cost'][initpts-1:]
-            for cost, regret in zip(cumulative_costs, ypred):
-                unordered_cost_regret_pairs[float(round(cost, 1))].append(regret)
+        parsers = [OutputFileParser(
+            f'{fidelities}_2d_{acqfn}_strategy{strategy}_run{idx}', folder=folder)
+            for idx in range(range_bound)]
         if rounding_func is None:
             rounding_func = lambda x: round(x)
-        discretized_dict = get_discretized_dict(unordered_cost_regret_pairs, rounding_func)
-        costs = np.array([key for key in discretized_dict.keys()])
-        regrets = np.array([np.mean(discretized_dict[key]) for key in discretized_dict.keys()])
-        regrets_sd = np.array(
-            [np.sqrt(np.var(discretized_dict[key])) for key in discretized_dict.keys()])
+        statistics = aggregate_by_cost(*collect_costs_and_regrets(parsers),
+                                       rounding_function=rounding_func)
+        costs = statistics['cost']
+        regrets, regrets_sd = statistics['mean'], statistics['sd']
         plt.plot(costs, regrets - true_min, c=color, ls='solid',
                  label=f'{fidelities}_2d_{acqfn}_strategy{strategy}')
         if plot_filling:
@@ -0,0 +1,69 @@
+import importlib
+import sys
+import time
+import click
+from pathlib import Path
+# Add path to use the src package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.session import DatasetSession
+
+# Figures by name: module in this folder, keyword arguments of its
+# make_figure function and setups whose processed runs it reads (the
+# boxplots only read the run summary of their setup)
+FIGURES = {
+    'plot_TL_results_boxplot_2D': ('plot_TL_results_boxplot',
+                                   {'dimension': '2D'}, []),
+    'plot_TL_results_boxplot_4D': ('plot_TL_results_boxplot',
+                                   {'dimension': '4D'}, []),
+    'plot_TL_convergence_2D': ('plot_TL_convergence',
+                               {'dimension': '2D', 'tolerance': 0.1},
+                               ['transfer_learning']),
+    'plot_TL_convergence_4D': ('plot_TL_convergence',
+                               {'dimension': '4D', 'tolerance': 0.1},
+                               ['transfer_learning']),
+    'plot_MT_results_boxplot_2D': ('plot_MT_results_boxplot',
+                                   {'dimension': '2D'}, []),
+    'plot_MT_results_boxplot_4D': ('plot_MT_results_boxplot',
+                                   {'dimension': '4D'}, []),
+    'plot_correlation_statistics': ('plot_correlation_statistics', {},
+                                    ['multi_task_learning']),
+}
+
+
+@click.command()
+@click.option('--figure', 'selected_figures', multiple=True,
+    help='Only render this figure. Can be given several times.')
+@click.option('--jobs', default=1, type=int,
+    help='Number of processes that render figures at the same time.')
+def main(selected_figures, jobs):
+    """Renders the figures of the analyse scripts in one session, so that
+    the processed data of each setup is loaded only once.
+
+    With --jobs, the data is loaded first and the figures are rendered by
+    forked processes which share it.
+    """
+    unknown = [name for name in selected_figures if name not in FIGURES]
+    if len(unknown) > 0:
+        raise click.BadParameter(f'Unknown figures {unknown}')
+    names = list(selected_figures) if len(selected_figures) > 0 \
+        else list(FIGURES)
+    start = time.perf_counter()
+    session = DatasetSession()
+    if jobs > 1:
+        setups = sorted(set(setup for name in names
+                            for setup in FIGURES[name][2]))
+        for setup in setups:
+            session.load_setup(setup)
+    figures = []
+    for name in names:
+        module_name, kwargs, _ = FIGURES[name]
+        module = importlib.import_module(module_name)
+        figures.append((module.make_figure, kwargs))
+    session.render(figures, jobs)
+    print(f'Rendered {len(figures)} figures in '
+          f'{time.perf_counter() - start:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
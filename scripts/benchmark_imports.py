@@ -0,0 +1,118 @@
+import json
+import subprocess
+import sys
+import click
+from pathlib import Path
+
+THESIS_DIR = Path(__file__).resolve().parent.parent
+# Modules which are only imported when a code path needs them (see
+# src/lazy.py), never when a script or module of the repository is imported
+HEAVY_MODULES = ('matplotlib', 'seaborn', 'pandas', 'scipy')
+# Seconds an import may take, without the start of the interpreter
+IMPORT_BUDGET = 0.5
+# Modules and scripts (relative to the repository root) checked by default
+TARGETS = [
+    'src.aggregation',
+    'src.catalog',
+    'src.config',
+    'src.ragged',
+    'src.raw_input',
+    'src.read_toymodel_outputs',
+    'src.read_write',
+    'src.run',
+    'src.session',
+    'src.summary',
+    'src.timings',
+    'scripts/run_pipeline.py',
+    'scripts/analyse/plot_MT_results_boxplot.py',
+    'scripts/analyse/plot_TL_convergence.py',
+    'scripts/analyse/plot_TL_results_boxplot.py',
+    'scripts/analyse/plot_baseline_tl_comparison.py',
+    'scripts/analyse/plot_correlation_statistics.py',
+    'scripts/analyse/plot_utilities_toymodel.py',
+    'scripts/analyse/render_figures.py',
+    'scripts/parse/merge_boss_outputs.py',
+    'scripts/parse/parse_transfer_learning_results.py',
+    'scripts/preprocess/convert_storage.py',
+    'scripts/preprocess/follow_raw_data.py',
+    'scripts/preprocess/parse_raw_data.py',
+    'scripts/preprocess/watch_convergence.py',
+]
+# Imports the target in a fresh interpreter. Scripts are run with a
+# __name__ other than '__main__', so that only their module level code runs.
+DRIVER = '''
+import importlib, json, os, runpy, sys, time
+target, root = sys.argv[1:3]
+sys.path.insert(0, root)
+start = time.perf_counter()
+if target.endswith('.py'):
+    sys.path.insert(0, os.path.dirname(os.path.join(root, target)))
+    runpy.run_path(os.path.join(root, target), run_name='__benchmark__')
+else:
+    importlib.import_module(target)
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'modules': sorted(sys.modules)}))
+'''
+
+
+@click.command()
+@click.option('--target', 'targets', multiple=True,
+    help='Module or script to check. Can be given several times, defaults '
+         'to all entry points.')
+@click.option('--budget', default=IMPORT_BUDGET, type=float,
+    help='Seconds an import may take.')
+@click.option('--repeat', default=3, type=int,
+    help='Number of imports per target, the fastest one is reported.')
+def main(targets, budget, repeat):
+    """Measures the time it takes to import the modules and scripts of the
+    repository, each in a fresh interpreter.
+
+    Fails if an import takes longer than the budget or imports one of the
+    heavy dependencies (matplotlib, seaborn, pandas, scipy).
+    """
+    targets = list(targets) if len(targets) > 0 else TARGETS
+    failed = False
+    width = max(len(target) for target in targets)
+    print(f"{'target':<{width}}  time [s]  heavy modules")
+    for target in targets:
+        seconds, heavy_modules = measure_import(target, repeat)
+        too_slow = seconds > budget
+        failed = failed or too_slow or len(heavy_modules) > 0
+        flag = ' (over budget)' if too_slow else ''
+        print(f"{target:<{width}}  {seconds:8.3f}  "
+              f"{', '.join(heavy_modules) or '-'}{flag}")
+    if failed:
+        sys.exit(1)
+
+
+def measure_import(target, repeat=3):
+    """Imports a module or script in fresh interpreters.
+
+    Args:
+        target (str): Module name (e.g. 'src.read_write') or path of a
+        script relative to the repository root.
+        repeat (int, optional): Number of imports. Defaults to 3.
+
+    Returns:
+        tuple: Shortest import time in seconds and the heavy modules which
+        were imported.
+    """
+    times, heavy_modules = [], set()
+    for _ in range(max(1, repeat)):
+        process = subprocess.run(
+            [sys.executable, '-c', DRIVER, target, str(THESIS_DIR)],
+            cwd=THESIS_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True)
+        if process.returncode != 0:
+            raise click.ClickException(
+                f'Importing {target} failed:\n{process.stderr}')
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        times.append(result['seconds'])
+        heavy_modules.update(
+            module.split('.')[0] for module in result['modules']
+            if module.split('.')[0] in HEAVY_MODULES)
+    return min(times), sorted(heavy_modules)
+
+
+if __name__ == '__main__':
+    main()
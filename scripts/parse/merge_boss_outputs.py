@@ -1,13 +1,18 @@
-from os import remove
-import numpy as np
-import matplotlib.pyplot as plt
+import os
 import click
 import shutil
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from src.timings import TimingCorrector
 
 DATA_DIR = Path(__file__).resolve().parent.parent.parent  / 'data'
 FOLDERS_TO_IGNORE = ['baselines', 'old', 'template', 'tmp', 'misc']
+# Lines copied from a continued subrun before its first and after its last
+# 'Objective function evaluated' line
+LINES_BEFORE_FIRST_EVALUATION = 4
+LINES_AFTER_LAST_EVALUATION = 10
 
 @click.command()
 @click.option('--all_setups', default=False, is_flag=True,
@@ -16,17 +21,25 @@ FOLDERS_TO_IGNORE = ['baselines', 'old', 'template', 'tmp', 'misc']
               help='Experimental setup')
 @click.option('--path', required=True, default=DATA_DIR,
               help='Experimental setup')
-def main(all_setups, setup, path):
+@click.option('--jobs', default=1, type=int,
+              help='Number of processes used to merge the runs.')
+def main(all_setups, setup, path, jobs):
     """Merges the output files of all subruns of a given setup.
     If no setup is given, all setups found in the data directory, that
     contain subruns, are merged.
 
+    The preprocessing (scripts/preprocess/parse_raw_data.py) does not need
+    the merged files, it merges the parsed subrun records directly (see
+    preprocess.merge_subrun_records).
+
     Parameters
     ----------
     setup : str
         Name of experiment, e.g. '4UHF_ICM2_ELCB1_1'.
     path : str
         Path to the directory.
+    jobs : int
+        Number of processes. The runs are independent of each other.
     """
     if (all_setups is False) and (setup is None):
         raise Exception('Either --all_setups or --setup must be given.')
@@ -40,15 +53,12 @@ def main(all_setups, setup, path):
         experiments = [exp for exp in data_dir.iterdir() if (exp.is_dir()
                        and 'exp' in exp.name)]
         experiments.sort()
-        for exp_path in experiments:
-            outfile_text = merge_subrun_output_files(exp_path)
-            # Save new output file
-            with open(exp_path / 'boss.out', 'w') as f:
-                f.write(outfile_text)
-
-            # Copy last rst file
-            copy_last_rst_file(exp_path)
-    #        shutil.copy(exp_path / 'boss.rst', exp_path)
+        if jobs <= 1:
+            for exp_path in experiments:
+                merge_experiment(exp_path)
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                list(executor.map(merge_experiment, experiments))
 
 
 def get_setups():
@@ -81,43 +91,59 @@ def filter_for_setups_with_subruns(paths, string):
     return setups
 
 
-def merge_subrun_output_files(data_dir):
+def merge_subrun_output_files(data_dir, output_path):
+    """Merges the boss.out files of all subruns of a run into a single
+    boss.out file.
+
+    The subruns are streamed line by line into the output file, and the
+    'Total time' lines are made cumulative in the same pass. Only the lines
+    of the current iteration are kept in memory. The output file is
+    written atomically.
+
+    Parameters
+    ----------
+    data_dir : Path
+        Run folder containing the subrun folders.
+    output_path : Path
+        Path of the merged boss.out file.
+    """
     subruns = [dir_ for dir_ in data_dir.iterdir() if dir_.is_dir()]
     subruns.sort()
 
-    # Read data from first subrun:
-    # Copy everything until the last finished iteration
-    lines = get_textlines_from_file(subruns[0] / 'boss.out')
-    lines_cleaned = copy_until_last_iteration(lines)
-    text = ''.join(lines_cleaned)
-
-    # Second to last subrun:
-    # Start copying from the first iteration until the last finished iteration
-    for subrun in subruns[1:]:
-        lines = get_textlines_from_file(subrun / 'boss.out')
-        if lines is None:
-            continue
-        lines_cleaned = copy_from_first_until_last_iteration(lines)
-        if lines_cleaned is not None:
-            text_next_subrun = ''.join(lines_cleaned)
-            text = text + text_next_subrun
-
-
-#   TODO : Skipping the tail for now, maybe add later
-    # Get the tail from last BOSS subrun
-#    lines = get_textlines_from_file(subruns[-1] / 'boss.out')
-#    tail = get_tail_from_last_iteration(lines)
-#    if tail is not None:
-#        text = text + ''.join(tail)
-
-
-    # Correct the 'total time' information in output file, as each subrun
-    # starts the timer from 0 again
-    timings, indices = get_timings(text.splitlines())
-    timings = calculate_correct_timings(timings)
-    lines = correct_timings(text.splitlines(), timings)
-    text = ''.join(lines)
-    return text
+    timings = TimingCorrector()
+    tmp_path = f'{output_path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'w') as output_file:
+            for subrun_idx, subrun in enumerate(subruns):
+                try:
+                    input_file = open(subrun / 'boss.out')
+                except FileNotFoundError:
+                    continue
+                with input_file:
+                    # First subrun: Copy everything until the last finished
+                    # iteration. Later subruns: Copy from the first until
+                    # the last finished iteration
+                    if subrun_idx == 0:
+                        lines = copy_until_last_iteration(input_file)
+                    else:
+                        lines = copy_from_first_until_last_iteration(
+                            input_file)
+                    for line in lines:
+                        output_file.write(correct_total_time(line, timings))
+
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def merge_experiment(exp_path):
+    """Merges the subruns of a run folder into boss.out and copies the last
+    boss.rst file. Run folders without subruns are left unchanged."""
+    if not any(dir_.is_dir() for dir_ in exp_path.iterdir()):
+        return
+    merge_subrun_output_files(exp_path, exp_path / 'boss.out')
+    copy_last_rst_file(exp_path)
 
 
 def copy_last_rst_file(exp_path):
@@ -127,38 +153,33 @@ def copy_last_rst_file(exp_path):
     shutil.copy(last_subrun / 'boss.rst', exp_path)
 
 
-def get_textlines_from_file(file_path):
-    try:
-        with open(file_path) as f:
-            return f.readlines()
-    except FileNotFoundError:
-        return None
-
-
 def copy_until_last_iteration(lines):
-    reversed_lines = lines[::-1]
-    for line_idx, line in enumerate(reversed_lines):
+    """Yields the lines until (and including) the last 'Iteration time'
+    line."""
+    pending = []
+    for line in lines:
+        pending.append(line)
         if "Iteration time" in line:
-            start_idx = line_idx
-            break
-    return lines[:-start_idx]
+            yield from pending
+            pending = []
 
 
 def copy_from_first_until_last_iteration(lines):
-    reversed_lines = lines[::-1]
-    start_idx = None
-    for line_idx, line in enumerate(reversed_lines):
-        if "Objective function evaluated" in line:
-            start_idx = line_idx - 10
-            break
-    if start_idx is None:
-        return None
-    lines = lines[:-start_idx]
-    for line_idx, line in enumerate(lines):
+    """Yields the lines from the iteration of the first until the end of the
+    iteration of the last 'Objective function evaluated' line."""
+    preceding_lines = deque(maxlen=LINES_BEFORE_FIRST_EVALUATION)
+    pending = None      # lines after the last evaluation
+    for line in lines:
         if "Objective function evaluated" in line:
-            start_idx = line_idx - 4
-            break
-    return lines[start_idx:]
+            yield from preceding_lines if pending is None else pending
+            yield line
+            pending = []
+        elif pending is None:
+            preceding_lines.append(line)
+        else:
+            pending.append(line)
+    if pending is not None:
+        yield from pending[:LINES_AFTER_LAST_EVALUATION]
 
 
 def get_tail_from_last_iteration(lines):
@@ -168,36 +189,32 @@ def get_tail_from_last_iteration(lines):
     return None
 
 
-def get_timings(lines):
-    timings, line_indices = [], []
-    for line_idx, line in enumerate(lines):
-        if "Total time" in line:
-            timings.append(float(line.split()[-1]))
-            line_indices.append(line_idx)
-    return timings, line_indices
-
-
-def calculate_correct_timings(timings):
-    timings = np.array(timings)
-    for timing_idx in range(1, len(timings)):
-        if timings[timing_idx] < timings[timing_idx-1]:
-            time_delta = timings[timing_idx-1]
-            timings[timing_idx:] += time_delta
-    return timings
+def correct_total_time(line, timings):
+    """Returns the line, with the cumulative time if it is a 'Total time'
+    line.
 
+    Merges written before the times were corrected with TimingCorrector
+    counted the earlier subruns more than once from the third subrun on;
+    such merges of '_r' experiments have to be merged again.
 
-def correct_timings(lines, timings):
-    timings_idx = 0
-    corrected_lines = []
-    for line_idx, line in enumerate(lines):
-        if "Total time" in line:
-            line = line.split()
-            line[-1] = str(round(timings[timings_idx], 3))
-            line[3] += '    '
-            line = ' '.join(line)
-            timings_idx += 1
-        corrected_lines.append(line + '\n')
-    return corrected_lines
+    Parameters
+    ----------
+    line : str
+        Line of a subrun boss.out file.
+    timings : TimingCorrector
+        Corrector of the 'Total time' lines of the run, see src/timings.py.
+
+    Returns
+    -------
+    str
+        Line, ending with a newline.
+    """
+    if "Total time" not in line:
+        return line if line.endswith('\n') else line + '\n'
+    line = line.split()
+    line[-1] = str(round(float(timings.correct(float(line[-1]))[0]), 3))
+    line[3] += '    '
+    return ' '.join(line) + '\n'
 
 
 if __name__ == '__main__':
@@ -8,17 +8,18 @@ e.g. for 2 repeated experiments:
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
-from scipy import stats
 from pathlib import Path
-from src.read_write import load_yaml, load_json
+from src.lazy import lazy_import
+from src.config import load_config
+from src.summary import load_summary
+
+pd = lazy_import('pandas')
 
 THESIS_DIR = Path(__file__).resolve().parent.parent.parent
 DATA_DIR = THESIS_DIR / 'data/parsed'
+PROCESSED_DATA_DIR = THESIS_DIR / 'data/transfer_learning/processed'
 # Config has (experiment,baseline) pairs
-CONFIG = load_yaml(THESIS_DIR / 'scripts', '/config_tl.yaml')
-TOLERANCES = CONFIG['tolerances']
+CONFIG_FILE = 'config_tl.yaml'
 names = {
     '2HFbasic1': 'HF',
     '2UHFbasic1_r': 'UHF',
@@ -38,61 +39,47 @@ names = {
 def main():
     df = pd.DataFrame()
     dimensions = ['2D', '4D']
+    # Convergence statistics of the runs, written by parse_raw_data.py
+    summary = load_summary(PROCESSED_DATA_DIR)
     for dim in dimensions:
-        config = CONFIG[f'TL_experiment_plots_{dim}']
-        tl_experiment_paths = [THESIS_DIR / 'data' / 'processed' /
-                            exp for exp in config.keys()]
-        bl_experiment_paths = [THESIS_DIR / 'data' / 'processed' /
-                            baseline[0] for _, baseline in config.items()]
-        bl_experiment_paths = set(bl_experiment_paths)   # Unique list
-        tl_exp_data = load_experiments(tl_experiment_paths)
-        bl_exp_data = load_experiments(bl_experiment_paths)
-        df = create_dataframe(df, bl_exp_data, tl_exp_data)
+        config = load_config(CONFIG_FILE).experiment_plots('TL', dim)
+        tl_experiments = list(config.keys())
+        bl_experiments = [baseline[0] for _, baseline in config.items()]
+        bl_experiments = sorted(set(bl_experiments))   # Unique list
+        df = create_dataframe(df, summary, bl_experiments, tl_experiments)
         df.to_csv(f'{DATA_DIR}/tl_data.csv', sep=',')
 
 
-def load_experiments(experiment_paths):
-    all_experiments = []
-    for experiment_path in experiment_paths:
-        exp_data = []
-        for exp in experiment_path.iterdir():
-            if exp.is_file():
-                exp_data.append(load_json('', exp))
-        all_experiments.append(exp_data)
-    return all_experiments
-
-
-def create_dataframe(df, baseline_experiments, tl_experiments):
-    N_bl, N_tl = len(baseline_experiments), len(tl_experiments)
-    for N, exps in zip([N_bl, N_tl], [baseline_experiments, tl_experiments]):
-        for exp_idx in range(N):
-            exp_run_data = exps[exp_idx]
-            for run_idx, run in enumerate(exp_run_data):
-                # I accidentally did 30 experiments for the LF->HF experiments,
-                # but as it turns out, 10 runs gives same mean statistics,
-                # so it's sufficient to plot only 10 runs (also plotting
-                # all 30 runs looks messy)
-                if run_idx >= 10:
-                    break
-                name = names[run['name']]
-                dim = run['dim']
-                tmp_dict = {'Experiment name': name,
-                            'Dimension': [dim]}
-                for initpts_idx, initpts in enumerate(run['initpts']):
-                    key = f'Initial points source {initpts_idx}'
-                    tmp_dict[key] = initpts
-                initpts = run['initpts']
-                # Convergence iteration and time for all accuracies
-                con_it = run['iterations_to_gmp_convergence']
-                con_time = run['totaltime_to_gmp_convergence']
-                for tol_idx, tol in enumerate(TOLERANCES):
-                    if con_time[tol_idx] is not None:
-                        con_time[tol_idx] /= 3600 
-                    print(f'Totaltime [{tol} kcal/mol]', con_time[tol_idx])
-                    tmp_dict[f'Iterations [{tol} kcal/mol]'] = con_it[tol_idx]
-                    tmp_dict[f'Totaltime [{tol} kcal/mol]'] = con_time[tol_idx]
-                row = pd.DataFrame({**tmp_dict})
-                df = pd.concat([df, row], axis=0)
+def create_dataframe(df, summary, baseline_experiments, tl_experiments):
+    tolerances = load_config(CONFIG_FILE)['tolerances']
+    # I accidentally did 30 experiments for the LF->HF experiments,
+    # but as it turns out, 10 runs gives same mean statistics,
+    # so it's sufficient to plot only 10 runs (also plotting
+    # all 30 runs looks messy)
+    rows = summary.select([*baseline_experiments, *tl_experiments],
+                          num_runs=10)
+    initpts_columns = [summary.column('initpts')[rows],
+                       summary.column('secondary_initpts')[rows]]
+    for row_idx, summary_row in enumerate(rows):
+        name = names[summary.column('name')[summary_row]]
+        dim = int(summary.column('dimension')[summary_row])
+        tmp_dict = {'Experiment name': name,
+                    'Dimension': [dim]}
+        for initpts_idx, initpts in enumerate(initpts_columns):
+            if initpts[row_idx] >= 0:           # -1 if missing
+                key = f'Initial points source {initpts_idx}'
+                tmp_dict[key] = int(initpts[row_idx])
+        # Convergence iteration and time for all accuracies
+        for tol in tolerances:
+            con_it = summary.column('iterations', tol)[summary_row]
+            con_time = summary.column('totaltime', tol)[summary_row] / 3600
+            con_it = None if np.isnan(con_it) else int(con_it)
+            con_time = None if np.isnan(con_time) else con_time
+            print(f'Totaltime [{tol} kcal/mol]', con_time)
+            tmp_dict[f'Iterations [{tol} kcal/mol]'] = con_it
+            tmp_dict[f'Totaltime [{tol} kcal/mol]'] = con_time
+        row = pd.DataFrame({**tmp_dict})
+        df = pd.concat([df, row], axis=0)
     df.reset_index(inplace=True, drop=True)
     return df
 
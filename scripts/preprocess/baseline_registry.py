@@ -0,0 +1,90 @@
+import sys
+from pathlib import Path
+# Add path to use read_write.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.read_write import load_json, save_json
+from src.timings import accumulate_acquisition_times
+
+REGISTRY_NAME = 'baseline_registry.json'
+
+
+class BaselineRegistry:
+    """Data of the baseline experiments which the multi-task experiments
+    need, by baseline name: the truemin, and for each run the cumulative
+    acquisition times and the total times.
+
+    An entry is created from the records of a baseline that has just been
+    derived, taken from the registry persisted in the processed data
+    folder, or read once from the processed runs. Persisted entries are
+    only used if the baseline has not been derived again since, which is
+    checked with the hash of its derivation inputs (see
+    manifest.hash_derived_inputs).
+
+    Args:
+        processed_data_dir (Path): Path to processed data.
+        parsed_data_dict (dict): Runs of each experiment, see
+        create_parsed_dict.
+        derived_manifest (dict): Hash of the derivation inputs of each
+        experiment.
+        stale_experiments (set): Experiments which are derived again, their
+        persisted entries are not used.
+    """
+
+    def __init__(self, processed_data_dir, parsed_data_dict, derived_manifest,
+                 stale_experiments):
+        self.processed_data_dir = Path(processed_data_dir)
+        self.parsed_data_dict = parsed_data_dict
+        self.derived_manifest = derived_manifest
+        self.entries = {}
+        registry_path = self.processed_data_dir.joinpath(REGISTRY_NAME)
+        persisted = load_json('', registry_path) \
+            if registry_path.is_file() else {}
+        self._persisted = {
+            exp: entry for exp, entry in persisted.items()
+            if exp not in stale_experiments and
+            entry['hash'] == derived_manifest.get(exp)}
+
+    def register(self, exp, records):
+        """Creates the entry of a baseline from its processed records.
+
+        Args:
+            exp (str): Name of baseline experiment.
+            records (dict): Processed records by run name (e.g. 'exp_1').
+        """
+        runs = [records[run] for run in self.parsed_data_dict[exp]]
+        self.entries[exp] = {
+            'hash': self.derived_manifest[exp],
+            'truemin': runs[0]['truemin'][0],
+            'acq_times': [accumulate_acquisition_times(data['acq_times'])
+                          for data in runs],
+            'total_time': [list(data['total_time']) for data in runs]}
+
+    def get(self, exp):
+        """Returns the entry of a baseline, see register.
+
+        Args:
+            exp (str): Name of baseline experiment.
+
+        Returns:
+            dict: Hash of the derivation inputs, 'truemin', and per run the
+            cumulative 'acq_times' and the 'total_time'.
+        """
+        if exp not in self.entries:
+            if exp in self._persisted:
+                self.entries[exp] = self._persisted[exp]
+            else:
+                self.register(exp, {
+                    run: load_json(str(self.processed_data_dir) + f'/{exp}/',
+                                   f'{run}.json')
+                    for run in self.parsed_data_dict[exp]})
+        return self.entries[exp]
+
+    def save(self):
+        """Persists the registry in the processed data folder. Entries of
+        experiments which are not in the processed data anymore are
+        dropped."""
+        entries = {**self._persisted, **self.entries}
+        entries = {exp: entries[exp] for exp in sorted(entries)
+                   if exp in self.derived_manifest}
+        save_json(entries, str(self.processed_data_dir), f'/{REGISTRY_NAME}')
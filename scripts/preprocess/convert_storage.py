@@ -0,0 +1,53 @@
+import sys
+import click
+from pathlib import Path
+# Add path to use read_write.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.read_write import convert_run_file, STORAGE_FORMATS
+
+THESIS_DIR = Path(__file__).resolve().parent.parent.parent
+
+
+@click.command()
+@click.option('--setup', default='transfer_learning',
+    help="Chose either 'transfer_learning' or 'multi_task_learning'.")
+@click.option('--storage', default='npz', type=click.Choice(STORAGE_FORMATS),
+    help='Storage format to convert the processed runs to.')
+def main(setup, storage):
+    PROCESSED_DATA_DIR = THESIS_DIR / f'data/{setup}' / 'processed'
+    converted_files = convert_processed_runs(PROCESSED_DATA_DIR, storage)
+    print(f'Converted {len(converted_files)} files to {storage}.')
+
+
+def convert_processed_runs(processed_data_dir, storage, experiments=None):
+    """Converts the run files (including subrun files) of the experiments
+    in the processed data folder to the given storage format.
+
+    Files directly in the processed data folder (parsed_dict.json,
+    manifest.json) are not converted.
+
+    Args:
+        processed_data_dir (Path): Path to processed data.
+        storage (str): Either 'json' or 'npz'.
+        experiments (list, optional): Names of the experiments to convert.
+        Defaults to None, i.e. all experiments.
+
+    Returns:
+        list: Paths of the converted files.
+    """
+    if experiments is None:
+        experiments = [path.name for path in processed_data_dir.iterdir()
+                       if path.is_dir()]
+    other_storage = [suffix for suffix in STORAGE_FORMATS if suffix != storage]
+    converted_files = []
+    for exp in sorted(experiments):
+        for suffix in other_storage:
+            for file_path in sorted(
+                    processed_data_dir.joinpath(exp).rglob(f'*.{suffix}')):
+                converted_files.append(convert_run_file(file_path, storage))
+    return converted_files
+
+
+if __name__ == '__main__':
+    main()
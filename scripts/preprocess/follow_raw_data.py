@@ -0,0 +1,215 @@
+import os
+import pickle
+import sys
+import time
+import click
+from functools import partial
+from pathlib import Path
+# Add path to use read_write.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.read_write import save_json
+from src.raw_input import split_locator, COMPRESSED_SUFFIXES
+from parse_raw_data import BossOutputParser, BossRstParser, \
+    get_parsed_results, add_rst_results, get_rst_path, \
+    get_experiment_locators, collect_parse_tasks, THESIS_DIR, PARSER_VERSION
+
+# Suffix of the files holding the follower state next to the live records
+STATE_SUFFIX = '.follow.pkl'
+# Number of bytes before the offset which are compared to detect files that
+# have been replaced by different content (rsync replaces files instead of
+# appending to them)
+CHECK_LENGTH = 4096
+
+
+@click.command()
+@click.option('--setup', default='transfer_learning',
+    help="Chose either 'transfer_learning' or 'multi_task_learning'.")
+@click.option('--interval', default=60., type=float,
+    help='Seconds between two polls.')
+@click.option('--polls', default=1, type=int,
+    help='Number of polls, 0 to poll until interrupted.')
+def main(setup, interval, polls):
+    """Parses the lines appended to the boss.out and boss.rst files of
+    running BOSS jobs since the last poll into live records.
+
+    The records are written to data/{setup}/live and have the format of the
+    parsed records in data/{setup}/interim. Only runs whose files grew are
+    read and written again, so a poll costs about the appended bytes.
+    """
+    RAW_DATA_DIR = THESIS_DIR / f'data/{setup}' / 'raw'
+    LIVE_DATA_DIR = THESIS_DIR / f'data/{setup}' / 'live'
+    followers = {}
+    poll_idx = 0
+    while True:
+        updated = poll_runs(RAW_DATA_DIR, LIVE_DATA_DIR, followers)
+        print(f'Poll {poll_idx + 1}: updated {len(updated)} runs')
+        poll_idx += 1
+        if polls > 0 and poll_idx >= polls:
+            break
+        time.sleep(interval)
+
+
+def poll_runs(raw_data_dir, live_data_dir, followers):
+    """Polls all runs in the raw data and updates the live records of the
+    runs that grew since the last poll.
+
+    Args:
+        raw_data_dir (Path): Path to raw data.
+        live_data_dir (Path): Path to live records.
+        followers (dict): Followers by live record path, kept between
+        polls. Followers which are not in the dict are loaded from their
+        state file, or created.
+
+    Returns:
+        dict: Updated live records by path.
+    """
+    live_data_dir.mkdir(parents=True, exist_ok=True)
+    experiments = list(get_experiment_locators(raw_data_dir).keys())
+    updated = {}
+    for file_path, exp, json_path in collect_parse_tasks(
+            raw_data_dir, live_data_dir, experiments):
+        if not is_followable(file_path):
+            continue
+        follower = followers.get(json_path)
+        if follower is None:
+            follower = load_follower(json_path, file_path, exp)
+            followers[json_path] = follower
+        if not follower.poll():
+            continue
+        save_follower(follower, json_path)
+        results = follower.get_results()
+        if results is not None:
+            save_json(results, '', json_path)
+            updated[json_path] = results
+    return updated
+
+
+def is_followable(file_path):
+    """Returns False for compressed files and archive members, which are
+    not written by running jobs."""
+    path, member = split_locator(file_path)
+    return member is None and \
+        os.path.splitext(path)[1] not in COMPRESSED_SUFFIXES
+
+
+def load_follower(json_path, file_path, exp):
+    """Returns the follower stored next to the live record, or a new one if
+    there is none or it has been written by another parser version."""
+    state_path = json_path + STATE_SUFFIX
+    if os.path.isfile(state_path):
+        with open(state_path, 'rb') as f:
+            follower = pickle.load(f)
+        if follower.parser_version == PARSER_VERSION and \
+                follower.out.path == file_path:
+            return follower
+    return BossRunFollower(file_path, exp)
+
+
+def save_follower(follower, json_path):
+    """Saves the follower next to the live record (written atomically, see
+    save_json)."""
+    state_path = json_path + STATE_SUFFIX
+    tmp_path = f'{state_path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(follower, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, state_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class FileFollower:
+    """Feeds the complete lines appended to a file since the last poll to a
+    parser.
+
+    The byte offset, the last bytes before it and an incomplete last line
+    are kept, so that the following poll only reads the appended bytes. If
+    the file shrank or the bytes before the offset changed, the file is
+    read again from the start with a new parser.
+
+    Args:
+        path (str): Path of the file.
+        new_parser (callable): Returns a new parser with a method feed.
+    """
+
+    def __init__(self, path, new_parser):
+        self.path = str(path)
+        self.new_parser = new_parser
+        self._reset()
+
+    def _reset(self):
+        self.parser = self.new_parser()
+        self.offset = 0
+        self._tail = b''        # last bytes before the offset
+        self._partial = b''     # incomplete last line
+        self._mtime = None
+
+    def poll(self):
+        """Parses the lines appended since the last poll.
+
+        Returns:
+            bool: True if the file changed.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if stat.st_size == self.offset and stat.st_mtime_ns == self._mtime:
+            return False
+        with open(self.path, 'rb') as f:
+            if not self._continues(f, stat.st_size):
+                self._reset()
+            f.seek(self.offset)
+            data = f.read(stat.st_size - self.offset)
+        self._mtime = stat.st_mtime_ns
+        if len(data) == 0:
+            return False
+        self.offset += len(data)
+        self._tail = (self._tail + data)[-CHECK_LENGTH:]
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+        for line in lines:
+            self.parser.feed(line.decode() + '\n')
+        return True
+
+    def _continues(self, f, size):
+        if size < self.offset:
+            return False
+        f.seek(self.offset - len(self._tail))
+        return f.read(len(self._tail)) == self._tail
+
+
+class BossRunFollower:
+    """Follows the boss.out and boss.rst files of a running BOSS job.
+
+    Args:
+        file_path (str): Path of boss.out.
+        exp (str): Name of descriptive experiment.
+    """
+
+    def __init__(self, file_path, exp):
+        self.parser_version = PARSER_VERSION
+        self.out = FileFollower(file_path, partial(BossOutputParser, exp))
+        self.rst = FileFollower(get_rst_path(file_path), BossRstParser)
+
+    def poll(self):
+        """Returns True if boss.out or boss.rst changed."""
+        out_changed = self.out.poll()
+        rst_changed = self.rst.poll()
+        return out_changed or rst_changed
+
+    def get_results(self):
+        """Returns the record parsed so far (see
+        read_and_preprocess_boss_output), or None if no data point has been
+        added yet."""
+        if len(self.out.parser.buffers['xy']) == 0:
+            return None
+        results = get_parsed_results(self.out.parser)
+        add_rst_results(results, self.rst.parser, self.out.path)
+        return results
+
+
+if __name__ == '__main__':
+    main()
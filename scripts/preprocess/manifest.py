@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+# Add path to use read_write.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.read_write import load_json, save_json
+from src.raw_input import open_raw_binary, raw_file_stat, split_locator
+
+MANIFEST_NAME = 'manifest.json'
+# Entries of a file fingerprint which decide if the file has changed. The
+# mtime is only used to skip hashing files that have not been touched.
+FINGERPRINT_KEYS = ('path', 'size', 'sha256')
+
+
+def load_manifest(processed_data_dir):
+    """Returns the manifest of a data folder, or an empty manifest if there
+    is none yet.
+
+    The manifest of the parsed records maps the path of every .json record
+    (relative to the interim data folder) to the fingerprints of its input
+    files and the parser version. The manifest of the processed data maps
+    every experiment to the hash of its derivation inputs, see
+    hash_derived_inputs.
+
+    Args:
+        processed_data_dir (Path): Path to interim or processed data.
+
+    Returns:
+        dict: Manifest entries.
+    """
+    manifest_path = Path(processed_data_dir) / MANIFEST_NAME
+    if not manifest_path.is_file():
+        return {}
+    return load_json('', manifest_path)
+
+
+def save_manifest(manifest, processed_data_dir):
+    save_json(manifest, str(processed_data_dir), f'/{MANIFEST_NAME}')
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """Returns the sha256 hex digest of a file, read in chunks.
+
+    Compressed files are hashed as stored, members of tar archives by their
+    content (see src/raw_input.py).
+    """
+    sha256 = hashlib.sha256()
+    _, member = split_locator(path)
+    with (open(path, 'rb') if member is None else
+          open_raw_binary(path)) as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def fingerprint_file(path, previous=None, root=None):
+    """Returns path, size, mtime and content hash of a file.
+
+    The content hash of the previous fingerprint is reused if size and mtime
+    did not change, so that only new or touched files are read.
+
+    Args:
+        path (str): Path to file.
+        previous (dict, optional): Previous fingerprint of the file.
+        Defaults to None.
+        root (str, optional): If given, the path is stored relative to
+        root. Defaults to None.
+
+    Returns:
+        dict: Fingerprint of the file.
+    """
+    size, mtime = raw_file_stat(path)
+    stored_path = str(path) if root is None else os.path.relpath(path, root)
+    fingerprint = {'path': stored_path, 'size': size, 'mtime': mtime}
+    if previous is not None and previous['path'] == fingerprint['path'] \
+            and previous['size'] == fingerprint['size'] \
+            and previous['mtime'] == fingerprint['mtime']:
+        fingerprint['sha256'] = previous['sha256']
+    else:
+        fingerprint['sha256'] = hash_file(path)
+    return fingerprint
+
+
+def hash_config(config, exp):
+    """Returns a hash of the configuration entries used to process the
+    experiment 'exp'.
+
+    Args:
+        config (Config): Content of config_tl.yaml or config_mt.yaml.
+        exp (str): Name of experiment.
+    """
+    relevant_config = {
+        'baseline': config['baselines'].get(exp),
+        'experiment': config['experiments'].get(exp),
+        'tolerances': config['tolerances']}
+    serialized = json.dumps(relevant_config, sort_keys=True)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def hash_derived_inputs(exp, parse_manifest, config, preprocess_version,
+                        storage='json'):
+    """Returns a hash of everything the processed data of the experiment
+    'exp' is derived from, except for the data of other experiments: its
+    parsed records, its configuration, the preprocessing version and the
+    storage format.
+
+    Args:
+        exp (str): Name of experiment.
+        parse_manifest (dict): Manifest of the parsed records.
+        config (Config): Content of config_tl.yaml or config_mt.yaml.
+        preprocess_version (int): Version of the preprocessing.
+        storage (str, optional): Storage format of the processed runs.
+        Defaults to 'json'.
+    """
+    records = {key: {'inputs': [[fingerprint[k] for k in FINGERPRINT_KEYS]
+                                for fingerprint in entry['inputs']],
+                     'parser_version': entry['parser_version']}
+               for key, entry in parse_manifest.items()
+               if entry['experiment'] == exp}
+    derived_inputs = {'records': records,
+                      'config_hash': hash_config(config, exp),
+                      'preprocess_version': preprocess_version,
+                      'storage': storage}
+    serialized = json.dumps(derived_inputs, sort_keys=True)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def create_entry(input_paths, exp, parser_version, previous=None, root=None):
+    """Returns the manifest entry of a parsed run.
+
+    Args:
+        input_paths (list): Paths of the input files (boss.out, boss.rst).
+        exp (str): Name of experiment.
+        parser_version (int): Version of the parser.
+        previous (dict, optional): Previous manifest entry of the run.
+        Defaults to None.
+        root (str, optional): Input paths are stored relative to root.
+        Defaults to None.
+    """
+    previous_inputs = {} if previous is None else \
+        {fingerprint['path']: fingerprint for fingerprint
+         in previous['inputs']}
+    inputs = []
+    for path in input_paths:
+        key = str(path) if root is None else os.path.relpath(path, root)
+        inputs.append(fingerprint_file(path, previous_inputs.get(key), root))
+    return {'experiment': exp,
+            'inputs': inputs,
+            'parser_version': parser_version}
+
+
+def has_changed(entry, previous):
+    """Returns True if the manifest entry differs from the previous one in
+    the inputs or the parser version."""
+    if previous is None:
+        return True
+    if entry['parser_version'] != previous['parser_version']:
+        return True
+    if len(entry['inputs']) != len(previous['inputs']):
+        return True
+    for fingerprint, previous_fingerprint in zip(entry['inputs'],
+                                                 previous['inputs']):
+        for key in FINGERPRINT_KEYS:
+            if fingerprint[key] != previous_fingerprint[key]:
+                return True
+    return False
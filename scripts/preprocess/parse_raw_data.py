@@ -1,215 +1,558 @@
 import numpy as np
 import copy
-import json
 import os
 import shutil
 import preprocess
 import sys
 import click
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 # Add path to use read_write.py
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from src.read_write import load_yaml, load_json, save_json
+from src.catalog import ExperimentCatalog, CATALOG_NAME
+from src.config import load_config
+from src.read_write import load_json, save_json, STORAGE_FORMATS
+from src.summary import write_summary
+from src.raw_input import open_raw_file, resolve_raw_file, join_locator, \
+    parent_locator, list_raw_dirs, is_archive, strip_archive_suffix, \
+    close_archives, ARCHIVE_SEPARATOR, COMPRESSED_SUFFIXES
+from convert_storage import convert_processed_runs
+from baseline_registry import BaselineRegistry
+from manifest import load_manifest, save_manifest, create_entry, \
+    has_changed, hash_derived_inputs
 
 # folder locations for raw and processed data
 THESIS_DIR = Path(__file__).resolve().parent.parent.parent
 
 verbose = False
+# Version of the parsed .json files. Increase when the parser changes, so
+# that all runs are parsed again.
+PARSER_VERSION = 1
+# Increase to derive all processed data again after changing preprocess.py
+PREPROCESS_VERSION = 1
+
 
 @click.command()
 @click.option('--setup', default='transfer_learning',
     help="Chose either 'transfer_learning' or 'multi_task_learning'.")
-def main(setup):
+@click.option('--jobs', default=1, type=int,
+    help='Number of processes used to parse the boss.out files.')
+@click.option('--full', default=False, is_flag=True,
+    help='Parse and preprocess all runs again, instead of only the changed '
+         'ones.')
+@click.option('--derive_only', default=False, is_flag=True,
+    help='Skip parsing and only recompute the processed data from the '
+         'parsed records, e.g. after changing tolerances or truemin sources.')
+@click.option('--storage', default='json', type=click.Choice(STORAGE_FORMATS),
+    help="Storage format of the processed runs. 'npz' stores numeric series "
+         "as binary arrays, which is smaller and faster to load.")
+def main(setup, jobs, full, derive_only, storage):
     RAW_DATA_DIR = THESIS_DIR / f'data/{setup}' / 'raw'
+    # Parsed records of the boss.out files, not modified after parsing
+    INTERIM_DATA_DIR = THESIS_DIR / f'data/{setup}' / 'interim'
+    # Data derived from the parsed records (offsets, convergence, B, ...)
     PROCESSED_DATA_DIR = THESIS_DIR / f'data/{setup}' / 'processed'
-    rm_tree(PROCESSED_DATA_DIR)     # removing existing directory if it exists
-    PROCESSED_DATA_DIR.mkdir()
-    parsed_data_dict = create_parsed_dict(RAW_DATA_DIR, PROCESSED_DATA_DIR)
-    all_experiments = list(parsed_data_dict.keys())
+    if full:
+        # removing existing directories if they exist
+        rm_tree(INTERIM_DATA_DIR)
+        rm_tree(PROCESSED_DATA_DIR)
     # CONFIG contains experiment names and truemin sources
-    config_tl = load_yaml(THESIS_DIR.joinpath('scripts'), '/config_tl.yaml')
-    config_mt = load_yaml(THESIS_DIR.joinpath('scripts'), '/config_mt.yaml')
-    CONFIG = config_tl if setup == 'transfer_learning' else config_mt
-
-    for exp in all_experiments:
-        exp_path = RAW_DATA_DIR.joinpath(exp)
-        exp_batch = [x for x in exp_path.iterdir() if
-                     x.is_dir() and 'exp' in str(x)]
+    config_file = 'config_tl.yaml' if setup == 'transfer_learning' \
+        else 'config_mt.yaml'
+    CONFIG = load_config(config_file)
+
+    if not derive_only:
+        run_parse_stage(RAW_DATA_DIR, INTERIM_DATA_DIR, jobs)
+    run_derive_stage(INTERIM_DATA_DIR, PROCESSED_DATA_DIR, CONFIG, storage)
+
+
+def run_parse_stage(raw_data_dir, interim_data_dir, jobs=1):
+    """Parses the boss.out files of the runs that changed since the last call
+    into .json records in the interim data folder (see manifest.json there).
+
+    Args:
+        raw_data_dir (Path): Path to raw data.
+        interim_data_dir (Path): Path to parsed records.
+        jobs (int, optional): Number of processes. Defaults to 1.
+    """
+    interim_data_dir.mkdir(parents=True, exist_ok=True)
+    parsed_data_dict = create_parsed_dict(raw_data_dir, interim_data_dir)
+    parse_tasks = collect_parse_tasks(raw_data_dir, interim_data_dir,
+                                      list(parsed_data_dict.keys()))
+    manifest = load_manifest(interim_data_dir)
+    parse_tasks, manifest = select_parse_tasks(parse_tasks, manifest,
+                                               interim_data_dir)
+    parse_all(parse_tasks, jobs)
+    # The manifest is only updated after all runs have been parsed
+    save_manifest(manifest, interim_data_dir)
+
+
+def run_derive_stage(interim_data_dir, processed_data_dir, config,
+                     storage='json'):
+    """Derives the processed data from the parsed records.
+
+    The parsed records are copied, shifted by the truemin and extended by
+    model times, convergence measures and B matrices. Subruns of '_r'
+    experiments are merged. Only the experiments whose parsed records or
+    configuration changed since the last call, and the experiments that
+    depend on them, are derived again (see manifest.json in the processed
+    data folder). Afterwards, the runs of the setup are updated in the
+    experiment catalog data/catalog.sqlite (see src/catalog.py) and their
+    convergence statistics are written to processed/summary.npz (see
+    src/summary.py).
+
+    Args:
+        interim_data_dir (Path): Path to parsed records.
+        processed_data_dir (Path): Path to processed data.
+        config (Config): Content of config_tl.yaml or config_mt.yaml.
+        storage (str, optional): Storage format of the processed runs,
+        either 'json' or 'npz'. Defaults to 'json'.
+    """
+    processed_data_dir.mkdir(parents=True, exist_ok=True)
+    parsed_data_dict = load_json(interim_data_dir, '/parsed_dict.json')
+    save_json(parsed_data_dict, processed_data_dir, '/parsed_dict.json')
+    parse_manifest = load_manifest(interim_data_dir)
+    derived_manifest = load_manifest(processed_data_dir)
+
+    new_derived_manifest = {
+        exp: hash_derived_inputs(exp, parse_manifest, config,
+                                 PREPROCESS_VERSION, storage)
+        for exp in parsed_data_dict}
+    for exp in derived_manifest:
+        if exp not in new_derived_manifest and \
+                processed_data_dir.joinpath(exp).is_dir():
+            rm_tree(processed_data_dir.joinpath(exp))
+    changed_experiments = set(
+        exp for exp in new_derived_manifest
+        if new_derived_manifest[exp] != derived_manifest.get(exp) or
+        not processed_data_dir.joinpath(exp).is_dir())
+    stale_experiments = get_stale_experiments(changed_experiments, config) \
+        & set(parsed_data_dict.keys())
+    for exp in stale_experiments:
+        rm_tree(processed_data_dir.joinpath(exp))
+        processed_data_dir.joinpath(exp).mkdir()
+
+    CONFIG_BASELINES = config['baselines']
+    tolerances = config['tolerances']
+    multi_task_experiments = config['experiments']
+    # Truemin sources are baselines too, even if not listed as such
+    baseline_sources = {exp: source for exp, source in
+                        CONFIG_BASELINES.items()}
+    for source in CONFIG_BASELINES.values():
+        baseline_sources.setdefault(source, source)
+
+    # The experiments are derived after the experiments they depend on, so
+    # that the data of each baseline is registered before it is used
+    registry = BaselineRegistry(processed_data_dir, parsed_data_dict,
+                                new_derived_manifest, stale_experiments)
+    truemins = {}
+    for exp in get_derivation_order(stale_experiments, config):
+        processed_exp_dir = processed_data_dir.joinpath(exp)
+        if exp in baseline_sources:
+            source = baseline_sources[exp]
+            if source not in truemins:
+                truemins[source] = get_truemin(interim_data_dir, source)
+            records = derive_baseline(
+                interim_data_dir.joinpath(exp), processed_exp_dir,
+                parsed_data_dict[exp], truemins[source], tolerances)
+            registry.register(exp, records)
+        if exp in multi_task_experiments:
+            derive_multi_task_experiment(
+                interim_data_dir.joinpath(exp), processed_exp_dir,
+                parsed_data_dict[exp], multi_task_experiments[exp],
+                registry, tolerances)
+        # Experiments which are not in the config are not preprocessed
+        if exp not in baseline_sources and exp not in multi_task_experiments:
+            for record_path in interim_data_dir.joinpath(exp).iterdir():
+                shutil.copy(record_path, processed_exp_dir)
+    registry.save()
+
+    # The runs are derived as .json files and converted afterwards, since
+    # the steps above read the .json files of the baselines
+    convert_processed_runs(processed_data_dir, storage, stale_experiments)
+
+    # The manifest is only updated after all steps have succeeded
+    save_manifest(new_derived_manifest, processed_data_dir)
+
+    # processed_data_dir is data/{setup}/processed
+    setup = processed_data_dir.parent.name
+    with ExperimentCatalog(
+            processed_data_dir.parent.parent / CATALOG_NAME) as catalog:
+        catalog.sync_setup(setup, processed_data_dir, new_derived_manifest,
+                           config, stale_experiments)
+    write_summary(processed_data_dir, new_derived_manifest, config,
+                  stale_experiments)
+
+
+def derive_baseline(interim_exp_dir, processed_exp_dir, exp_runs, truemin,
+                    tolerances):
+    """Derives the processed records of a baseline experiment.
+
+    Args:
+        interim_exp_dir (Path): Parsed records of the experiment.
+        processed_exp_dir (Path): Processed data folder of the experiment.
+        exp_runs (list): Runs of the experiment, e.g. ['exp_1', 'exp_2'].
+        truemin (list): Truemin of the truemin source.
+        tolerances (list): Tolerance levels.
+
+    Returns:
+        dict: Processed records by run name.
+    """
+    derived_records = {}
+    for record_path in sorted(interim_exp_dir.iterdir()):
+        derived_records.update(derive_record(
+            record_path, processed_exp_dir, truemin, tolerances))
+    if '_r' in processed_exp_dir.name:
+        return merge_subruns(processed_exp_dir, exp_runs, derived_records)
+    return {path.stem: data for path, data in derived_records.items()}
+
+
+def derive_multi_task_experiment(interim_exp_dir, processed_exp_dir,
+                                 exp_runs, baselines, registry, tolerances):
+    """Derives the processed records of a multi-task experiment, which
+    takes the truemins and the cost of the initialization data from its
+    baselines.
+
+    Args:
+        interim_exp_dir (Path): Parsed records of the experiment.
+        processed_exp_dir (Path): Processed data folder of the experiment.
+        exp_runs (list): Runs of the experiment, e.g. ['exp_1', 'exp_2'].
+        baselines (list): Baseline and initialization strategy of each
+        task, see config_tl.yaml.
+        registry (BaselineRegistry): Data of the baselines.
+        tolerances (list): Tolerance levels.
+    """
+    truemin, init_times = [], []
+    # Get data from all used baselines for initialization
+    for baseline_exp, baseline_init_strategy in baselines:
+        baseline = registry.get(baseline_exp)
+        truemin.append(baseline['truemin'])
+        if baseline_init_strategy == 'self':
+            init_time = None    # This is 'BO random', not used anymore
+        elif baseline_init_strategy == 'random':
+            init_time = baseline['acq_times']
+        elif baseline_init_strategy == 'inorder':
+            init_time = baseline['total_time']
+        else:
+            raise ValueError("Unknown initialization strategy")
+        init_times.append(init_time)
+
+    record_paths = sorted(interim_exp_dir.iterdir())
+    derived_records = {}
+    for tl_exp_idx, filename in enumerate(exp_runs):
+        initial_data_cost = []
+        for init_time in init_times:
+            if init_time is None:
+                initial_data_cost.append(None)
+            else:
+                N_baselines = len(init_time)
+                initial_data_cost.append(init_time[(tl_exp_idx
+                                                    % N_baselines)])
+        if '_r' not in processed_exp_dir.name:
+            derive_record(interim_exp_dir.joinpath(f'{filename}.json'),
+                          processed_exp_dir, truemin, tolerances,
+                          initial_data_cost)
+        else:
+            for record_path in record_paths:
+                if filename in str(record_path):
+                    derived_records.update(derive_record(
+                        record_path, processed_exp_dir, truemin,
+                        tolerances))
+    if '_r' in processed_exp_dir.name:
+        merge_subruns(processed_exp_dir, exp_runs, derived_records)
+
+
+def get_derivation_order(experiments, config):
+    """Returns the experiments sorted such that every experiment comes after
+    the experiments it depends on (see get_dependencies).
+
+    Args:
+        experiments (set): Names of the experiments.
+        config (Config): Content of config_tl.yaml or config_mt.yaml.
+    """
+    dependencies = get_dependencies(config)
+    order, done = [], set()
+    remaining = sorted(experiments)
+    while len(remaining) > 0:
+        ready = [exp for exp in remaining
+                 if (dependencies[exp] & experiments) <= done]
+        if len(ready) == 0:
+            raise ValueError(f'Cyclic dependencies between {remaining}')
+        order += ready
+        done.update(ready)
+        remaining = [exp for exp in remaining if exp not in done]
+    return order
+
+
+def get_truemin(interim_data_dir, exp):
+    """Returns the truemin, i.e. the lowest best acquisition of all runs of
+    a truemin source experiment.
+
+    Args:
+        interim_data_dir (Path): Path to parsed records.
+        exp (str): Name of truemin source experiment.
+    """
+    best_acqs = []
+    for record_path in sorted(interim_data_dir.joinpath(exp).iterdir()):
+        results = load_json('', record_path)
+        best_acqs.append(preprocess.get_best_acquisition(results))
+    best_acqs = np.array(best_acqs)
+    return [best_acqs[np.argmin(best_acqs[:, -1]), :].tolist()]
+
+
+def derive_record(record_path, processed_exp_dir, truemin, tolerances,
+                  init_data_cost=None):
+    """Preprocesses a parsed record and saves it in the processed data
+    folder under the same name.
+
+    Args:
+        record_path (Path): Path to parsed record.
+        processed_exp_dir (Path): Processed data folder of the experiment.
+        truemin (list): Truemin of each source.
+        tolerances (list): Tolerance levels.
+        init_data_cost (list, optional): See preprocess.preprocess.
+        Defaults to None.
+
+    Returns:
+        dict: Path of the processed record and its content.
+    """
+    data = load_json('', record_path)
+    data['truemin'] = truemin
+    data = preprocess.preprocess(data, tolerances, init_data_cost)
+    save_json(data, str(processed_exp_dir), f'/{record_path.name}')
+    return {processed_exp_dir.joinpath(record_path.name): data}
+
+
+def merge_subruns(processed_exp_dir, exp_runs, derived_records):
+    """Merges the preprocessed subruns of each run of an '_r' experiment
+    (see preprocess.merge_subrun_records) and moves the subrun files to the
+    folder 'subrun_files'.
+
+    Args:
+        processed_exp_dir (Path): Processed data folder of the experiment.
+        exp_runs (list): Runs of the experiment, e.g. ['exp_1', 'exp_2'].
+        derived_records (dict): Preprocessed subrun records by path, see
+        derive_record. The records are merged in memory instead of being
+        read again.
+
+    Returns:
+        dict: Merged records by run name.
+    """
+    all_subrun_paths = sorted(derived_records)
+    merged_records = {}
+    for sub_exp in exp_runs:
+        subrun_paths = [path for path in all_subrun_paths if
+                        sub_exp in str(path)]
+        merged_results = preprocess.merge_subrun_records(
+            [derived_records[path] for path in subrun_paths])
+        save_json(merged_results, str(processed_exp_dir), f'/{sub_exp}.json')
+        merged_records[sub_exp] = merged_results
+    subrun_dir = processed_exp_dir.joinpath('subrun_files')
+    subrun_dir.mkdir()
+    for subrun in all_subrun_paths:
+        if 'subrun' in str(subrun):
+            shutil.move(os.path.join(subrun_dir.parent, subrun),
+                        subrun_dir)
+    return merged_records
+
+
+def select_parse_tasks(tasks, manifest, interim_data_dir):
+    """Selects the runs which have to be parsed again and returns the
+    updated manifest.
+
+    A run is parsed again if its boss.out or boss.rst file changed, if the
+    parser version changed, or if its .json record is missing. Records of
+    runs that are not in the raw data anymore are removed.
+
+    Args:
+        tasks (list): All tasks, see collect_parse_tasks.
+        manifest (dict): Manifest of the last call, see manifest.py.
+        interim_data_dir (Path): Path to parsed records.
+
+    Returns:
+        tuple: Selected tasks and new manifest.
+    """
+    new_manifest, selected_tasks = {}, []
+    for task in tasks:
+        file_path, exp, json_path = task
+        key = os.path.relpath(json_path, interim_data_dir)
+        rst_path = get_rst_path(file_path)
+        entry = create_entry([file_path, rst_path], exp, PARSER_VERSION,
+                             manifest.get(key),
+                             root=interim_data_dir.parent)
+        new_manifest[key] = entry
+        if has_changed(entry, manifest.get(key)) or \
+                not Path(json_path).is_file():
+            selected_tasks.append(task)
+
+    experiments = set(exp for _, exp, _ in tasks)
+    for key, entry in manifest.items():
+        if key in new_manifest:
+            continue
+        json_path = interim_data_dir.joinpath(key)
+        if json_path.is_file():
+            json_path.unlink()
+        if entry['experiment'] not in experiments:
+            rm_tree(interim_data_dir.joinpath(entry['experiment']))
+    return selected_tasks, new_manifest
+
+
+def get_dependencies(config):
+    """Returns for each experiment in the config the set of experiments it
+    takes processed data from (truemin source and initialization data).
+
+    Args:
+        config (Config): Content of config_tl.yaml or config_mt.yaml.
+    """
+    dependencies = defaultdict(set)
+    for exp, source in config['baselines'].items():
+        if source != exp:
+            dependencies[exp].add(source)
+    for exp, baselines in config['experiments'].items():
+        dependencies[exp].update(baseline for baseline, _ in baselines)
+    return dependencies
+
+
+def get_stale_experiments(changed_experiments, config):
+    """Returns the changed experiments together with all experiments that
+    depend on them, directly or indirectly.
+
+    Args:
+        changed_experiments (set): Experiments with changed records or
+        configuration.
+        config (Config): Content of config_tl.yaml or config_mt.yaml.
+    """
+    stale_experiments = set(changed_experiments)
+    dependencies = get_dependencies(config)
+    while True:
+        dependent_experiments = set(
+            exp for exp, deps in dependencies.items()
+            if deps & stale_experiments) - stale_experiments
+        if len(dependent_experiments) == 0:
+            return stale_experiments
+        stale_experiments |= dependent_experiments
+
+
+def collect_parse_tasks(raw_data_dir, interim_data_dir, experiments):
+    """Lists the boss.out files to parse, together with the experiment name
+    and the path of the .json file to write.
+
+    Args:
+        raw_data_dir (Path): Path to raw data.
+        interim_data_dir (Path): Path to parsed records.
+        experiments (list): Names of the experiments to parse.
+
+    Returns:
+        list: Tuples (boss.out path, experiment name, json path) in a fixed
+        order.
+    """
+    tasks = []
+    exp_locators = get_experiment_locators(raw_data_dir)
+    for exp in sorted(experiments):
+        exp_path = exp_locators[exp]
+        exp_batch = [join_locator(exp_path, x) for x in
+                     list_raw_dirs(exp_path) if 'exp' in x]
         exp_batch.sort()
+        interim_data_dir.joinpath(exp).mkdir(parents=True, exist_ok=True)
         for exp_run_idx, exp_run in enumerate(exp_batch):
-            subruns = [x for x in exp_run.iterdir() if
-                       x.is_dir() and ('_r' in str(x.parent.parent))]
+            subruns = [join_locator(exp_run, x) for x in
+                       list_raw_dirs(exp_run) if '_r' in exp_path]
             if len(subruns) == 0:
-                file_path = str(exp_run.joinpath('boss.out'))
+                file_path = get_boss_out_path(exp_run)
                 json_name = f'exp_{exp_run_idx+1}.json'
-                PROCESSED_DATA_DIR.joinpath(exp).mkdir(parents=True,
-                                                       exist_ok=True)
-                json_path = str(PROCESSED_DATA_DIR.joinpath(exp, json_name))
-                parse(file_path, exp, json_path)
+                json_path = str(interim_data_dir.joinpath(exp, json_name))
+                tasks.append((file_path, exp, json_path))
             else:
-                for subrun in subruns:
-                    file_path = str(subrun.joinpath('boss.out'))
-                    subrun_str = str(subrun).split('/')[-1]
+                for subrun in sorted(subruns):
+                    file_path = get_boss_out_path(subrun)
+                    subrun_str = subrun.split('/')[-1]
                     json_name = f'exp_{exp_run_idx+1}_{subrun_str}.json'
-                    PROCESSED_DATA_DIR.joinpath(exp).mkdir(parents=True,
-                                                           exist_ok=True)
-                    json_path = str(PROCESSED_DATA_DIR.joinpath(exp,
-                                                                json_name))
-                    parse(file_path, exp, json_path)
-    #exit()
-    # Once all the raw data is processed, substract the truemin
-    # from the data. This needs to be done in another loop, since
-    # the truemin comes from different sources
-
-    # First, loop over the truemin source baseline experiments
-    baselines = CONFIG['baselines']
-    tolerances = CONFIG['tolerances']
-    multi_task_experiments = CONFIG['experiments']
-    #tl_experiments = CONFIG['TL_experiments']
-    for exp in baselines:
-        best_acqs = []
-        sub_exp_paths = [
-            x for x in PROCESSED_DATA_DIR.joinpath(baselines[exp]).iterdir()
-                        ]
-        sub_exp_paths.sort()
-        truemin_precalculated = False
-        truemin = None
-        for sub_exp_path in sub_exp_paths:
-            results = load_json('', sub_exp_path)
-            if 'truemin' in results:
-                truemin_precalculated = True
-                break
-            else:
-                best_acqs.append(preprocess.get_best_acquisition(results))
-        if truemin_precalculated is False:
-            best_acqs = np.array(best_acqs)
-            truemin = [best_acqs[np.argmin(best_acqs[:, -1]), :].tolist()]
-            for sub_exp_path in sub_exp_paths:
-                results = load_json('', sub_exp_path)
-                results['truemin'] = truemin
-                results = preprocess.preprocess(results, tolerances)
-                save_json(results, sub_exp_path, '')
-
-    # Secondly, loop over the other baseline experiments and add truemins
-    for exp in baselines:
-        sub_exp_paths = [
-            x for x in PROCESSED_DATA_DIR.joinpath(exp).iterdir()]
-        for sub_exp_path in sub_exp_paths:
-            results = load_json('', sub_exp_path)
-            if 'truemin' in results:
-                # Truemin already calculated, go to next experiment
-                break
-            else:
-                source_path = [
-                    x for x in
-                    PROCESSED_DATA_DIR.joinpath(baselines[exp]).iterdir()]
-                # Only need the truemin from one truemin source
-                # experiment, therefore access source_path[0]
-                source = load_json('', source_path[0])
-                results['truemin'] = source['truemin']
-                results = preprocess.preprocess(results, tolerances)
-                save_json(results, sub_exp_path, '')
-
-    # Merge data from the baseline subruns
-    for exp in baselines:
-        if '_r' in exp:
-            all_subrun_paths = sorted(
-                [path for path in
-                 PROCESSED_DATA_DIR.joinpath(exp).iterdir()])
-            for sub_exp in parsed_data_dict[exp]:
-                subrun_paths = [path for path in all_subrun_paths if
-                                sub_exp in str(path)]
-                merge_subrun_data(subrun_paths, sub_exp)
-            subrun_dir = PROCESSED_DATA_DIR.joinpath(exp + '/subrun_files')
-            subrun_dir.mkdir()
-            for subrun in all_subrun_paths:
-                if 'subrun' in str(subrun):
-                    shutil.move(os.path.join(subrun_dir.parent, subrun),
-                                subrun_dir)
-
-    for exp in multi_task_experiments:
-        truemin, init_times = [], []
-        # Get data from all used baselines for initialization
-        for i in range(len(multi_task_experiments[exp])):
-            init_time = []
-            baseline_exp = multi_task_experiments[exp][i][0]
-            baseline_init_strategy = multi_task_experiments[exp][i][1]
-            baseline_file = parsed_data_dict[baseline_exp][0]
-            data = load_json(
-                str(PROCESSED_DATA_DIR) +
-                f'/{baseline_exp}/', f'{baseline_file}.json')
-            truemin.append(data['truemin'][0])
-
-            if baseline_init_strategy == 'self':
-                init_time = None    # This is 'BO random', not used anymore
-            elif baseline_init_strategy == 'random':
-                for baseline_file in parsed_data_dict[baseline_exp]:
-                    data = load_json(
-                        str(PROCESSED_DATA_DIR) +
-                        f'/{baseline_exp}/', f'{baseline_file}.json')
-                    additional_time = data['acq_times'].copy()
-                    for i in range(len(data['acq_times'])):
-                        additional_time[i] += \
-                            sum(np.array(data['acq_times'])[:i])
-                    init_time.append(additional_time)
-            elif baseline_init_strategy == 'inorder':
-                for baseline_file in parsed_data_dict[baseline_exp]:
-                    data = load_json(
-                        str(PROCESSED_DATA_DIR) +
-                        f'/{baseline_exp}/', f'{baseline_file}.json')
-                    init_time.append(data['total_time'].copy())
-            else:
-                raise ValueError("Unknown initialization strategy")
-            init_times.append(init_time)
-
-        for tl_exp_idx, _ in enumerate(parsed_data_dict[exp]):
-            initial_data_cost = []
-            for init_time in init_times:
-                if init_time is None:
-                    initial_data_cost.append(None)
-                else:
-                    N_baselines = len(init_time)
-                    initial_data_cost.append(init_time[(tl_exp_idx
-                                                        % N_baselines)])
-            filename = parsed_data_dict[exp][tl_exp_idx]
-            if '_r' not in exp:
-                data = load_json(str(PROCESSED_DATA_DIR) +
-                                 f'/{exp}', f'/{filename}.json')
-                data['truemin'] = truemin
-                data = preprocess.preprocess(data, tolerances,
-                                             initial_data_cost)
-                save_json(data, str(PROCESSED_DATA_DIR) + f'/{exp}',
-                          f'/{filename}.json')
+                    json_path = str(interim_data_dir.joinpath(exp,
+                                                              json_name))
+                    tasks.append((file_path, exp, json_path))
+    return tasks
+
+
+def get_experiment_locators(raw_data_dir):
+    """Returns the location of the runs of each experiment in the raw data.
+
+    Experiments are either folders, or tar archives named after the
+    experiment (e.g. 2HFbasic1.tar.gz), which contain the run folders
+    either at the top level or in a folder named after the experiment.
+    Archives are read without extracting them, see src/raw_input.py.
+
+    Args:
+        raw_data_dir (Path): Path to raw data.
+
+    Returns:
+        dict: Experiment name and folder (or archive folder locator).
+    """
+    exp_locators = {}
+    for exp in raw_data_dir.iterdir():
+        if 'misc' in str(exp):
+            continue
+        if exp.is_dir():
+            exp_locators[exp.name] = str(exp)
+        elif exp.is_file() and is_archive(exp):
+            exp_name = strip_archive_suffix(exp.name)
+            archive_root = f'{exp}{ARCHIVE_SEPARATOR}'
+            if exp_name in list_raw_dirs(archive_root):
+                exp_locators[exp_name] = join_locator(archive_root, exp_name)
             else:
-                data_paths = [
-                    path for path in PROCESSED_DATA_DIR.joinpath(exp).iterdir()
-                    if filename in str(path)]
-                data_paths.sort()
-                for data_path in data_paths:
-                    filename = str(data_path).split('/')[-1].split('.')[0]
-                    data = load_json(str(data_path), '')
-                    data['truemin'] = truemin
-                    data = preprocess.preprocess(data, tolerances)
-                    save_json(data, str(PROCESSED_DATA_DIR) + f'/{exp}',
-                              f'/{filename}.json')
-
-    # Merge data from the transfer learning subruns
-    for exp in multi_task_experiments:
-        if '_r' in exp:
-            all_subrun_paths = sorted(
-                [path for path in
-                 PROCESSED_DATA_DIR.joinpath(exp).iterdir()])
-            for sub_exp in parsed_data_dict[exp]:
-                subrun_paths = [path for path in all_subrun_paths if
-                                sub_exp in str(path)]
-                merge_subrun_data(subrun_paths, sub_exp)
-            subrun_dir = PROCESSED_DATA_DIR.joinpath(exp + '/subrun_files')
-            subrun_dir.mkdir()
-            for subrun in all_subrun_paths:
-                if 'subrun' in str(subrun):
-                    shutil.move(os.path.join(subrun_dir.parent, subrun),
-                                subrun_dir)
+                exp_locators[exp_name] = archive_root
+    return exp_locators
+
+
+def get_boss_out_path(run_dir):
+    """Returns the location of boss.out in a run folder, which may be
+    compressed (boss.out.gz, .xz, .bz2)."""
+    return resolve_raw_file(run_dir, 'boss.out') or \
+        join_locator(run_dir, 'boss.out')
+
+
+def get_rst_path(boss_out_path):
+    """Returns the location of the .rst file next to the .out file (e.g.
+    boss.rst for boss.out or boss.out.gz)."""
+    run_dir = parent_locator(boss_out_path)
+    out_name = os.path.basename(boss_out_path)
+    suffix = os.path.splitext(out_name)[1]
+    if suffix in COMPRESSED_SUFFIXES:
+        out_name = out_name[:-len(suffix)]
+    rst_name = out_name[:-4] + '.rst'
+    return resolve_raw_file(run_dir, rst_name) or \
+        join_locator(run_dir, rst_name)
+
+
+def parse_all(tasks, jobs=1):
+    """Parses the boss.out files of all tasks, either serially or with a
+    pool of 'jobs' processes. The runs are independent of each other and
+    every .json file is written atomically, so the outcome does not depend
+    on the order in which the processes finish.
+
+    Args:
+        tasks (list): Tuples (boss.out path, experiment name, json path),
+        see collect_parse_tasks.
+        jobs (int, optional): Number of processes. Defaults to 1.
+
+    Returns:
+        list: Paths of the written .json files, in the order of the tasks.
+    """
+    if len(tasks) == 0:
+        return []
+    input_paths, exp_names, output_paths = zip(*tasks)
+    if jobs <= 1:
+        return list(map(parse, input_paths, exp_names, output_paths))
+    chunksize = max(1, len(tasks) // (4 * jobs))
+    # The archives opened to collect the tasks would otherwise be inherited
+    # by the workers, which then move each other's file offset
+    close_archives()
+    with ProcessPoolExecutor(max_workers=jobs,
+                             initializer=close_archives) as executor:
+        return list(executor.map(parse, input_paths, exp_names,
+                                 output_paths, chunksize=chunksize))
 
 
 def rm_tree(pth: Path):
@@ -253,17 +596,12 @@ def create_parsed_dict(data_folder, processed_data_dir):
         dict: Dict, listing the runs per experiments.
     """
     data_dict = dict()
-    for exp in data_folder.iterdir():
-        if exp.is_dir() and 'misc' not in str(exp):
-            exp_runs = []
-            for exp_run in exp.iterdir():
-                if exp_run.is_dir() and 'exp' in str(exp_run):
-                    exp_run = str(exp_run).split('/')[-1]
-                    exp_runs.append(exp_run)
-            exp_name = str(exp).split(sep='/')[-1]
-            exp_runs = sorted(exp_runs, key=lambda run:
-                              int(run.split(sep='_')[-1]))
-            data_dict[exp_name] = exp_runs
+    for exp_name, exp in get_experiment_locators(data_folder).items():
+        exp_runs = [exp_run for exp_run in list_raw_dirs(exp)
+                    if 'exp' in exp_run]
+        exp_runs = sorted(exp_runs, key=lambda run:
+                          int(run.split(sep='_')[-1]))
+        data_dict[exp_name] = exp_runs
     save_json(data_dict, processed_data_dir, '/parsed_dict.json')
     return data_dict
 
@@ -284,169 +622,353 @@ def save_to_json(path, file_name, exp_name, json_path=None, json_name=None):
         json_name = exp_name
 
     results = read_and_preprocess_boss_output(path, file_name, exp_name)
+    if verbose:
+        print(f'Writing to file {json_path}{json_name}.json ...')
     # expanduser expands an initial path component (~) in the given
     # path to the users home dir
-    with open(os.path.expanduser(f'{json_path}{json_name}.json'), 'w') \
-        as output_file:
-        if verbose:
-            print(f'Writing to file {json_path}{json_name}.json ...')
-        json.dump(results, output_file, indent=4)
+    save_json(results, os.path.expanduser(json_path), f'{json_name}.json')
+
+
+# Multi-line records: the values are written on the line following the
+# marker. The order of the entries is the precedence used by the parser.
+RECORD_MARKERS = {
+    'Data point added to dataset': 'xy',
+    'Best acquisition': 'best_acq',
+    'Global minimum prediction': 'gmp',
+    'Global minimum convergence': 'gmp_convergence',
+    'GP model hyperparameters': 'GP_hyperparam',
+}
+# Single-value records, one value per line
+SCALAR_RECORDS = ['acq_times', 'iter_times', 'total_time']
+# Number of lines of boss.out that are stored as header
+HEADER_LENGTH = 100
+
+
+class RecordBuffer:
+    """Preallocated NumPy buffer for records of equal length.
+
+    The capacity is doubled whenever the buffer is full, so that appending
+    n records costs amortised O(n) without keeping Python lists around.
+
+    Args:
+        capacity (int, optional): Initial number of records. Defaults to 256.
+        ndim (int, optional): 1 for scalar records, 2 for vector records.
+        Defaults to 2.
+    """
+
+    def __init__(self, capacity=256, ndim=2):
+        self.capacity = capacity
+        self.ndim = ndim
+        self.size = 0
+        self.data = None
+
+    def __len__(self):
+        return self.size
+
+    def reserve(self, capacity):
+        """Makes sure that the buffer holds at least 'capacity' records."""
+        if capacity <= self.capacity:
+            return
+        self.capacity = capacity
+        if self.data is not None:
+            self._resize(capacity)
+
+    def append(self, values):
+        if self.data is None:
+            shape = (self.capacity,) if self.ndim == 1 else \
+                (self.capacity, len(values))
+            self.data = np.empty(shape)
+        elif self.size == len(self.data):
+            self._resize(2 * len(self.data))
+        self.data[self.size] = values
+        self.size += 1
+
+    def to_array(self):
+        """Returns a view on the filled part of the buffer."""
+        if self.data is None:
+            return np.empty((0,))
+        return self.data[:self.size]
+
+    def tolist(self):
+        return self.to_array().tolist()
+
+    def _resize(self, capacity):
+        data = np.empty((capacity,) + self.data.shape[1:])
+        data[:self.size] = self.data[:self.size]
+        self.data = data
+        self.capacity = capacity
+
+
+class BossOutputParser:
+    """Single-pass state machine for boss.out files.
+
+    The lines are fed one by one (e.g. by iterating over the open file), so
+    the memory needed is bounded by the size of a record and not by the
+    size of the file. Each line is matched against a dispatch table keyed
+    by the record markers. Markers of multi-line records register the
+    handler for the following line, which is then parsed without going
+    through the dispatch table. Header entries which are only read once are
+    removed from the dispatch table after they have been found.
+
+    Args:
+        exp_name (string): Name of descriptive experiment.
+    """
+
+    def __init__(self, exp_name):
+        self.results = {'name': exp_name,
+                        'initpts': None,
+                        'iterpts': None,
+                        'bounds': None,
+                        'num_tasks': 1,
+                        'acq_times': None,
+                        'best_acq': None,
+                        'gmp': None,
+                        'gmp_convergence': None,
+                        'GP_hyperparam': None,
+                        'iter_times': None,
+                        'total_time': None,
+                        'run_completed': [False],
+                        'sample_indices': [],
+                        'header': []
+                        }
+        self.boss_version = None
+        self.buffers = {key: RecordBuffer() for key in RECORD_MARKERS.values()}
+        for key in SCALAR_RECORDS:
+            self.buffers[key] = RecordBuffer(ndim=1)
+        self._pending = None    # handler for the next line
+        self._dispatch = [
+            (marker, self._record_handler(key))
+            for marker, key in RECORD_MARKERS.items()]
+        self._dispatch += [
+            ('Iteration time [s]:', self._parse_iteration_time),
+            ('Objective function evaluated', self._parse_acq_time),
+            ('initpts', self._parse_initpts),
+            ('num_tasks', self._parse_num_tasks),
+            ('bounds', self._parse_bounds),
+            ('kernel', self._header_entry_handler('kernel')),
+            ('yrange', self._header_entry_handler('yrange')),
+            ('thetainit', self._header_entry_handler('thetainit')),
+            ('thetapriorparam', self._parse_thetapriorparam),
+            ('|| Bayesian optimization completed', self._parse_completed),
+        ]
+
+    def feed(self, line):
+        """Parses a single line of boss.out.
+
+        Args:
+            line (string): Line of boss.out, including the newline.
+        """
+        if len(self.results['header']) < HEADER_LENGTH:
+            self.results['header'].append(line)
+        if self._pending is not None:
+            handler, self._pending = self._pending, None
+            handler(line)
+            return
+        if 'Version' in line:
+            self.boss_version = parse_values(line, typecast=str)[0]
+        for marker, handler in self._dispatch:
+            if marker in line:
+                handler(line)
+                break
+
+    def get_results(self):
+        """Returns the parsed values as dict with JSON serializable lists."""
+        results = copy.deepcopy(self.results)
+        for key, buffer in self.buffers.items():
+            results[key] = buffer.tolist()
+        return results
+
+    def _drop_marker(self, marker):
+        self._dispatch = [
+            (marker_, handler) for marker_, handler in self._dispatch
+            if marker_ != marker]
+
+    # The handlers are bound methods or partials of them (no closures), so
+    # that a parser can be pickled in the middle of a file and resumed.
+    def _record_handler(self, key):
+        return partial(self._read_record_next, key)
+
+    def _read_record_next(self, key, line):
+        self._pending = partial(self._append_record, key)
+
+    def _append_record(self, key, line):
+        self.buffers[key].append(parse_values(line, typecast=float, idx=0))
+
+    def _header_entry_handler(self, key):
+        return partial(self._parse_header_entry, key)
+
+    def _parse_header_entry(self, key, line):
+        self.results[key] = parse_values(line, typecast=str, idx=1)
+
+    def _parse_iteration_time(self, line):
+        # If line contains str and float types, casting to str and then
+        # manually to float again has to be done
+        self.buffers['iter_times'].append(float(
+            parse_values(line, typecast=str, idx=3)[0]))
+        # Here not needed because line only contains a float
+        self.buffers['total_time'].append(
+            parse_values(line, typecast=float, idx=7)[0])
+
+    def _parse_acq_time(self, line):
+        self.buffers['acq_times'].append(
+            parse_values(line, typecast=float, idx=6)[0])
+
+    def _parse_initpts(self, line):
+        # In old BOSS: output for initpts and iterpts in different lines,
+        # e.g. 'initpts     2 50
+        #       iterpts     100'
+        # In new BOSS: output for initpts and iterpts in same line,
+        # e.g. 'initpts   4    iterpts   150'. Note that initpts 4
+        # means 2 initpts per task.
+        if self.boss_version == '1.5':
+            self.results['initpts'] = parse_values(line, cut_idx=-2)
+            self.results['iterpts'] = parse_values(line, idx=3)
+            self._reserve_buffers()
+        elif (self.boss_version == '0.9.15') or \
+                (self.boss_version == '0.9.17'):
+            self.results['initpts'] = parse_values(line)
+            self._pending = self._parse_iterpts
+        else:
+            # Unsupported boss version, initpts are looked up again
+            return
+        self._drop_marker('initpts')
+
+    def _parse_iterpts(self, line):
+        self.results['iterpts'] = parse_values(line)
+        self._reserve_buffers()
+
+    def _reserve_buffers(self):
+        """Preallocates the buffers once the number of points is known."""
+        num_points = sum(self.results['initpts']) + \
+            sum(self.results['iterpts']) + 1
+        for buffer in self.buffers.values():
+            buffer.reserve(num_points)
+
+    def _parse_num_tasks(self, line):
+        self.results['num_tasks'] = parse_values(line)[0]
+
+    def _parse_bounds(self, line):
+        tmp = ' '.join(parse_values(line, typecast=str, idx=1))
+        self.results['bounds'] = parse_values(tmp, typecast=str, sep=';',
+                                              idx=0)
+        self._drop_marker('bounds')
+
+    def _parse_thetapriorparam(self, line):
+        tmp = ' '.join(parse_values(line, typecast=str, idx=1))
+        self.results['thetapriorparam'] = parse_values(tmp, typecast=str,
+                                                       sep=';', idx=0)
+
+    def _parse_completed(self, line):
+        self.results['run_completed'] = [True]
+
+
+class BossRstParser:
+    """Single-pass parser for the sample indices in boss.rst.
+
+    The rows of the results section are kept split, since the column of the
+    sample index depends on the dimension, which is only known from the
+    parsed boss.out.
+    """
+
+    def __init__(self):
+        self.acqcost = None
+        self.rows = []
+        self._reading_results = False
+
+    def feed(self, line):
+        """Parses a single line of boss.rst.
+
+        Args:
+            line (string): Line of boss.rst, including the newline.
+        """
+        if self._reading_results:
+            self.rows.append(line.split())
+            return
+        if line.startswith("acqcost"):
+            if "acqcost_as_timing" in line or "None" in line:
+                return
+            self.acqcost = parse_values(line, typecast=float, sep=" ", idx=1)
+        if line.startswith("RESULTS"):
+            self._reading_results = True
+
+    def get_sample_indices(self, dim):
+        return [int(float(row[dim])) for row in self.rows]
 
 
 def read_and_preprocess_boss_output(path, file_name, exp_name):
     """Reads boss.out file and returns a dict() with parsed values.
 
+    The file is read once as a stream by BossOutputParser. boss.out and
+    boss.rst may also be compressed or members of a tar archive, see
+    src/raw_input.py.
+
     Args:
         path (string): Path to folder where boss.out is.
         file_name (string): Name of boss.out file.
         exp_name (string): Name of descriptive experiment.
     """
-    path = os.path.expanduser(path)
-    results = {'name': exp_name,
-               'initpts': None,
-               'iterpts': None,
-               'bounds': None,
-               'num_tasks': 1,
-               'acq_times': None,
-               'best_acq': None,
-               'gmp': None,
-               'gmp_convergence': None,
-               'GP_hyperparam': None,
-               'iter_times': None,
-               'total_time': None,
-               'run_completed': [False],
-               'sample_indices': []
-               }
-    xy = []
-    acq_times = []
-    best_acq = []
-    global_min_prediction = []
-    global_min_prediction_convergence = []
-    gp_hyperparam = []
-    iter_times = []
-    total_time = []
-    boss_version = None
-    with open(''.join((path, file_name)), 'r') as file:
-        lines = file.readlines()
-        results['header'] = lines[0:100]
-        for i in range(len(lines)):
-            line = lines[i]
-            if 'Version' in line:
-                boss_version = parse_values(line, typecast=str)[0]
-            if 'Data point added to dataset' in line:
-                line = lines[i+1]
-                xy.append(parse_values(line, typecast=float, idx=0))
-            elif 'Best acquisition' in line:
-                line = lines[i+1]
-                best_acq.append(parse_values(line, typecast=float, idx=0))
-            elif 'Global minimum prediction' in line:
-                line = lines[i+1]
-                global_min_prediction.append(parse_values(line, typecast=float,
-                                                          idx=0))
-            elif 'Global minimum convergence' in line:
-                line = lines[i+1]
-                global_min_prediction_convergence.append(
-                    parse_values(line,
-                                 typecast=float,
-                                 idx=0)
-                                 )
-            elif 'GP model hyperparameters' in line:
-                line = lines[i+1]
-                gp_hyperparam.append(parse_values(line, typecast=float, idx=0))
-            elif 'Iteration time [s]:' in line:
-                # If line contains str and float types, casting to str and then
-                # manually to float again has to be done
-                iter_times.append(float(
-                    parse_values(line, typecast=str, idx=3)[0]))
-                # Here not needed because line only contains a float
-                total_time.append(parse_values(line, typecast=float, idx=7)[0])
-            elif 'Objective function evaluated' in line:
-                acq_times.append(parse_values(line, typecast=float, idx=6)[0])
-
-            # In old BOSS: output for initpts and iterpts in different lines,
-            # e.g. 'initpts     2 50
-            #       iterpts     100'
-            # In new BOSS: output for initpts and iterpts in same line,
-            # e.g. 'initpts   4    iterpts   150'. Note that initpts 4
-            # means 2 initpts per task.
-            elif 'initpts' in line and results['initpts'] is None:
-                if boss_version == '1.5':
-                    results['initpts'] = parse_values(line, cut_idx=-2)
-                    results['iterpts'] = parse_values(line, idx=3)
-                elif (boss_version == '0.9.15') or (boss_version == '0.9.17'):
-                    next_line = lines[i+1]
-                    results['initpts'] = parse_values(line)
-                    results['iterpts'] = parse_values(next_line)
-                else:
-                    Exception(f'Unsupported boss version: {boss_version}')
-            elif 'num_tasks' in line:
-                results['num_tasks'] = parse_values(line)[0]
-            elif 'bounds' in line and results['bounds'] is None:
-                tmp = ' '.join(parse_values(line, typecast=str, idx=1))
-                results['bounds'] = parse_values(tmp,
-                    typecast=str, sep=';', idx=0)
-            elif 'kernel' in line:
-                results['kernel'] = parse_values(line, typecast=str, idx=1)
-            elif 'yrange' in line:
-                results['yrange'] = parse_values(line, typecast=str, idx=1)
-            elif 'thetainit' in line:
-                results['thetainit'] = parse_values(line, typecast=str, idx=1)
-            elif 'thetapriorparam' in line:
-                tmp = ' '.join(parse_values(line, typecast=str, idx=1))
-                results['thetapriorparam'] = parse_values(tmp, typecast=str,
-                    sep=';', idx=0)
-            elif '|| Bayesian optimization completed' in line:
-                results['run_completed'] = [True]
-
-    results['tasks'] = len(np.unique(np.array(xy)[:, -2]))
+    file_path = ''.join((os.path.expanduser(path), file_name))
+    parser = BossOutputParser(exp_name)
+    with open_raw_file(file_path) as file:
+        for line in file:
+            parser.feed(line)
+    results = get_parsed_results(parser)
+
+    # Get sample indices from the rst file
+    rst_parser = BossRstParser()
+    with open_raw_file(get_rst_path(file_path)) as f:
+        for line in f:
+            rst_parser.feed(line)
+    add_rst_results(results, rst_parser, file_path)
+    return results
+
+
+def get_parsed_results(parser):
+    """Returns the results of a BossOutputParser, completed by the number
+    of tasks and the dimension.
+
+    Args:
+        parser (BossOutputParser): Parser which has been fed boss.out.
+    """
+    results = parser.get_results()
+
+    xy = parser.buffers['xy'].to_array()
+    results['tasks'] = len(np.unique(xy[:, -2]))
     if results['tasks'] not in [1, 2, 3]:
         results['tasks'] = 1
-        results['dim'] = len(xy[0])-1
+        results['dim'] = xy.shape[1] - 1
     else:
         # Hardcoded fix for 2UHFbasic0, where exp_6 has only two xy points:
-        if len(np.array(xy)) == 2:
-            results['dim'] = len(xy[0])-1
+        if xy.shape[0] == 2:
+            results['dim'] = xy.shape[1] - 1
         else:
-            results['dim'] = len(xy[0])-2
-    results['xy'] = xy
-    results['acq_times'] = acq_times
+            results['dim'] = xy.shape[1] - 2
+    results['xy'] = results.pop('xy')   # keeps the key order of the json
     # These are the sobol runs that did not finish properly:
-    if best_acq == []:
-        acqs = np.array(results['xy'])
-        best_acq.append(acqs[np.argmin(acqs[:, -1]), :].tolist())
-    results['best_acq'] = best_acq
-    results['gmp'] = global_min_prediction
-    results['gmp_convergence'] = global_min_prediction_convergence
-    results['GP_hyperparam'] = gp_hyperparam
-    results['iter_times'] = iter_times
-    results['total_time'] = total_time
+    if results['best_acq'] == []:
+        results['best_acq'].append(xy[np.argmin(xy[:, -1]), :].tolist())
     if len(results['initpts']) == 1:
         # add 0, since no secondary task initpts used
         results['initpts'].append(0)
+    return results
 
-    # Get sample indices from the rst file
-    rst_file_path = ''.join((path, file_name[:-4], '.rst'))
-    with open(rst_file_path, "r") as f:
-        start_reading_indices = False
-        for line in f:
-            if line.startswith("acqcost"):
-                if "acqcost_as_timing" in line:
-                    continue
-                if "None" in line:
-                    continue
-                results["acqcost"] = parse_values(
-                    line, typecast=float, sep=" ", idx=1)
-            if line.startswith("RESULTS"):
-                start_reading_indices = True
-                continue
-            if start_reading_indices:
-                results["sample_indices"].append(
-                    int(float(line.split()[results["dim"]])))
-    if ('ICM' not in file_name) or (len(results['sample_indices']) == 0):
+
+def add_rst_results(results, rst_parser, file_path):
+    """Adds acquisition costs, sample indices and highest fidelity
+    iterations from boss.rst to the results.
+
+    Args:
+        results (dict): See get_parsed_results.
+        rst_parser (BossRstParser): Parser which has been fed boss.rst.
+        file_path (string): Path to boss.out.
+    """
+    if rst_parser.acqcost is not None:
+        results["acqcost"] = rst_parser.acqcost
+    results["sample_indices"] = rst_parser.get_sample_indices(results["dim"])
+    if ('ICM' not in file_path) or (len(results['sample_indices']) == 0):
         results['sample_indices'] = [0] * len(results['sample_indices'])
     results['highest_fidelity_iterations'] = \
         preprocess.get_highest_fidelity_iterations(results)
-    return results
 
 
 def parse(input_file_path, exp_name, output_file_path):
@@ -456,182 +978,13 @@ def parse(input_file_path, exp_name, output_file_path):
         input_file_path (string): boss.out file path
         exp_name (string): Name of the descriptive experiment
         output_file_path (string): .json file path.
+
+    Returns:
+        string: .json file path.
     """
     output_file = output_file_path.split('.json')[0]
     save_to_json('', input_file_path, exp_name, '', output_file)
-
-
-def merge_subrun_data(subrun_file_paths, exp_idx):
-    """Parses the subruns json files, cleans and merges
-    the statistics. Saves the merged statistics as a single .json file.
-
-    Args:
-        subrun_file_paths (list): ordered list with paths to subruns
-        exp_idx (str): Experiment to merge (e.g. exp_1)
-    """
-    # TODO : TL experiments have additional keys (e.g. 'B')
-    # TODO : For the experiments that have been
-    # unfinished ('run_completed' is False),
-    # consider different stacking methods for different parameters
-    # --> Here, it might be sufficient already to do
-    #  if run_completed: continue
-    # for some parameters
-    to_copy_from_first_subrun = ['header', 'truemin',
-                                 'thetainit', 'thetapriorparam', 'name',
-                                 'bounds', 'dim', 'tasks', 'kernel',
-                                 'num_tasks', 'tolerance_levels',
-                                 'yrange', 'initpts']
-    to_copy_from_last_subrun = ['xy', 'sample_indices']
-    to_stack = ['GP_hyperparam', 'acq_times', 'best_acq', 'gmp_convergence',
-                'run_completed']
-    to_stack_and_clean = ['gmp', 'iterpts', 'iter_times',
-                          'iterations_to_gmp_convergence', 'model_time',
-                          'observations_to_gmp_convergence', 'total_time',
-                          'totaltime_to_gmp_convergence']
-
-    all_arguments = to_copy_from_first_subrun + to_copy_from_last_subrun + \
-                    to_stack + to_stack_and_clean
-
-    merged_results = dict.fromkeys([key for key in all_arguments])
-    subrun_results = []
-
-    # First part: Just copying (or stacking) the data
-    for subrun_path in subrun_file_paths:
-        subrun_results.append(load_json(subrun_path, ''))
-
-    for key in to_copy_from_first_subrun:
-        merged_results[key] = subrun_results[0][key]
-
-    for key in to_copy_from_last_subrun:
-        merged_results[key] = subrun_results[-1][key]
-
-    for key in to_stack:
-        merged_results[key] = []
-        for subrun in subrun_results:
-            values = subrun[key]
-            for value in values:
-                merged_results[key].append(value)
-
-    # if any(np.bitwise_not(np.array(merged_results['run_completed']))):
-    #     merged_results['unfinished_runs'] = np.argwhere(
-    #         np.array(merged_results['run_completed']) == False)
-    #     merged_results['unfinished_runs'] = \
-    #         merged_results['unfinished_runs'][0].tolist()
-
-    # Second part : Stack and clean the data, dependent on the key
-    for key in to_stack_and_clean:
-        merged_results[key] = []
-        if key == 'gmp':
-            for idx, subrun in enumerate(subrun_results):
-                if idx != len(subrun_results) - 1 and \
-                   subrun['run_completed'][0] is False:
-                    continue
-                values = subrun[key]
-                if idx != 0:
-                    values = values[1:] # First gmp from next subrun should
-                                        # be ignored, this occurs twice
-                for value in values:
-                    merged_results[key].append(value)
-        if key == 'iterpts':
-            merged_results[key].append(
-                len(subrun_results) * subrun_results[0][key][0])
-        if key == 'iter_times':
-            iterpts = subrun_results[0]['iterpts'][0]
-            initpts = subrun_results[0]['initpts'][0]
-            for idx, subrun in enumerate(subrun_results):
-                values = subrun[key]
-                start = (idx > 0)*initpts + idx*iterpts
-                for value in values[start:]:
-                    merged_results[key].append(value)
-        if key == 'iterations_to_gmp_convergence':
-            initial_initpts = subrun_results[0]['initpts'][0] + \
-                subrun_results[0]['initpts'][1]
-            for subrun_idx, subrun in enumerate(subrun_results):
-                subrun_initpts = subrun['initpts'][0] + \
-                    subrun['initpts'][1]
-                values = subrun[key]
-                if subrun_idx == 0:
-                    merged_results[key] = copy.deepcopy(values)
-                    continue
-                for value_idx, value in enumerate(values):
-                    if value is None:
-                        sublist_length = len(merged_results[key][value_idx:])
-                        merged_results[key][value_idx:] = sublist_length*[None]
-                        break
-                    elif value == 0:
-                        continue
-                    else:
-                        merged_results[key][value_idx] = subrun_initpts + \
-                            value - initial_initpts
-        if key == 'totaltime_to_gmp_convergence':
-            current_run_time = 0
-            #previous_values, previous_run_completed = None, None
-            for subrun_idx, subrun in enumerate(subrun_results):
-                if subrun_idx == 0:
-                    merged_results[key] = copy.deepcopy(subrun[key])
-                    previous_values = copy.deepcopy(
-                        subrun['iterations_to_gmp_convergence'])
-                    previous_run_completed = subrun['run_completed'][0]
-                    current_run_time += subrun['total_time'][-1]
-                else:
-                    values = subrun[key]
-                    BO_iter_values = subrun['iterations_to_gmp_convergence']
-                    for value_idx, value in enumerate(BO_iter_values):
-                        if BO_iter_values[value_idx] is None:
-                            N_sublist = len(merged_results[key][value_idx:])
-                            merged_results[key][value_idx:] = N_sublist*[None]
-                            current_run_time += subrun['total_time'][-1]
-                            break
-                        if BO_iter_values[value_idx] == 0:
-                            if value_idx == len(BO_iter_values):
-                                current_run_time += subrun['total_time'][-1]
-                            else:
-                                continue
-                        else:
-                            if previous_run_completed:
-                                merged_results[key][value_idx] = \
-                                    values[value_idx] + current_run_time
-                            else:
-                                # Only update, if in the continued run a new
-                                # convergence tolerance was reached
-                                prev_value = previous_values[value_idx]
-                                if prev_value is None and value is not None:
-                                    merged_results[key][value_idx] = \
-                                        values[value_idx] + current_run_time
-                                elif value - prev_value != 0:
-                                    merged_results[key][value_idx] = \
-                                        values[value_idx] + current_run_time
-                                else:
-                                    continue
-                    previous_values = copy.deepcopy(BO_iter_values)
-                    previous_run_completed = subrun['run_completed'][0]
-        # TODO : Implement, this is not working yet (but also not used)
-        if key == 'total_time':
-            time_shift = 0
-            for subrun in subrun_results:
-                values = subrun[key]
-                for value_idx, value in enumerate(values):
-                    if value_idx < len(merged_results[key]):
-                        continue
-                    else:
-                        merged_results[key].append(value + time_shift)
-                time_shift += subrun['total_time'][-1]
-        if key == 'observations_to_gmp_convergence':
-            # This is not used
-            pass  # TODO
-        if key == 'model_time':
-            # This is not used
-            pass  # TODO
-    if 'basic' in merged_results['name']:
-        merged_results['highest_fidelity_iterations_to_gmp_convergence'] = \
-            merged_results['iterations_to_gmp_convergence']
-    json_name = exp_idx
-    json_path = str(subrun_file_paths[0].parent) + '/'
-    with open(os.path.expanduser(f'{json_path}{json_name}.json'), 'w') \
-        as output_file:
-            if verbose:
-                print(f'Writing to file {json_path}{json_name}.json ...')
-            json.dump(merged_results, output_file, indent=4)
+    return output_file_path
 
 
 if __name__ == '__main__':
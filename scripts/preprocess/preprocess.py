@@ -1,4 +1,10 @@
 import numpy as np
+import sys
+from pathlib import Path
+# Add path to use read_write.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.timings import add_init_data_cost, get_segment_offsets
 
 
 def get_best_acquisition(data):
@@ -55,14 +61,82 @@ def add_init_acq_times(data, init_data_cost):
             begin = accounted_initpts
             if accounted_initpts != 0:
                 begin -= 1
-            end = begin + initpts
-            for i in range(begin, end):
-                data['total_time'][i] += cost[i-begin]
-            for i in range(end, len(data['total_time'])):
-                data['total_time'][i] += cost[initpts-1]
+            data['total_time'] = add_init_data_cost(
+                data['total_time'], cost, begin, initpts).tolist()
         accounted_initpts += initpts
 
 
+def get_reverse_running_max(values):
+    """Returns the running maximum of |values|, starting from the last value.
+
+    Element k is the largest deviation among the last k+1 values, so the
+    result is non-decreasing and the number of trailing values within a
+    tolerance can be found with a binary search (see
+    count_converged_values). NaN values are never larger than a tolerance
+    and therefore do not contribute to the maximum.
+
+    Args:
+        values (array_like): Values of a quantity for each iteration, e.g.
+        the global minimum prediction minus the truemin.
+    """
+    deviations = np.abs(np.asarray(values, dtype=float))[::-1]
+    deviations[np.isnan(deviations)] = -np.inf
+    return np.maximum.accumulate(deviations)
+
+
+def count_converged_values(reverse_running_max, tolerances):
+    """Returns for each tolerance the number of trailing values which are
+    all within the tolerance.
+
+    Args:
+        reverse_running_max (np.ndarray): See get_reverse_running_max.
+        tolerances (array_like): Tolerance levels.
+    """
+    return np.searchsorted(reverse_running_max, np.asarray(tolerances),
+                           side='right')
+
+
+def get_convergence_measures(data, tolerances, idx=-2, measure='gmp'):
+    """Returns the iterations, total time, observations and highest fidelity
+    iterations needed to converge a quantity for an array of tolerances.
+
+    A run has converged at the first iteration after which the quantity
+    stays within the tolerance. Tolerances that are not reached give NaN.
+
+    Args:
+        data (dict): Contains the parsed data.
+        tolerances (array_like): Tolerance levels.
+        idx (int, optional): Dimension where data is located. Defaults to
+        -2.
+        measure (str, optional): Quantity to calculate convergence measures
+        for. Defaults to 'gmp'.
+
+    Returns:
+        dict: Arrays 'iterations', 'totaltime', 'observations' and
+        'highest_fidelity_iterations' with one value per tolerance.
+    """
+    values = np.atleast_2d(data[measure])[:, idx]
+    counts = count_converged_values(get_reverse_running_max(values),
+                                    tolerances)
+    converged = counts > 0
+    measures = {
+        'iterations': len(values) - counts,
+        'totaltime': _take_from_end(data['total_time'], counts),
+        'observations': len(data['xy']) - counts}
+    if 'ICM' in data['name']:
+        measures['highest_fidelity_iterations'] = _take_from_end(
+            data['highest_fidelity_iterations'], counts)
+    else:
+        measures['highest_fidelity_iterations'] = measures['iterations']
+    return {key: np.where(converged, value, np.nan)
+            for key, value in measures.items()}
+
+
+def _take_from_end(values, counts):
+    values = np.asarray(values, dtype=float)
+    return values[len(values) - np.maximum(counts, 1)]
+
+
 def calculate_convergence_times(data, idx, measure='gmp'):
     """Calculates the convergence points/times of a quantity for given
     tolerances.
@@ -76,43 +150,21 @@ def calculate_convergence_times(data, idx, measure='gmp'):
     """
     if data[measure] == []:
         return          # This is for interrupted sobol runs (hardcoded fix)
-    values = np.atleast_2d(data[measure])[:, idx][::-1]     # note reversion
-    data[f'iterations_to_{measure}_convergence'] = []       # BO iterations
-    data[f'totaltime_to_{measure}_convergence'] = []        # total runtime
-    data[f'observations_to_{measure}_convergence'] = []     # BO + init points
-
-    for tolerance in data['tolerance_levels']:
-        i = 0
-        for value in values:
-            if abs(value) > tolerance:
-                break
-            i += 1
-        if i == 0:
-            iterations = None
-            totaltime = None
-            observations = None
-        else:
-            iterations = len(values) - i
-            totaltime = data['total_time'][-i]
-            observations = len(data['xy']) - i
-        data[f'iterations_to_{measure}_convergence'].append(iterations)
-        data[f'totaltime_to_{measure}_convergence'].append(totaltime)
-        data[f'observations_to_{measure}_convergence'].append(observations)
+    values = np.atleast_2d(data[measure])[:, idx]
+    counts = count_converged_values(get_reverse_running_max(values),
+                                    data['tolerance_levels']).tolist()
+    # Not converged runs are stored as None
+    data[f'iterations_to_{measure}_convergence'] = [      # BO iterations
+        len(values) - i if i > 0 else None for i in counts]
+    data[f'totaltime_to_{measure}_convergence'] = [       # total runtime
+        data['total_time'][-i] if i > 0 else None for i in counts]
+    data[f'observations_to_{measure}_convergence'] = [    # BO + init points
+        len(data['xy']) - i if i > 0 else None for i in counts]
 
     if 'ICM' in data['name']:
-        data[f'highest_fidelity_iterations_to_{measure}_convergence'] = []
-        for tolerance in data['tolerance_levels']:
-            i = 0
-            for value in values:
-                if abs(value) > tolerance:
-                    break
-                i += 1
-            if i == 0:
-                iterations = None
-            else:
-                iterations = data['highest_fidelity_iterations'][-i]
-            data[f'highest_fidelity_iterations_to_{measure}_convergence'].\
-                append(iterations)
+        data[f'highest_fidelity_iterations_to_{measure}_convergence'] = [
+            data['highest_fidelity_iterations'][-i] if i > 0 else None
+            for i in counts]
     else:
         data[f'highest_fidelity_iterations_to_{measure}_convergence'] = \
             data[f'iterations_to_{measure}_convergence']
@@ -174,3 +226,170 @@ def get_highest_fidelity_iterations(data):
         else:
             flag_highest_fidelity_samples.append(0)
     return np.cumsum(flag_highest_fidelity_samples).tolist()
+
+
+# Keys of the merged record of restarted ('_r') runs, by how the values of
+# the subruns are merged
+TO_COPY_FROM_FIRST_SUBRUN = ['header', 'truemin', 'thetainit',
+                             'thetapriorparam', 'name', 'bounds', 'dim',
+                             'tasks', 'kernel', 'num_tasks',
+                             'tolerance_levels', 'yrange', 'initpts']
+TO_COPY_FROM_LAST_SUBRUN = ['xy', 'sample_indices']
+TO_STACK = ['GP_hyperparam', 'acq_times', 'best_acq', 'gmp_convergence',
+            'run_completed']
+TO_STACK_AND_CLEAN = ['gmp', 'iterpts', 'iter_times',
+                      'iterations_to_gmp_convergence', 'model_time',
+                      'observations_to_gmp_convergence', 'total_time',
+                      'totaltime_to_gmp_convergence']
+
+
+def merge_subrun_records(subrun_results):
+    """Merges the preprocessed records of the subruns of a restarted run
+    into the record of the run.
+
+    The subrun records are not modified. Times and convergence measures of
+    the later subruns are shifted by the offsets of the preceding subruns.
+
+    Args:
+        subrun_results (list): Preprocessed records of the subruns, in
+        order.
+
+    Returns:
+        dict: Merged record.
+    """
+    # TODO : TL experiments have additional keys (e.g. 'B')
+    # TODO : For the experiments that have been
+    # unfinished ('run_completed' is False),
+    # consider different stacking methods for different parameters
+    # --> Here, it might be sufficient already to do
+    #  if run_completed: continue
+    # for some parameters
+    first, last = subrun_results[0], subrun_results[-1]
+    merged_results = dict.fromkeys(
+        TO_COPY_FROM_FIRST_SUBRUN + TO_COPY_FROM_LAST_SUBRUN + TO_STACK +
+        TO_STACK_AND_CLEAN)
+    for key in TO_COPY_FROM_FIRST_SUBRUN:
+        merged_results[key] = first[key]
+    for key in TO_COPY_FROM_LAST_SUBRUN:
+        merged_results[key] = last[key]
+    for key in TO_STACK:
+        merged_results[key] = [value for subrun in subrun_results
+                               for value in subrun[key]]
+
+    merged_results['gmp'] = _merge_gmp(subrun_results)
+    merged_results['iterpts'] = [len(subrun_results) * first['iterpts'][0]]
+    merged_results['iter_times'] = _merge_iter_times(subrun_results)
+    merged_results['iterations_to_gmp_convergence'] = \
+        _merge_iterations_to_convergence(subrun_results)
+    merged_results['model_time'] = []                       # not used
+    merged_results['observations_to_gmp_convergence'] = []  # not used
+    merged_results['total_time'] = _merge_total_time(subrun_results)
+    merged_results['totaltime_to_gmp_convergence'] = \
+        _merge_totaltime_to_convergence(subrun_results)
+    if 'basic' in merged_results['name']:
+        merged_results['highest_fidelity_iterations_to_gmp_convergence'] = \
+            merged_results['iterations_to_gmp_convergence']
+    return merged_results
+
+
+def _merge_gmp(subrun_results):
+    merged = []
+    for idx, subrun in enumerate(subrun_results):
+        if idx != len(subrun_results) - 1 and \
+                subrun['run_completed'][0] is False:
+            continue
+        # First gmp from next subrun should be ignored, this occurs twice
+        merged.extend(subrun['gmp'][1:] if idx != 0 else subrun['gmp'])
+    return merged
+
+
+def _merge_iter_times(subrun_results):
+    iterpts = subrun_results[0]['iterpts'][0]
+    initpts = subrun_results[0]['initpts'][0]
+    merged = []
+    for idx, subrun in enumerate(subrun_results):
+        start = (idx > 0)*initpts + idx*iterpts
+        merged.extend(subrun['iter_times'][start:])
+    return merged
+
+
+def _merge_total_time(subrun_results):
+    # Each subrun starts the timer from 0 again, and only the times beyond
+    # the length of the merged times are taken from the later subruns
+    time_shifts = get_segment_offsets([subrun['total_time'][-1]
+                                       for subrun in subrun_results])
+    merged = list(subrun_results[0]['total_time'])
+    for subrun, time_shift in zip(subrun_results[1:], time_shifts[1:]):
+        values = np.asarray(subrun['total_time'][len(merged):], dtype=float)
+        merged.extend((values + time_shift).tolist())
+    return merged
+
+
+def _to_masked_array(values, dtype):
+    """Returns values (which may contain None) as array and None mask."""
+    mask = np.array([value is None for value in values], dtype=bool)
+    array = np.array([0 if value is None else value for value in values],
+                     dtype=dtype)
+    return array, mask
+
+
+def _from_masked_array(array, mask):
+    return [None if masked else value
+            for value, masked in zip(array.tolist(), mask.tolist())]
+
+
+def _first_none(values):
+    """Returns the index of the first None in values, or their length."""
+    return next((idx for idx, value in enumerate(values) if value is None),
+                len(values))
+
+
+def _merge_iterations_to_convergence(subrun_results):
+    # Tolerances that are not reached in a subrun are not reached in the
+    # run. Otherwise, the iterations are counted from the initial points of
+    # the first subrun.
+    key = 'iterations_to_gmp_convergence'
+    initial_initpts = sum(subrun_results[0]['initpts'][:2])
+    merged, not_converged = _to_masked_array(subrun_results[0][key], int)
+    for subrun in subrun_results[1:]:
+        iterations = subrun[key]
+        cut = _first_none(iterations)
+        values = np.array(iterations[:cut], dtype=int)
+        update = np.flatnonzero(values != 0)
+        merged[update] = sum(subrun['initpts'][:2]) + values[update] - \
+            initial_initpts
+        not_converged[update] = False
+        not_converged[cut:] = True
+    return _from_masked_array(merged, not_converged)
+
+
+def _merge_totaltime_to_convergence(subrun_results):
+    # Convergence times of later subruns are shifted by the run time of the
+    # preceding subruns. After an unfinished subrun, only tolerances that
+    # converged at a different iteration are updated.
+    key = 'totaltime_to_gmp_convergence'
+    iterations_key = 'iterations_to_gmp_convergence'
+    first = subrun_results[0]
+    merged, not_converged = _to_masked_array(first[key], float)
+    previous_iterations = first[iterations_key]
+    previous_run_completed = first['run_completed'][0]
+    current_run_time = first['total_time'][-1]
+    for subrun in subrun_results[1:]:
+        iterations = subrun[iterations_key]
+        cut = _first_none(iterations)
+        values = np.array(iterations[:cut], dtype=int)
+        update = values != 0
+        if not previous_run_completed:
+            previous_values, previous_none = _to_masked_array(
+                previous_iterations[:cut], int)
+            update &= previous_none | (values != previous_values)
+        update = np.flatnonzero(update)
+        times = np.array(subrun[key][:cut], dtype=float)
+        merged[update] = times[update] + current_run_time
+        not_converged[update] = False
+        if cut < len(iterations):
+            not_converged[cut:] = True
+            current_run_time += subrun['total_time'][-1]
+        previous_iterations = iterations
+        previous_run_completed = subrun['run_completed'][0]
+    return _from_masked_array(merged, not_converged)
@@ -0,0 +1,211 @@
+import os
+import sys
+import time
+import click
+import numpy as np
+from pathlib import Path
+# Add path to use read_write.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import preprocess
+from src.config import load_config
+from src.read_write import load_json, save_json
+from parse_raw_data import get_truemin, THESIS_DIR, PREPROCESS_VERSION
+from manifest import load_manifest, hash_derived_inputs
+from follow_raw_data import poll_runs
+
+STOP_LIST_NAME = 'stop_list.json'
+
+
+@click.command()
+@click.option('--setup', default='multi_task_learning',
+    help="Chose either 'transfer_learning' or 'multi_task_learning'.")
+@click.option('--tolerance', default=None, type=float,
+    help='Largest deviation of the global minimum prediction from the '
+         'truemin. Defaults to the tightest tolerance in the config.')
+@click.option('--window', default=5, type=int,
+    help='Number of last global minimum predictions which all have to be '
+         'within the tolerance.')
+@click.option('--interval', default=60., type=float,
+    help='Seconds between two polls.')
+@click.option('--polls', default=1, type=int,
+    help='Number of polls, 0 to poll until interrupted.')
+def main(setup, tolerance, window, interval, polls):
+    """Follows the running BOSS jobs (see follow_raw_data.py) and writes the
+    runs which have converged to data/{setup}/live/stop_list.json.
+
+    A run has converged when its last 'window' global minimum predictions
+    are all within 'tolerance' of the truemin of its baseline (see
+    config_tl.yaml and config_mt.yaml). Runs without a known truemin are
+    never stopped.
+    """
+    RAW_DATA_DIR = THESIS_DIR / f'data/{setup}' / 'raw'
+    INTERIM_DATA_DIR = THESIS_DIR / f'data/{setup}' / 'interim'
+    LIVE_DATA_DIR = THESIS_DIR / f'data/{setup}' / 'live'
+    config_file = 'config_tl.yaml' if setup == 'transfer_learning' \
+        else 'config_mt.yaml'
+    CONFIG = load_config(config_file)
+    if tolerance is None:
+        tolerance = min(CONFIG['tolerances'])
+    rules = {'tolerance': tolerance, 'window': window}
+
+    watcher = ConvergenceWatcher(LIVE_DATA_DIR, INTERIM_DATA_DIR, CONFIG,
+                                 rules)
+    followers = {}
+    poll_idx = 0
+    while True:
+        updated = poll_runs(RAW_DATA_DIR, LIVE_DATA_DIR, followers)
+        stop_list = watcher.update(updated, followers)
+        print(f'Poll {poll_idx + 1}: updated {len(updated)} runs, '
+              f'{len(stop_list)} runs to stop')
+        poll_idx += 1
+        if polls > 0 and poll_idx >= polls:
+            break
+        time.sleep(interval)
+
+
+def get_truemin_source(exp, config):
+    """Returns the experiment whose best acquisitions define the truemin of
+    the experiment 'exp', or None if the config does not list one.
+
+    Args:
+        exp (str): Name of experiment.
+        config (Config): Content of config_tl.yaml or config_mt.yaml.
+    """
+    return config.truemin_sources.get(exp)
+
+
+def get_convergence_status(results, truemin, tolerance, window):
+    """Returns the convergence status of a (possibly running) run.
+
+    Args:
+        results (dict): Parsed record, see read_and_preprocess_boss_output.
+        truemin (float): Truemin of the run, or None if not known.
+        tolerance (float): Tolerance for the global minimum prediction.
+        window (int): Number of last global minimum predictions which have
+        to be within the tolerance.
+
+    Returns:
+        dict: Number of iterations, number of last iterations within the
+        tolerance, iteration of convergence (see
+        preprocess.calculate_convergence_times), completion and whether
+        the run should be stopped.
+    """
+    status = {'iterations': len(results['gmp']),
+              'converged_iterations': 0,
+              'iterations_to_convergence': None,
+              'run_completed': results['run_completed'][-1],
+              'stop': False}
+    if truemin is None or status['iterations'] == 0:
+        return status
+    values = np.atleast_2d(results['gmp'])[:, -2] - truemin
+    count = int(preprocess.count_converged_values(
+        preprocess.get_reverse_running_max(values), [tolerance])[0])
+    status['converged_iterations'] = count
+    if count > 0:
+        status['iterations_to_convergence'] = status['iterations'] - count
+    status['stop'] = count >= window and not status['run_completed']
+    return status
+
+
+class ConvergenceWatcher:
+    """Keeps the convergence status of all live records and writes the stop
+    list.
+
+    The statuses of the last call are read from the stop list, if it has
+    been written with the same rules. Live records without a status are
+    read once, afterwards only the updated records and the records whose
+    truemin changed are evaluated.
+
+    The truemins are taken again from the parsed records of their source
+    whenever the manifest of the parsed records (see manifest.py) shows
+    that these changed, e.g. because a baseline run found a lower minimum.
+
+    Args:
+        live_data_dir (Path): Path to live records.
+        interim_data_dir (Path): Path to parsed records, which contain the
+        baseline runs the truemins are taken from.
+        config (Config): Content of config_tl.yaml or config_mt.yaml.
+        rules (dict): 'tolerance' and 'window', see get_convergence_status.
+    """
+
+    def __init__(self, live_data_dir, interim_data_dir, config, rules):
+        self.live_data_dir = Path(live_data_dir)
+        self.interim_data_dir = Path(interim_data_dir)
+        self.config = config
+        self.rules = rules
+        self.truemins = {}
+        self.parse_manifest = load_manifest(self.interim_data_dir)
+        self.statuses = {}
+        stop_list_path = self.live_data_dir.joinpath(STOP_LIST_NAME)
+        if stop_list_path.is_file():
+            stop_list = load_json('', stop_list_path)
+            if stop_list['rules'] == rules:
+                self.statuses = stop_list['runs']
+
+    def get_truemin(self, exp):
+        """Returns the truemin energy of the experiment 'exp', or None if
+        there is no parsed record of its truemin source."""
+        source = get_truemin_source(exp, self.config)
+        if source is None:
+            return None
+        records_hash = hash_derived_inputs(source, self.parse_manifest,
+                                           self.config, PREPROCESS_VERSION)
+        if source in self.truemins and \
+                self.truemins[source][0] == records_hash:
+            return self.truemins[source][1]
+        source_dir = self.interim_data_dir.joinpath(source)
+        if not source_dir.is_dir() or not any(source_dir.iterdir()):
+            # Not cached, the records may be parsed before the next poll
+            return None
+        truemin = get_truemin(self.interim_data_dir, source)[0][-1]
+        self.truemins[source] = (records_hash, truemin)
+        return truemin
+
+    def update(self, updated, followers):
+        """Evaluates the updated live records and writes the stop list.
+
+        Args:
+            updated (dict): Updated live records by path, see poll_runs.
+            followers (dict): Followers by live record path, see poll_runs.
+            The location of boss.out is added to the status of each run,
+            since the live records are numbered in a different order than
+            the run folders.
+
+        Returns:
+            list: Keys (experiment/run) of the runs to stop.
+        """
+        self.parse_manifest = load_manifest(self.interim_data_dir)
+        records = dict(updated)
+        for path in sorted(self.live_data_dir.glob('*/*.json')):
+            key = self._get_key(path)
+            if str(path) not in records and (
+                    key not in self.statuses or
+                    self.statuses[key].get('truemin') !=
+                    self.get_truemin(path.parent.name)):
+                records[str(path)] = load_json('', path)
+        for path, results in records.items():
+            truemin = self.get_truemin(Path(path).parent.name)
+            status = get_convergence_status(results, truemin, **self.rules)
+            status['truemin'] = truemin
+            if path in followers:
+                status['boss_out'] = followers[path].out.path
+            self.statuses[self._get_key(path)] = status
+        # Runs whose live record has been removed
+        for key in list(self.statuses):
+            if not self.live_data_dir.joinpath(key).is_file():
+                del self.statuses[key]
+
+        stop_list = sorted(key for key, status in self.statuses.items()
+                           if status['stop'])
+        save_json({'rules': self.rules, 'stop': stop_list,
+                   'runs': self.statuses},
+                  str(self.live_data_dir), f'/{STOP_LIST_NAME}')
+        return stop_list
+
+    def _get_key(self, path):
+        return os.path.relpath(path, self.live_data_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import subprocess
+import sys
+import time
+import click
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+# Add path to use read_write.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.read_write import load_yaml, load_json, save_json
+from preprocess.manifest import fingerprint_file
+
+THESIS_DIR = Path(__file__).resolve().parent.parent
+# Fingerprints of the inputs of each node at its last successful run
+STATE_PATH = THESIS_DIR / 'data' / 'pipeline_state.json'
+# Files in input folders which are not fingerprinted
+IGNORED_PARTS = ('__pycache__',)
+IGNORED_SUFFIXES = ('.pyc', '.tmp')
+GLOB_CHARACTERS = '*?['
+
+
+@click.command()
+@click.option('--config', default='pipeline.yaml',
+    help='Pipeline config in the scripts folder.')
+@click.option('--jobs', default=1, type=int,
+    help='Number of nodes that run at the same time.')
+@click.option('--node', 'selected_nodes', multiple=True,
+    help='Only run this node and the nodes it depends on. Can be given '
+         'several times.')
+@click.option('--force', default=False, is_flag=True,
+    help='Run the nodes even if their inputs did not change.')
+def main(config, jobs, selected_nodes, force):
+    """Runs the scripts of the pipeline (raw data -> preprocess -> analyse)
+    declared in scripts/pipeline.yaml.
+
+    Independent nodes run concurrently, nodes whose inputs did not change
+    are skipped. The time taken by each node is reported at the end.
+    """
+    nodes = load_yaml(THESIS_DIR / 'scripts', f'/{config}')['nodes']
+    dependencies = get_node_dependencies(nodes)
+    if len(selected_nodes) > 0:
+        nodes = select_nodes(nodes, dependencies, selected_nodes)
+    state = load_json('', STATE_PATH) if STATE_PATH.is_file() else {}
+    report = run_pipeline(nodes, dependencies, state, jobs, force)
+    print_report(report)
+    if any(status in ('failed', 'blocked') for status, _ in report.values()):
+        sys.exit(1)
+
+
+def get_node_dependencies(nodes):
+    """Returns for each node the nodes whose outputs it reads.
+
+    Args:
+        nodes (dict): Nodes of the pipeline, see pipeline.yaml.
+
+    Returns:
+        dict: Set of upstream nodes of each node.
+    """
+    dependencies = {}
+    for name, node in nodes.items():
+        dependencies[name] = set(
+            other for other, other_node in nodes.items()
+            if other != name and any(
+                overlaps(input_, output) for input_ in node['inputs']
+                for output in other_node['outputs']))
+    get_node_order(dependencies)    # raises for cycles
+    return dependencies
+
+
+def get_node_order(dependencies):
+    """Returns the nodes sorted such that every node comes after its
+    upstream nodes."""
+    order, done = [], set()
+    remaining = sorted(dependencies)
+    while len(remaining) > 0:
+        ready = [name for name in remaining if dependencies[name] <= done]
+        if len(ready) == 0:
+            raise ValueError(f'Cyclic dependencies between {remaining}')
+        order += ready
+        done.update(ready)
+        remaining = [name for name in remaining if name not in done]
+    return order
+
+
+def select_nodes(nodes, dependencies, selected_nodes):
+    """Returns the selected nodes and all nodes they depend on."""
+    selected, stack = set(), list(selected_nodes)
+    while len(stack) > 0:
+        name = stack.pop()
+        if name not in nodes:
+            raise click.BadParameter(f'Unknown node {name}')
+        if name not in selected:
+            selected.add(name)
+            stack.extend(dependencies[name])
+    return {name: node for name, node in nodes.items() if name in selected}
+
+
+def overlaps(path, other_path):
+    """Returns True if one of the paths (or glob patterns) contains the
+    other one."""
+    parts = _get_fixed_parts(path)
+    other_parts = _get_fixed_parts(other_path)
+    length = min(len(parts), len(other_parts))
+    return parts[:length] == other_parts[:length]
+
+
+def _get_fixed_parts(pattern):
+    # Path components before the first component with a glob character
+    parts = []
+    for part in Path(pattern).parts:
+        if any(char in part for char in GLOB_CHARACTERS):
+            break
+        parts.append(part)
+    return tuple(parts)
+
+
+def list_files(patterns):
+    """Returns the sorted paths of all files matching the patterns, including
+    the files in matching folders."""
+    files = set()
+    for pattern in patterns:
+        for path in THESIS_DIR.glob(pattern):
+            candidates = path.rglob('*') if path.is_dir() else [path]
+            files.update(
+                candidate for candidate in candidates
+                if candidate.is_file() and
+                not any(part in IGNORED_PARTS for part in candidate.parts) and
+                not candidate.name.endswith(IGNORED_SUFFIXES))
+    return sorted(files)
+
+
+def hash_node_inputs(node, previous_fingerprints):
+    """Returns a hash of the script, the arguments and the content of the
+    inputs of a node, and the fingerprints of the input files.
+
+    The content hash of an input file is only computed again if its size or
+    modification time changed (see manifest.fingerprint_file).
+
+    Args:
+        node (dict): Node of the pipeline.
+        previous_fingerprints (dict): Fingerprints of the last run by path.
+    """
+    fingerprints = {}
+    for path in list_files([node['script'], *node['inputs']]):
+        key = str(path.relative_to(THESIS_DIR))
+        fingerprints[key] = fingerprint_file(
+            path, previous_fingerprints.get(key), root=THESIS_DIR)
+    serialized = json.dumps({
+        'command': [node['script'], *map(str, node['args'])],
+        'inputs': [[key, fingerprint['sha256']]
+                   for key, fingerprint in fingerprints.items()]})
+    return hashlib.sha256(serialized.encode()).hexdigest(), fingerprints
+
+
+def outputs_exist(node):
+    return all(any(True for _ in THESIS_DIR.glob(output))
+               for output in node['outputs'])
+
+
+def run_node(node):
+    """Runs the script of a node in a separate process.
+
+    Returns:
+        tuple: Return code and output of the script.
+    """
+    for output in node['outputs']:
+        parts = _get_fixed_parts(output)
+        if len(parts) > 1:
+            THESIS_DIR.joinpath(*parts[:-1]).mkdir(parents=True,
+                                                   exist_ok=True)
+    process = subprocess.run(
+        [sys.executable, node['script'], *map(str, node['args'])],
+        cwd=THESIS_DIR, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True)
+    return process.returncode, process.stdout
+
+
+def run_pipeline(nodes, dependencies, state, jobs=1, force=False):
+    """Runs the nodes of the pipeline.
+
+    A node is started as soon as all its upstream nodes have finished. Its
+    inputs are fingerprinted at that point, so that changed outputs of the
+    upstream nodes are seen. Nodes downstream of a failed node are not run.
+    The state is saved after every successful node.
+
+    Args:
+        nodes (dict): Nodes of the pipeline, see pipeline.yaml.
+        dependencies (dict): Upstream nodes, see get_node_dependencies.
+        state (dict): Input hash and fingerprints of the last successful
+        run of each node.
+        jobs (int, optional): Number of nodes that run at the same time.
+        Defaults to 1.
+        force (bool, optional): Run nodes with unchanged inputs too.
+        Defaults to False.
+
+    Returns:
+        dict: Status ('ran', 'skipped', 'failed' or 'blocked') and time in
+        seconds of each node, in the order the nodes finished.
+    """
+    report = {}
+    pending = [name for name in get_node_order(dependencies)
+               if name in nodes]
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        while len(pending) > 0 or len(running) > 0:
+            for name in list(pending):
+                upstream = dependencies[name] & set(nodes)
+                if any(report.get(other, ('',))[0] in ('failed', 'blocked')
+                       for other in upstream):
+                    report[name] = ('blocked', 0.)
+                    pending.remove(name)
+                elif upstream <= set(report):
+                    pending.remove(name)
+                    start = time.perf_counter()
+                    previous = state.get(name, {})
+                    input_hash, fingerprints = hash_node_inputs(
+                        nodes[name], previous.get('fingerprints', {}))
+                    if not force and previous.get('hash') == input_hash \
+                            and outputs_exist(nodes[name]):
+                        report[name] = ('skipped',
+                                        time.perf_counter() - start)
+                        continue
+                    print(f'Running {name}')
+                    future = executor.submit(run_node, nodes[name])
+                    running[future] = (name, start, input_hash, fingerprints)
+            if len(running) == 0:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, start, input_hash, fingerprints = running.pop(future)
+                returncode, output = future.result()
+                seconds = time.perf_counter() - start
+                if returncode != 0:
+                    print(f'{name} failed:\n{output}')
+                    report[name] = ('failed', seconds)
+                    continue
+                report[name] = ('ran', seconds)
+                state[name] = {'hash': input_hash,
+                               'fingerprints': fingerprints}
+                STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+                save_json(state, '', str(STATE_PATH))
+    return report
+
+
+def print_report(report):
+    width = max([len(name) for name in report] + [4])
+    print(f"{'node':<{width}}  {'status':<7}  time [s]")
+    for name, (status, seconds) in report.items():
+        print(f'{name:<{width}}  {status:<7}  {seconds:8.2f}')
+
+
+if __name__ == '__main__':
+    main()
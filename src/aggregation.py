@@ -0,0 +1,163 @@
+import numpy as np
+from src.ragged import RaggedArray, as_ragged
+
+
+def concatenate_runs(costs_per_run, values_per_run):
+    """Concatenates the (cost, value) pairs of several runs.
+
+    As with zip, pairs are only formed up to the shorter of the two
+    sequences of a run.
+
+    Parameters
+    ----------
+    costs_per_run : RaggedArray or list
+        Cumulative costs of each run.
+    values_per_run : RaggedArray or list
+        Values (e.g. predicted global minimum) of each run.
+
+    Returns
+    -------
+    tuple
+        Arrays costs, values and run_ids of equal length.
+    """
+    costs = as_ragged(costs_per_run, float)
+    values = as_ragged(values_per_run, float)
+    num_runs = min(len(costs), len(values))
+    costs, values = costs[:num_runs], values[:num_runs]
+    lengths = np.minimum(costs.lengths, values.lengths)
+    costs, values = costs.truncate(lengths), values.truncate(lengths)
+    return costs.values, values.values, costs.run_ids
+
+
+def group_costs(costs, decimals=1, rounding_function=None, bin_edges=None):
+    """Assigns each cost to a group.
+
+    Costs are first rounded to 'decimals' digits. Then, either the
+    rounding_function is applied to each distinct rounded cost (e.g.
+    lambda x: round(x)), or the costs are put in the bins
+    (bin_edges[i-1], bin_edges[i]], which are labelled by their upper edge.
+    Costs outside the bins are not assigned to any group.
+
+    Parameters
+    ----------
+    costs : np.ndarray
+        Costs.
+    decimals : int, optional
+        Number of decimals to round the costs to first, by default 1.
+    rounding_function : callable, optional
+        Maps a (rounded) cost to the cost of its group, by default None.
+    bin_edges : array_like, optional
+        Increasing bin edges, by default None.
+
+    Returns
+    -------
+    tuple
+        Sorted costs of the groups and the group index of each cost (-1, if
+        the cost is outside the bins).
+    """
+    if rounding_function is not None and bin_edges is not None:
+        raise ValueError('Give either rounding_function or bin_edges')
+    costs = _round_like_python(np.asarray(costs, dtype=float), decimals)
+    if bin_edges is not None:
+        bin_edges = np.asarray(bin_edges, dtype=float)
+        bin_idx = np.searchsorted(bin_edges, costs, side='left')
+        inside = (bin_idx > 0) & (bin_idx < len(bin_edges))
+        bins, group_idx = np.unique(bin_idx[inside], return_inverse=True)
+        groups = np.full(len(costs), -1)
+        groups[inside] = group_idx
+        return bin_edges[bins], groups
+    distinct_costs, groups = np.unique(costs, return_inverse=True)
+    if rounding_function is None:
+        return distinct_costs, groups
+    # The rounding function is only called once for each distinct cost
+    rounded_costs = np.array([rounding_function(cost) for cost
+                              in distinct_costs.tolist()], dtype=float)
+    labels, rounded_groups = np.unique(rounded_costs, return_inverse=True)
+    return labels, rounded_groups[groups]
+
+
+def _round_like_python(costs, decimals):
+    # np.round scales by 10**decimals before rounding, which puts costs
+    # like 0.15 (stored as 0.1499...) in another group than round(0.15, 1)
+    distinct_costs, inverse = np.unique(costs, return_inverse=True)
+    rounded = np.array([round(cost, decimals) for cost
+                        in distinct_costs.tolist()], dtype=float)
+    return rounded[inverse.reshape(costs.shape)]
+
+
+def aggregate_by_cost(costs, values, run_ids=None, decimals=1,
+                      rounding_function=None, bin_edges=None, quantiles=()):
+    """Calculates mean, standard deviation and quantiles of the values of
+    all runs for each (rounded or binned) cost.
+
+    Replaces collecting the values in a dict of lists keyed by the rounded
+    cost. All statistics are calculated for all groups at once.
+
+    Parameters
+    ----------
+    costs : array_like or RaggedArray
+        Costs of all runs, see concatenate_runs. If costs and values are
+        RaggedArrays (one series per run), they are concatenated first and
+        the run of each value is taken from them.
+    values : array_like or RaggedArray
+        Values of all runs.
+    run_ids : array_like, optional
+        Run of each value, by default None. If given, the number of runs
+        contributing to each group is returned as well.
+    decimals : int, optional
+        See group_costs, by default 1.
+    rounding_function : callable, optional
+        See group_costs, by default None.
+    bin_edges : array_like, optional
+        See group_costs, by default None.
+    quantiles : array_like, optional
+        Quantiles to calculate (linear interpolation, as np.quantile), by
+        default none.
+
+    Returns
+    -------
+    dict
+        Arrays 'cost', 'mean', 'sd' (population standard deviation, as
+        np.std), 'count', 'quantiles' (shape (len(quantiles), groups)) and,
+        if run_ids are given or taken from RaggedArrays, 'num_runs'.
+    """
+    if isinstance(costs, RaggedArray) or isinstance(values, RaggedArray):
+        costs, values, ragged_run_ids = concatenate_runs(costs, values)
+        run_ids = ragged_run_ids if run_ids is None else run_ids
+    values = np.asarray(values, dtype=float)
+    group_cost, groups = group_costs(costs, decimals, rounding_function,
+                                     bin_edges)
+    inside = groups >= 0
+    groups, values = groups[inside], values[inside]
+    num_groups = len(group_cost)
+
+    count = np.bincount(groups, minlength=num_groups)
+    mean = np.bincount(groups, weights=values, minlength=num_groups) / count
+    # Two passes, since the values (energies) have a large offset
+    deviations = values - mean[groups]
+    variance = np.bincount(groups, weights=deviations**2,
+                           minlength=num_groups) / count
+    statistics = {'cost': group_cost, 'mean': mean,
+                  'sd': np.sqrt(variance), 'count': count,
+                  'quantiles': _grouped_quantiles(groups, values, count,
+                                                  quantiles)}
+    if run_ids is not None:
+        run_ids = np.asarray(run_ids)[inside]
+        group_runs = np.unique(np.stack([groups, run_ids]), axis=1)
+        statistics['num_runs'] = np.bincount(group_runs[0],
+                                             minlength=num_groups)
+    return statistics
+
+
+def _grouped_quantiles(groups, values, count, quantiles):
+    quantiles = np.atleast_1d(np.asarray(quantiles, dtype=float))
+    if len(quantiles) == 0 or len(count) == 0:
+        return np.empty((len(quantiles), len(count)))
+    sorted_values = values[np.lexsort((values, groups))]
+    start = np.concatenate([[0], np.cumsum(count)[:-1]])
+    positions = quantiles[:, None] * (count - 1)
+    lower = np.floor(positions).astype(int)
+    upper = np.ceil(positions).astype(int)
+    weight = positions - lower
+    return (1 - weight) * sorted_values[start + lower] + \
+        weight * sorted_values[start + upper]
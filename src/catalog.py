@@ -0,0 +1,342 @@
+import os
+import re
+import sqlite3
+from pathlib import Path
+from src.read_write import LazyRecord, list_run_files
+
+CATALOG_NAME = 'catalog.sqlite'
+# Fidelity of an experiment or baseline, e.g. '4UHFbasic1_r' or
+# '2HF_ICM1_ELCB1'
+FIDELITY_PATTERN = re.compile(r'^\d+_?(LF|HF|VHF|UHF)')
+# Entries of the processed runs which are stored in the catalog
+FIELDS = ['dim', 'num_tasks', 'kernel', 'header', 'initpts', 'run_completed',
+          'tolerance_levels', 'iterations_to_gmp_convergence',
+          'totaltime_to_gmp_convergence']
+# Columns of the runs table which can be used as filters in query
+QUERY_COLUMNS = ('setup', 'experiment', 'run', 'run_index', 'dimension',
+                 'num_tasks', 'fidelity', 'secondary_fidelity', 'kernel',
+                 'acqfn', 'strategy', 'initpts', 'secondary_initpts',
+                 'completed')
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS experiments (
+    setup TEXT NOT NULL,
+    name TEXT NOT NULL,
+    hash TEXT,
+    PRIMARY KEY (setup, name)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    setup TEXT NOT NULL,
+    experiment TEXT NOT NULL,
+    run TEXT NOT NULL,
+    run_index INTEGER,
+    path TEXT NOT NULL,
+    dimension INTEGER,
+    num_tasks INTEGER,
+    fidelity TEXT,
+    secondary_fidelity TEXT,
+    kernel TEXT,
+    acqfn TEXT,
+    strategy TEXT,
+    initpts INTEGER,
+    secondary_initpts INTEGER,
+    completed INTEGER,
+    UNIQUE (setup, experiment, run)
+);
+CREATE TABLE IF NOT EXISTS convergence (
+    run_id INTEGER NOT NULL,
+    tolerance REAL NOT NULL,
+    iterations INTEGER,
+    totaltime REAL,
+    PRIMARY KEY (run_id, tolerance)
+);
+CREATE INDEX IF NOT EXISTS runs_by_setup ON runs
+    (setup, dimension, fidelity, secondary_fidelity);
+CREATE INDEX IF NOT EXISTS runs_by_experiment ON runs (experiment);
+CREATE INDEX IF NOT EXISTS runs_by_initpts ON runs
+    (initpts, secondary_initpts);
+CREATE INDEX IF NOT EXISTS convergence_by_tolerance ON convergence
+    (tolerance, iterations);
+'''
+
+
+class RunHandle:
+    """Location of a processed run found in the catalog.
+
+    Parameters
+    ----------
+    setup : str
+        'transfer_learning' or 'multi_task_learning'.
+    experiment : str
+        Name of experiment.
+    run : str
+        Name of run, e.g. 'exp_1'.
+    path : Path
+        Path to the .json or .npz file of the run.
+    """
+
+    def __init__(self, setup, experiment, run, path):
+        self.setup = setup
+        self.experiment = experiment
+        self.run = run
+        self.path = Path(path)
+
+    def load(self, fields=None):
+        """Returns the run as a LazyRecord, see read_write.LazyRecord."""
+        return LazyRecord(self.path, fields)
+
+    def __eq__(self, other):
+        return isinstance(other, RunHandle) and \
+            (self.setup, self.experiment, self.run, self.path) == \
+            (other.setup, other.experiment, other.run, other.path)
+
+    def __hash__(self):
+        return hash((self.setup, self.experiment, self.run))
+
+    def __repr__(self):
+        return (f'RunHandle({self.setup!r}, {self.experiment!r}, '
+                f'{self.run!r})')
+
+
+class ExperimentCatalog:
+    """SQLite catalog with one row per processed run, which is filled by the
+    derive stage (see parse_raw_data.run_derive_stage).
+
+    Each run is stored with its setup, dimension, fidelities, kernel,
+    acquisition function, initialization strategy, initial points, run
+    index, completion flag and its convergence at each tolerance level.
+    An experiment is indexed again when the hash of its derivation inputs
+    (see manifest.hash_derived_inputs) changed or when it was derived again
+    because an experiment it depends on changed.
+
+    Parameters
+    ----------
+    catalog_path : Path
+        Path to the SQLite file, created if it does not exist.
+    """
+
+    def __init__(self, catalog_path):
+        self.catalog_path = Path(catalog_path)
+        self.catalog_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.catalog_path, timeout=60)
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def sync_setup(self, setup, processed_data_dir, derived_manifest,
+                   config, derived_experiments=()):
+        """Indexes the experiments of a setup whose processed runs changed
+        and drops the experiments which are not processed anymore.
+
+        Parameters
+        ----------
+        setup : str
+            'transfer_learning' or 'multi_task_learning'.
+        processed_data_dir : Path
+            Path to processed data.
+        derived_manifest : dict
+            Hash of the derivation inputs of each experiment.
+        config : Config
+            Content of config_tl.yaml or config_mt.yaml.
+        derived_experiments : iterable, optional
+            Experiments which were derived again. They are indexed even if
+            their hash did not change, since the hash does not cover the
+            experiments they depend on, by default ().
+
+        Returns
+        -------
+        list
+            Names of the indexed experiments.
+        """
+        derived_experiments = set(derived_experiments)
+        indexed_hashes = dict(self.connection.execute(
+            'SELECT name, hash FROM experiments WHERE setup = ?', (setup,)))
+        indexed = []
+        with self.connection:
+            for exp in indexed_hashes:
+                if exp not in derived_manifest:
+                    self._delete_experiment(setup, exp)
+            for exp, exp_hash in sorted(derived_manifest.items()):
+                if indexed_hashes.get(exp) != exp_hash or \
+                        exp in derived_experiments:
+                    self._index_experiment(
+                        setup, exp, Path(processed_data_dir) / exp, config,
+                        exp_hash)
+                    indexed.append(exp)
+        return indexed
+
+    def query(self, tolerance=None, converged=None, **filters):
+        """Returns the runs which match all filters.
+
+        Parameters
+        ----------
+        tolerance : float, optional
+            Tolerance level the convergence filter refers to, by default
+            None.
+        converged : bool, optional
+            Only runs which did (True) or did not (False) converge at the
+            tolerance level, by default None (no filter).
+        **filters
+            Values of the columns in QUERY_COLUMNS, e.g. dimension=4 or
+            fidelity='UHF'. A list or tuple matches any of its values.
+
+        Returns
+        -------
+        list
+            RunHandle of each matching run, sorted by setup, experiment and
+            run index.
+
+        Examples
+        --------
+        All 4D LF -> UHF runs with 200 secondary initial points that did
+        not converge at 0.1 kcal/mol:
+
+        >>> catalog.query(dimension=4, fidelity='UHF',
+        ...               secondary_fidelity='LF', secondary_initpts=200,
+        ...               tolerance=0.1, converged=False)
+        """
+        conditions, parameters = [], []
+        for column, value in filters.items():
+            if column not in QUERY_COLUMNS:
+                raise ValueError(f'Unknown filter {column}, chose from '
+                                 f'{QUERY_COLUMNS}')
+            if isinstance(value, (list, tuple)):
+                placeholders = ', '.join('?' * len(value))
+                conditions.append(f'runs.{column} IN ({placeholders})')
+                parameters += list(value)
+            elif value is None:
+                conditions.append(f'runs.{column} IS NULL')
+            else:
+                conditions.append(f'runs.{column} = ?')
+                parameters.append(value)
+        join = ''
+        if converged is not None:
+            if tolerance is None:
+                raise ValueError('A tolerance is needed to filter by '
+                                 'convergence')
+            join = 'JOIN convergence ON convergence.run_id = runs.id ' \
+                   'AND convergence.tolerance = ?'
+            parameters.insert(0, tolerance)
+            conditions.append('convergence.iterations IS ' +
+                              ('NOT NULL' if converged else 'NULL'))
+        where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+        rows = self.connection.execute(
+            f'SELECT runs.setup, runs.experiment, runs.run, runs.path '
+            f'FROM runs {join} {where} '
+            f'ORDER BY runs.setup, runs.experiment, runs.run_index',
+            parameters)
+        return [RunHandle(setup, experiment, run,
+                          self.catalog_path.parent / path)
+                for setup, experiment, run, path in rows]
+
+    def _delete_experiment(self, setup, exp):
+        self.connection.execute(
+            'DELETE FROM convergence WHERE run_id IN '
+            '(SELECT id FROM runs WHERE setup = ? AND experiment = ?)',
+            (setup, exp))
+        self.connection.execute(
+            'DELETE FROM runs WHERE setup = ? AND experiment = ?',
+            (setup, exp))
+        self.connection.execute(
+            'DELETE FROM experiments WHERE setup = ? AND name = ?',
+            (setup, exp))
+
+    def _index_experiment(self, setup, exp, processed_exp_dir, config,
+                          exp_hash):
+        self._delete_experiment(setup, exp)
+        experiment_columns = get_experiment_columns(exp, config)
+        for path in list_run_files(processed_exp_dir) \
+                if processed_exp_dir.is_dir() else []:
+            record = LazyRecord(path, FIELDS)
+            run = path.name[:-len(path.suffix)]
+            columns = {
+                'setup': setup, 'experiment': exp, 'run': run,
+                'run_index': int(run.split('_')[-1]),
+                'path': os.path.relpath(path, self.catalog_path.parent),
+                **experiment_columns, **get_run_columns(record)}
+            cursor = self.connection.execute(
+                f"INSERT INTO runs ({', '.join(columns)}) VALUES "
+                f"({', '.join('?' * len(columns))})",
+                list(columns.values()))
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO convergence VALUES (?, ?, ?, ?)',
+                [(cursor.lastrowid, *row)
+                 for row in get_convergence_rows(record, config)])
+        self.connection.execute(
+            'INSERT INTO experiments VALUES (?, ?, ?)',
+            (setup, exp, exp_hash))
+
+
+def get_fidelity(exp):
+    """Returns the fidelity (e.g. 'UHF') in the name of an experiment, or
+    None."""
+    match = FIDELITY_PATTERN.match(exp)
+    return match.group(1) if match else None
+
+
+def get_experiment_columns(exp, config):
+    """Returns the catalog columns which are the same for all runs of an
+    experiment: the fidelities and the initialization strategies of its
+    baselines (joined by ',')."""
+    baselines = config['experiments'].get(exp)
+    secondary_fidelity, strategy = None, None
+    if baselines is not None:
+        if len(baselines) > 1:
+            secondary_fidelity = get_fidelity(baselines[1][0])
+        strategy = ','.join(strategy for _, strategy in baselines)
+    return {'fidelity': get_fidelity(exp),
+            'secondary_fidelity': secondary_fidelity,
+            'strategy': strategy}
+
+
+def get_run_columns(record):
+    """Returns the catalog columns of a run which are read from its
+    processed record."""
+    initpts = record.get('initpts')
+    if initpts is not None and not isinstance(initpts, (list, tuple)):
+        initpts = [initpts]
+    initpts = [] if initpts is None else list(initpts)
+    kernel = record.get('kernel')
+    if isinstance(kernel, (list, tuple)):
+        kernel = ','.join(kernel)
+    run_completed = record.get('run_completed') or [None]
+    return {
+        'dimension': record.get('dim'),
+        'num_tasks': record.get('num_tasks'),
+        'kernel': kernel,
+        'acqfn': get_header_entry(record.get('header') or [], 'acqfn'),
+        'initpts': initpts[0] if len(initpts) > 0 else None,
+        'secondary_initpts': initpts[1] if len(initpts) > 1 else None,
+        'completed': None if run_completed[-1] is None
+        else int(bool(run_completed[-1]))}
+
+
+def get_header_entry(header, key):
+    """Returns the value of a keyword in the header of boss.out (e.g.
+    'acqfn elcb' -> 'elcb'), or None."""
+    for line in header:
+        entries = line.split(maxsplit=1)
+        if len(entries) == 2 and entries[0] == key:
+            return entries[1].strip()
+    return None
+
+
+def get_convergence_rows(record, config):
+    """Returns (tolerance, iterations, totaltime) of each tolerance level.
+    Iterations and totaltime are None if the run did not converge."""
+    iterations = record.get('iterations_to_gmp_convergence')
+    if iterations is None:
+        return []
+    totaltimes = record.get('totaltime_to_gmp_convergence') or \
+        [None] * len(iterations)
+    tolerances = record.get('tolerance_levels') or config['tolerances']
+    return [(float(tolerance), iteration, totaltime)
+            for tolerance, iteration, totaltime
+            in zip(tolerances, iterations, totaltimes)]
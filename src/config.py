@@ -0,0 +1,272 @@
+import hashlib
+import os
+import pickle
+import re
+from collections.abc import Mapping
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+import yaml
+from src.read_write import YAML_LOADER
+
+# Folder of the configs
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / 'scripts'
+# Folder of the compiled configs, see load_config
+CONFIG_CACHE_DIR = SCRIPTS_DIR / '__pycache__'
+# Increase when the validation or the compiled format changes, so that
+# compiled configs of older versions are not used
+CONFIG_CACHE_VERSION = 1
+# Initialization strategies of the baselines of an experiment
+INIT_STRATEGIES = ('self', 'random', 'inorder')
+# Keys of the experiment plots, e.g. 'TL_experiment_plots_2D'
+EXPERIMENT_PLOTS_PATTERN = re.compile(r'^\w+_experiment_plots_\w+$')
+
+
+class Config(Mapping):
+    """Content of config_tl.yaml or config_mt.yaml, which can not be
+    modified.
+
+    The config is read like the dict returned by load_yaml (e.g.
+    config['experiments'][exp]), but mappings are read-only and lists are
+    tuples. Lookups used by several scripts are computed once.
+
+    Parameters
+    ----------
+    name : str
+        Name of the config file, e.g. 'config_tl.yaml'.
+    data : dict
+        Validated content of the config, see validate_config.
+
+    Attributes
+    ----------
+    baselines : Mapping
+        Truemin source of each baseline experiment.
+    experiments : Mapping
+        Pairs (baseline, initialization strategy) of each multi-task
+        experiment.
+    tolerances : tuple
+        Tolerance levels in kcal/mol.
+    tolerance_indices : Mapping
+        Index of each tolerance level in tolerances.
+    truemin_sources : Mapping
+        Experiment whose best acquisitions define the truemin of each
+        configured experiment (for multi-task experiments the truemin
+        source of the primary task).
+    """
+
+    def __init__(self, name, data):
+        self.name = name
+        self._raw = data
+        self._data = MappingProxyType(
+            {key: _freeze(value) for key, value in data.items()})
+        self.baselines = self._data['baselines']
+        self.experiments = self._data['experiments']
+        self.tolerances = self._data['tolerances']
+        tolerance_indices = {}
+        for idx, tolerance in enumerate(self.tolerances):
+            tolerance_indices.setdefault(tolerance, idx)
+        self.tolerance_indices = MappingProxyType(tolerance_indices)
+        truemin_sources = dict(self.baselines)
+        for exp, baselines in self.experiments.items():
+            primary_task = baselines[0][0]
+            truemin_sources[exp] = self.baselines.get(primary_task)
+        self.truemin_sources = MappingProxyType(truemin_sources)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __reduce__(self):
+        # Read-only mappings can not be pickled, e.g. for process pools
+        return (Config, (self.name, self._raw))
+
+    def __repr__(self):
+        return f'Config({self.name!r})'
+
+    def tolerance_index(self, tolerance):
+        """Returns the index of a tolerance level in tolerances.
+
+        Parameters
+        ----------
+        tolerance : float
+            Tolerance level in kcal/mol.
+
+        Returns
+        -------
+        int
+            Index of the tolerance level.
+
+        Raises
+        ------
+        ValueError
+            If the tolerance level is not in the config.
+        """
+        if tolerance not in self.tolerance_indices:
+            raise ValueError(
+                f'Invalid tolerance level, chose from {list(self.tolerances)}')
+        return self.tolerance_indices[tolerance]
+
+    def experiment_plots(self, kind, dimension):
+        """Returns the experiments of a plot with their [primary task,
+        secondary task] pairs, e.g. for kind='TL' and dimension='2D' the
+        entry 'TL_experiment_plots_2D'."""
+        return self._data[f'{kind}_experiment_plots_{dimension}']
+
+
+def validate_config(data, name='config'):
+    """Checks the schema of a config.
+
+    Parameters
+    ----------
+    data : dict
+        Content of the config.
+    name : str, optional
+        Name of the config in the error message, by default 'config'.
+
+    Raises
+    ------
+    ValueError
+        Listing all problems found.
+    """
+    if not isinstance(data, dict):
+        raise ValueError(f'{name}: expected a mapping at the top level')
+    errors = []
+    for key in ('baselines', 'experiments', 'tolerances'):
+        if key not in data:
+            errors.append(f"missing '{key}'")
+    baselines = data.get('baselines', {})
+    if not _is_mapping_of(baselines, str):
+        errors.append("'baselines' must map experiments to truemin sources")
+        baselines = {}
+    known_baselines = set(baselines) | set(baselines.values())
+    experiments = data.get('experiments', {})
+    if not isinstance(experiments, dict):
+        errors.append("'experiments' must be a mapping")
+        experiments = {}
+    for exp, pairs in experiments.items():
+        if not isinstance(pairs, list) or len(pairs) == 0 or not all(
+                isinstance(pair, list) and len(pair) == 2 and
+                all(isinstance(entry, str) for entry in pair)
+                for pair in pairs):
+            errors.append(f"experiment '{exp}' must be a list of "
+                          f"[baseline, strategy] pairs")
+            continue
+        for baseline, strategy in pairs:
+            if baseline not in known_baselines:
+                errors.append(f"experiment '{exp}' uses unknown baseline "
+                              f"'{baseline}'")
+            if strategy not in INIT_STRATEGIES:
+                errors.append(f"experiment '{exp}' uses unknown "
+                              f"initialization strategy '{strategy}'")
+    tolerances = data.get('tolerances', [])
+    if not isinstance(tolerances, list) or len(tolerances) == 0 or not all(
+            isinstance(tolerance, (int, float)) and
+            not isinstance(tolerance, bool) and tolerance > 0
+            for tolerance in tolerances):
+        errors.append("'tolerances' must be a list of positive numbers")
+    for key, plots in data.items():
+        if EXPERIMENT_PLOTS_PATTERN.match(key) and not (
+                isinstance(plots, dict) and all(
+                    isinstance(tasks, list) and len(tasks) > 0 and
+                    all(isinstance(task, str) for task in tasks)
+                    for tasks in plots.values())):
+            errors.append(f"'{key}' must map experiments to lists of tasks")
+    if len(errors) > 0:
+        raise ValueError(f'Invalid {name}: ' + '; '.join(errors))
+
+
+def load_config(filename, path=SCRIPTS_DIR):
+    """Loads a config, once per process and version of the config.
+
+    The loaded config is kept in memory, and the parsed and validated
+    content is stored in a compiled config in CONFIG_CACHE_DIR. Both are
+    used as long as the modification time and size of the config are
+    unchanged, so that long-running processes (e.g. watch_convergence.py)
+    see edits of the config. The compiled config is also used if only the
+    modification time changed but not the content hash.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the config, e.g. 'config_tl.yaml'.
+    path : Path, optional
+        Folder of the config, by default the scripts folder.
+
+    Returns
+    -------
+    Config
+        Content of the config.
+    """
+    file_path = Path(path) / filename
+    stat = os.stat(file_path)
+    return _load_config(filename, str(file_path), stat.st_mtime_ns,
+                        stat.st_size)
+
+
+# Configs loaded by this process, by path, modification time and size
+@lru_cache(maxsize=8)
+def _load_config(filename, file_path, mtime_ns, size):
+    file_path = Path(file_path)
+    stat_key = [mtime_ns, size]
+    cache_path = CONFIG_CACHE_DIR / \
+        f'{filename}.{_get_path_hash(file_path)}.v{CONFIG_CACHE_VERSION}.pickle'
+    cached = _read_compiled_config(cache_path)
+    if cached is not None and cached['stat'] == stat_key:
+        return Config(filename, cached['data'])
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    sha256 = hashlib.sha256(content).hexdigest()
+    if cached is not None and cached['sha256'] == sha256:
+        data = cached['data']
+    else:
+        data = yaml.load(content, Loader=YAML_LOADER)
+        validate_config(data, filename)
+    _write_compiled_config(cache_path, {'stat': stat_key, 'sha256': sha256,
+                                        'data': data})
+    return Config(filename, data)
+
+
+def _get_path_hash(file_path):
+    # Configs with the same name in different folders get different caches
+    return hashlib.sha256(
+        str(file_path.resolve()).encode()).hexdigest()[:12]
+
+
+def _read_compiled_config(cache_path):
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def _write_compiled_config(cache_path, compiled):
+    # The compiled config is only an optimization, failing to write it
+    # (e.g. in a read-only checkout) is not an error
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f'{cache_path.name}.{os.getpid()}.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType(
+            {key: _freeze(entry) for key, entry in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(entry) for entry in value)
+    return value
+
+
+def _is_mapping_of(value, value_type):
+    return isinstance(value, dict) and all(
+        isinstance(entry, value_type) for entry in value.values())
@@ -0,0 +1,61 @@
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Placeholder of a module which is imported on first attribute access.
+
+    Heavy dependencies (matplotlib, seaborn, pandas, scipy) are bound to a
+    LazyModule at the top of a module, so that importing the module (e.g.
+    for --help) does not import them.
+
+    Parameters
+    ----------
+    name : str
+        Full name of the module, e.g. 'matplotlib.pyplot'.
+    on_import : callable, optional
+        Called with the imported module before the first attribute is
+        returned, e.g. to set the plot style, by default None.
+    """
+
+    def __init__(self, name, on_import=None):
+        super().__init__(name)
+        self._lazy_on_import = on_import
+        self._lazy_module = None
+
+    def _load(self):
+        if self._lazy_module is None:
+            module = importlib.import_module(self.__name__)
+            if self._lazy_on_import is not None:
+                self._lazy_on_import(module)
+            self._lazy_module = module
+        return self._lazy_module
+
+    def __getattr__(self, attr):
+        # Only called for attributes which are not set on the placeholder
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'imported' if self._lazy_module is not None else 'lazy'
+        return f'<{state} module {self.__name__!r}>'
+
+
+def lazy_import(name, on_import=None):
+    """Returns the module 'name', which is imported on first use.
+
+    Parameters
+    ----------
+    name : str
+        Full name of the module.
+    on_import : callable, optional
+        Called with the module once it is imported, by default None.
+
+    Returns
+    -------
+    LazyModule
+        Placeholder of the module.
+    """
+    return LazyModule(name, on_import)
@@ -0,0 +1,287 @@
+import numpy as np
+
+
+class RaggedArray:
+    """Series of different lengths, e.g. the 'gmp' or 'total_time' of
+    several runs, stored as one flat array of values and the offsets of the
+    runs in it.
+
+    Run i holds values[offsets[i]:offsets[i+1]]. Indexing a run returns a
+    view of the values and slicing runs (e.g. ragged[2:5]) returns a
+    RaggedArray whose values are a view as well. Reductions (sum, mean,
+    last, ...) are calculated for all runs at once.
+
+    Parameters
+    ----------
+    values : array_like
+        Values of all runs, concatenated along the first axis. Further axes
+        (e.g. the columns of 'gmp') are kept.
+    offsets : array_like
+        Start of each run in values followed by the end of the last run,
+        i.e. number of runs + 1 non-decreasing integers from 0 to
+        len(values).
+
+    Examples
+    --------
+    >>> ragged = RaggedArray.from_sequences([[1, 2, 3], [4]], dtype=float)
+    >>> ragged.lengths
+    array([3, 1])
+    >>> ragged.mean()
+    array([2., 4.])
+    """
+
+    def __init__(self, values, offsets):
+        self.values = np.asarray(values)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        if self.values.ndim == 0:
+            raise ValueError('values must have at least one dimension')
+        if self.offsets.ndim != 1 or len(self.offsets) == 0 or \
+                self.offsets[0] != 0 or \
+                self.offsets[-1] != len(self.values) or \
+                np.any(np.diff(self.offsets) < 0):
+            raise ValueError('offsets must increase from 0 to len(values)')
+
+    @classmethod
+    def from_sequences(cls, sequences, dtype=None):
+        """Returns the sequences (lists or arrays, one per run) as
+        RaggedArray."""
+        arrays = [np.asarray(sequence, dtype=dtype) for sequence in sequences]
+        lengths = [len(array) for array in arrays]
+        offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+        # Empty runs are left out, since their shape (0,) may not match
+        # the other runs (e.g. (n, 3) for 'gmp')
+        arrays = [array for array in arrays if len(array) > 0]
+        values = np.concatenate(arrays) if len(arrays) > 0 \
+            else np.zeros(0, dtype=float if dtype is None else dtype)
+        return cls(values, offsets)
+
+    @classmethod
+    def from_records(cls, records, key, column=None, dtype=float):
+        """Returns an entry of several runs as RaggedArray.
+
+        Parameters
+        ----------
+        records : list
+            Processed runs (dicts).
+        key : str
+            Entry of the runs, e.g. 'gmp'.
+        column : int, optional
+            Column of a 2D entry to keep, e.g. -2 for the predicted
+            minimum of 'gmp', by default None (all columns).
+        dtype : dtype, optional
+            Data type of the values, by default float.
+
+        Returns
+        -------
+        RaggedArray
+            Entry of each run.
+        """
+        sequences = [np.asarray(record[key], dtype=dtype)
+                     for record in records]
+        if column is not None:
+            sequences = [sequence[:, column] if len(sequence) > 0
+                         else sequence for sequence in sequences]
+        return cls.from_sequences(sequences, dtype)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self.values[self.offsets[idx]:self.offsets[idx + 1]]
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            idx = range(len(self))[key]
+            return self.values[self.offsets[idx]:self.offsets[idx + 1]]
+        if isinstance(key, slice) and key.step in (None, 1):
+            start, stop, _ = key.indices(len(self))
+            stop = max(start, stop)
+            offsets = self.offsets[start:stop + 1]
+            return RaggedArray(self.values[offsets[0]:offsets[-1]],
+                               offsets - offsets[0])
+        # Other keys (lists, boolean masks, slices with steps) copy the runs
+        runs = np.arange(len(self))[key]
+        lengths = self.lengths[runs]
+        offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+        take = np.repeat(self.offsets[:-1][runs] - offsets[:-1], lengths) + \
+            np.arange(offsets[-1])
+        return RaggedArray(self.values[take], offsets)
+
+    def __repr__(self):
+        return (f'RaggedArray({len(self)} runs, {len(self.values)} values, '
+                f'dtype={self.values.dtype})')
+
+    @property
+    def lengths(self):
+        """Number of values of each run."""
+        return np.diff(self.offsets)
+
+    @property
+    def run_ids(self):
+        """Run of each value."""
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    @property
+    def positions(self):
+        """Position of each value in its run, e.g. the iteration."""
+        return np.arange(len(self.values)) - \
+            np.repeat(self.offsets[:-1], self.lengths)
+
+    def with_values(self, values):
+        """Returns a RaggedArray with the same runs and other values, e.g.
+        ragged.with_values(ragged.values - truemin)."""
+        return RaggedArray(values, self.offsets)
+
+    def astype(self, dtype):
+        return self.with_values(self.values.astype(dtype))
+
+    def to_list(self):
+        """Returns the runs as list of lists, e.g. to save them as json."""
+        return [run.tolist() for run in self]
+
+    def reduce(self, ufunc, empty=np.nan):
+        """Reduces each run with a ufunc, e.g. np.add or np.maximum.
+
+        Parameters
+        ----------
+        ufunc : np.ufunc
+            Binary ufunc.
+        empty : scalar, optional
+            Result of runs without values, by default NaN.
+
+        Returns
+        -------
+        ndarray
+            One result per run.
+        """
+        nonempty = self.lengths > 0
+        result = np.full((len(self),) + self.values.shape[1:], empty,
+                         dtype=np.result_type(self.values.dtype,
+                                              np.asarray(empty).dtype))
+        if np.any(nonempty):
+            # Empty runs between two starts contain no values, so each
+            # segment of reduceat is exactly one run
+            result[nonempty] = ufunc.reduceat(
+                self.values, self.offsets[:-1][nonempty], axis=0)
+        return result
+
+    def sum(self):
+        if self.values.dtype == bool:           # count, e.g. of samples
+            return self.astype(np.int64).sum()
+        return self.reduce(np.add, empty=0)
+
+    def mean(self):
+        """Mean of each run, NaN for empty runs."""
+        lengths = self.lengths.reshape((-1,) + (1,) * (self.values.ndim - 1))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(lengths > 0, self.sum() / lengths, np.nan)
+
+    def min(self):
+        return self.reduce(np.minimum)
+
+    def max(self):
+        return self.reduce(np.maximum)
+
+    def first(self):
+        """First value of each run, NaN for empty runs."""
+        return self._take_from_runs(self.offsets[:-1])
+
+    def last(self):
+        """Last value of each run, NaN for empty runs."""
+        return self._take_from_runs(self.offsets[1:] - 1)
+
+    def _take_from_runs(self, indices):
+        nonempty = self.lengths > 0
+        result = np.full((len(self),) + self.values.shape[1:], np.nan,
+                         dtype=np.result_type(self.values, float))
+        result[nonempty] = self.values[indices[nonempty]]
+        return result
+
+    def cumsum(self):
+        """Cumulative sum within each run."""
+        cumulative = np.cumsum(self.values, axis=0)
+        # Sum of the values of all previous runs, subtracted from each run
+        previous = np.concatenate(
+            [np.zeros((1,) + self.values.shape[1:], dtype=cumulative.dtype),
+             cumulative])[self.offsets[:-1]]
+        return self.with_values(
+            cumulative - np.repeat(previous, self.lengths, axis=0))
+
+    def truncate(self, lengths):
+        """Returns the first lengths[i] values of each run i (or all values,
+        if run i is shorter)."""
+        lengths = np.minimum(np.broadcast_to(lengths, len(self)),
+                             self.lengths)
+        keep = self.positions < np.repeat(lengths, self.lengths)
+        return RaggedArray(self.values[keep],
+                           np.concatenate([[0], np.cumsum(lengths)]))
+
+    def align(self, length=None):
+        """Returns the runs aligned by their position (iteration).
+
+        Positions beyond the end of a run are masked, so that statistics
+        over the runs (e.g. aligned.mean(axis=0)) only use the runs which
+        reached the position, instead of padding them with zeros.
+
+        Parameters
+        ----------
+        length : int, optional
+            Number of positions, by default the length of the longest run.
+
+        Returns
+        -------
+        np.ma.MaskedArray
+            Shape (runs, length) + shape of the values.
+        """
+        length = int(self.lengths.max(initial=0)) if length is None \
+            else length
+        shape = (len(self), length) + self.values.shape[1:]
+        data = np.zeros(shape, dtype=self.values.dtype)
+        mask = np.ones(shape, dtype=bool)
+        positions = self.positions
+        inside = positions < length
+        data[self.run_ids[inside], positions[inside]] = self.values[inside]
+        mask[self.run_ids[inside], positions[inside]] = False
+        return np.ma.MaskedArray(data, mask)
+
+    def align_by_cost(self, costs, grid):
+        """Returns the runs aligned by cost.
+
+        The value of a run at a grid cost is its last value whose cost is
+        lower or equal. Grid costs before the first or after the last cost
+        of a run are masked.
+
+        Parameters
+        ----------
+        costs : RaggedArray
+            Non-decreasing cost of each value, with the same lengths.
+        grid : array_like
+            Costs to align the runs at.
+
+        Returns
+        -------
+        np.ma.MaskedArray
+            Shape (runs, len(grid)) + shape of the values.
+        """
+        if not np.array_equal(costs.lengths, self.lengths):
+            raise ValueError('costs and values must have the same lengths')
+        grid = np.asarray(grid, dtype=float)
+        shape = (len(self), len(grid)) + self.values.shape[1:]
+        data = np.zeros(shape, dtype=self.values.dtype)
+        mask = np.ones(shape, dtype=bool)
+        for run_idx, (run_costs, run_values) in enumerate(zip(costs, self)):
+            if len(run_costs) == 0:
+                continue
+            idx = np.searchsorted(run_costs, grid, side='right') - 1
+            inside = (idx >= 0) & (grid <= run_costs[-1])
+            data[run_idx, inside] = run_values[idx[inside]]
+            mask[run_idx, inside] = False
+        return np.ma.MaskedArray(data, mask)
+
+
+def as_ragged(runs, dtype=None):
+    """Returns runs (a RaggedArray or a list of sequences) as RaggedArray."""
+    if isinstance(runs, RaggedArray):
+        return runs if dtype is None else runs.astype(dtype)
+    return RaggedArray.from_sequences(runs, dtype)
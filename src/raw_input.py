@@ -0,0 +1,207 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import tarfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+# Openers of compressed single files, by suffix
+COMPRESSED_SUFFIXES = {'.gz': gzip.open, '.xz': lzma.open, '.bz2': bz2.open}
+ARCHIVE_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.xz', '.tar.bz2')
+# Separates the archive path and the member name in a locator, e.g.
+# 'raw/2HFbasic1.tar.gz::2HFbasic1/exp_1/boss.out'
+ARCHIVE_SEPARATOR = '::'
+# Number of archives kept open per process
+OPEN_ARCHIVES = 8
+
+
+def split_locator(locator):
+    """Splits a locator into the path on disk and the archive member name.
+
+    Parameters
+    ----------
+    locator : str or Path
+        Path to a (possibly compressed) file, or 'archive::member'.
+
+    Returns
+    -------
+    tuple
+        Path on disk and member name (None, if the locator is no archive
+        member).
+    """
+    locator = str(locator)
+    if ARCHIVE_SEPARATOR in locator:
+        path, member = locator.split(ARCHIVE_SEPARATOR, 1)
+        return path, _normalize_member(member)
+    return locator, None
+
+
+def _normalize_member(name):
+    name = os.path.normpath(name).strip('/')
+    return '' if name == '.' else name
+
+
+def join_locator(locator, *names):
+    """Appends path components to a directory or archive member locator."""
+    path, member = split_locator(locator)
+    if member is None:
+        return str(Path(path).joinpath(*names))
+    return ARCHIVE_SEPARATOR.join(
+        (path, '/'.join([member, *names]).strip('/')))
+
+
+def is_archive(path):
+    return str(path).endswith(ARCHIVE_SUFFIXES)
+
+
+def strip_archive_suffix(name):
+    for suffix in sorted(ARCHIVE_SUFFIXES, key=len, reverse=True):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+# Archives opened by this process, see get_archive. The least recently
+# used archive comes first.
+_open_archives = OrderedDict()
+
+
+def get_archive(path):
+    """Returns the opened tar archive and a dict of its members by name."""
+    key = (str(path), os.stat(path).st_mtime_ns)
+    if key in _open_archives:
+        _open_archives.move_to_end(key)
+        return _open_archives[key]
+    # Members of compressed archives can only be read sequentially. The
+    # archive is therefore kept open, so that reading members in archive
+    # order does not decompress the archive from the start every time.
+    archive = tarfile.open(key[0], 'r:*')
+    members = {_normalize_member(member.name): member
+               for member in archive.getmembers()}
+    _open_archives[key] = (archive, members)
+    if len(_open_archives) > OPEN_ARCHIVES:
+        _, (oldest, _) = _open_archives.popitem(last=False)
+        oldest.close()
+    return archive, members
+
+
+def close_archives():
+    """Closes the archives kept open by this process.
+
+    Forked processes share the file offset of inherited open files, so
+    archives opened before a fork must not be read by the child processes.
+    Call this before starting a process pool, and as its initializer.
+    """
+    while _open_archives:
+        _, (archive, _) = _open_archives.popitem()
+        archive.close()
+
+
+def _decompress(name, stream):
+    suffix = os.path.splitext(name)[1]
+    if suffix == '.gz':
+        return gzip.GzipFile(fileobj=stream)
+    if suffix == '.xz':
+        return lzma.LZMAFile(stream)
+    if suffix == '.bz2':
+        return bz2.BZ2File(stream)
+    return stream
+
+
+@contextmanager
+def open_raw_binary(locator):
+    """Opens a raw file for reading decompressed bytes.
+
+    Parameters
+    ----------
+    locator : str or Path
+        Path to a plain, .gz, .xz or .bz2 file, or 'archive::member' for a
+        (possibly compressed) member of a .tar, .tar.gz, .tar.xz or
+        .tar.bz2 archive.
+    """
+    path, member = split_locator(locator)
+    if member is None:
+        opener = COMPRESSED_SUFFIXES.get(os.path.splitext(path)[1], open)
+        with opener(path, 'rb') as f:
+            yield f
+    else:
+        archive, members = get_archive(path)
+        if member not in members:
+            raise FileNotFoundError(f'{member} not found in {path}')
+        with archive.extractfile(members[member]) as f:
+            yield _decompress(member, f)
+
+
+@contextmanager
+def open_raw_file(locator):
+    """Opens a raw file (see open_raw_binary) as text stream."""
+    path, member = split_locator(locator)
+    if member is None and \
+            os.path.splitext(path)[1] not in COMPRESSED_SUFFIXES:
+        with open(path, 'r') as f:
+            yield f
+    else:
+        with open_raw_binary(locator) as f:
+            yield io.TextIOWrapper(f)
+
+
+def raw_file_exists(locator):
+    path, member = split_locator(locator)
+    if member is None:
+        return os.path.isfile(path)
+    if not os.path.isfile(path):
+        return False
+    _, members = get_archive(path)
+    return member in members and members[member].isfile()
+
+
+def parent_locator(locator):
+    """Returns the locator of the directory containing a raw file."""
+    path, member = split_locator(locator)
+    if member is None:
+        return os.path.dirname(path)
+    return ARCHIVE_SEPARATOR.join((path, os.path.dirname(member)))
+
+
+def resolve_raw_file(directory, name):
+    """Returns the locator of the file 'name' in a directory (or archive
+    directory), which may also be stored compressed (e.g. boss.out.gz).
+    Returns None if there is no such file.
+    """
+    for suffix in ['', *COMPRESSED_SUFFIXES]:
+        locator = join_locator(directory, name + suffix)
+        if raw_file_exists(locator):
+            return locator
+    return None
+
+
+def list_raw_dirs(directory):
+    """Returns the names of the subdirectories of a directory or of an
+    archive directory locator."""
+    path, member = split_locator(directory)
+    if member is None:
+        return [child.name for child in Path(path).iterdir()
+                if child.is_dir()]
+    _, members = get_archive(path)
+    prefix = f'{member}/' if member else ''
+    names = set()
+    for name, info in members.items():
+        if name.startswith(prefix):
+            parts = name[len(prefix):].split('/')
+            if len(parts) > 1 or info.isdir():
+                names.add(parts[0])
+    return sorted(names)
+
+
+def raw_file_stat(locator):
+    """Returns size and modification time of a raw file (for archive
+    members those stored in the archive)."""
+    path, member = split_locator(locator)
+    if member is None:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime
+    _, members = get_archive(path)
+    return members[member].size, members[member].mtime
@@ -1,15 +1,195 @@
+import hashlib
+import json
 import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
 
 from collections import defaultdict
+from functools import lru_cache
 from pathlib import Path
 
+from src.lazy import lazy_import
+from src.ragged import RaggedArray
+from src.raw_input import open_raw_file, raw_file_stat, resolve_raw_file
+from src.read_write import load_npz, save_npz
+
+pd = lazy_import('pandas')
+
+# Number of parsed runs kept in memory, see read_raw_data
+RAW_DATA_CACHE_SIZE = 256
+# Increase when the parser changes, so that the disk cache is not used
+RAW_DATA_CACHE_VERSION = 2
+# Entry of the disk cache files which lists the entries that are arrays
+ARRAY_KEYS_KEY = '_array_keys'
+_disk_cache_dir = None
+
 
 def parse_values(line, typecast=int, sep=None, idx=1, cut_idx=None):
     return [typecast(val.strip(sep)) for val in line.split(sep)[idx:cut_idx]]
 
 
+def set_disk_cache_dir(cache_dir):
+    """Sets the folder in which parsed output files are cached in addition to
+    the in-process cache, or disables the disk cache if cache_dir is None.
+    """
+    global _disk_cache_dir
+    _disk_cache_dir = None if cache_dir is None else Path(cache_dir)
+    if _disk_cache_dir is not None:
+        _disk_cache_dir.mkdir(parents=True, exist_ok=True)
+
+
+def read_raw_data(out_file_path, rst_file_path):
+    """Returns the parsed .out and .rst files of a run.
+
+    Parsed files are kept in a bounded in-process cache (and on disk, see
+    set_disk_cache_dir), keyed by the file paths, sizes and modification
+    times. Each call returns a shallow copy of the cached data: entries can
+    be added or replaced, but the values are shared. The arrays are
+    read-only, and the lists must not be modified in place either.
+    """
+    data = _read_raw_data_cached(
+        str(out_file_path), str(rst_file_path),
+        raw_file_stat(out_file_path), raw_file_stat(rst_file_path))
+    return data.copy()
+
+
+@lru_cache(maxsize=RAW_DATA_CACHE_SIZE)
+def _read_raw_data_cached(out_file_path, rst_file_path, out_stat, rst_stat):
+    cache_file_path = None
+    if _disk_cache_dir is not None:
+        key = json.dumps([RAW_DATA_CACHE_VERSION, out_file_path,
+                          rst_file_path, out_stat, rst_stat])
+        cache_file_path = _disk_cache_dir / \
+            f"{hashlib.sha256(key.encode()).hexdigest()}.npz"
+    if cache_file_path is not None and cache_file_path.is_file():
+        data = _load_cached_data(cache_file_path)
+    else:
+        data = _parse_output_files(out_file_path, rst_file_path)
+        if cache_file_path is not None:
+            _save_cached_data(data, cache_file_path)
+    for value in data.values():
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+    return data
+
+
+def _save_cached_data(data, cache_file_path):
+    # Arrays are stored as lists (see save_npz), the entry ARRAY_KEYS_KEY
+    # lists them to restore them as arrays
+    array_keys = [key for key, value in data.items()
+                  if isinstance(value, np.ndarray)]
+    cached = {key: value.tolist() if key in array_keys else value
+              for key, value in data.items()}
+    cached[ARRAY_KEYS_KEY] = array_keys
+    save_npz(cached, '', str(cache_file_path))
+
+
+def _load_cached_data(cache_file_path):
+    cached = load_npz('', str(cache_file_path))
+    array_keys = cached.pop(ARRAY_KEYS_KEY)
+    return defaultdict(list, {
+        key: np.array(value) if key in array_keys else value
+        for key, value in cached.items()})
+
+
+def _parse_output_files(out_file_path, rst_file_path):
+    data = defaultdict(list)
+    xy = []
+    acq_times = []
+    best_acq = []
+    global_min_prediction = []
+    global_min_prediction_convergence = []
+    gp_hyperparam = []
+    iter_times = []
+    total_time = []
+    with open_raw_file(out_file_path) as file:
+        lines = file.readlines()
+        data["header"] = lines[0:100]
+        for i in range(len(lines)):
+            line = lines[i]
+            if "Data point added to dataset" in line:
+                line = lines[i + 1]
+                xy.append(parse_values(line, typecast=float, idx=0))
+            elif "Best acquisition" in line:
+                line = lines[i + 1]
+                best_acq.append(parse_values(line, typecast=float, idx=0))
+            elif "Global minimum prediction" in line:
+                line = lines[i + 1]
+                global_min_prediction.append(
+                    parse_values(line, typecast=float, idx=0)
+                )
+            elif "Global minimum prediction" in line:
+                line = lines[i + 1]
+                global_min_prediction_convergence.append(
+                    parse_values(line, typecast=float, idx=0)
+                )
+            elif "GP model hyperparameters" in line:
+                line = lines[i + 1]
+                gp_hyperparam.append(parse_values(line, typecast=float, idx=0))
+            elif "Iteration time [s]:" in line:
+                # If line contains str and float types, casting to str and then
+                # manually to float again has to be done
+                iter_times.append(float(parse_values(line, typecast=str, idx=3)[0]))
+                # Here not needed because line only contains a float
+                total_time.append(parse_values(line, typecast=float, idx=7)[0])
+            elif "Objective function evaluated" in line:
+                acq_times.append(parse_values(line, typecast=float, idx=6)[0])
+            elif "initpts" in line:
+                # This doesn't work yet with the MT output file
+                data["initpts"] = parse_values(line, cut_idx=-2)[0]
+                data["iterpts"] = parse_values(line, idx=3)
+            elif "inittype" in line:
+                data["inittype"] = parse_values(line, typecast=str)
+                data["num_tasks"] = len(data["inittype"])
+            elif "bounds" in line and len(data["bounds"]) == 0:
+                tmp = " ".join(parse_values(line, typecast=str, idx=1))
+                data["bounds"] = np.array(
+                    parse_values(tmp, typecast=str, sep=";", idx=0)
+                )
+            # elif 'kernel' in line:
+            #     data['kernel'] = parse_values(line, typecast=str, idx=1)
+            elif "kerntype" in line:
+                data["kernel"] = parse_values(line, typecast=str)
+            elif "yrange" in line:
+                data["yrange"] = np.array(parse_values(line, typecast=str))
+            elif "thetainit" in line:
+                data["thetainit"] = parse_values(line, typecast=str)
+            elif "thetapriorpar" in line:
+                tmp = " ".join(parse_values(line, typecast=str))
+                data["thetapriorpar"] = parse_values(
+                    tmp, typecast=str, sep=";", idx=0
+                )
+            elif "|| Bayesian optimization completed" in line:
+                data["run_completed"] = [True]
+
+    data["xy"] = np.array(xy)
+    data["dim"] = len(xy[0]) - 1
+    data["acq_times"] = np.array(acq_times)
+    data["best_acq"] = np.array(best_acq)
+    data["gmp"] = np.array(global_min_prediction)
+    data["gmp_convergence"] = global_min_prediction_convergence
+    data["GP_hyperparam"] = gp_hyperparam
+    data["iter_times"] = np.array(iter_times)
+    data["total_time"] = np.array(total_time)
+
+    # Get sample indices from the rst file
+    with open_raw_file(rst_file_path) as f:
+        start_reading_indices = False
+        for line in f:
+            if line.startswith("acqcost"):
+                if "acqcost_as_timing" in line:
+                    continue
+                if "None" in line:
+                    continue
+                data["acqcost"] = parse_values(
+                    line, typecast=float, sep=" ", idx=1
+                )
+            if line.startswith("RESULTS"):
+                start_reading_indices = True
+                continue
+            if start_reading_indices:
+                data["sample_indices"].append(int(float(line.split()[2])))
+    return data
+
+
 class OutputFileParser:
     def __init__(self, file_name, folder, hf_cost=1, artificial_cost=None):
         self.file_name = file_name
@@ -23,101 +203,14 @@ class OutputFileParser:
         self.calculate_cumulative_cost()
 
     def read_data(self):
-        xy = []
-        acq_times = []
-        best_acq = []
-        global_min_prediction = []
-        global_min_prediction_convergence = []
-        gp_hyperparam = []
-        iter_times = []
-        total_time = []
-        with open(self.out_file_path, "r") as file:
-            lines = file.readlines()
-            self.data["header"] = lines[0:100]
-            for i in range(len(lines)):
-                line = lines[i]
-                if "Data point added to dataset" in line:
-                    line = lines[i + 1]
-                    xy.append(parse_values(line, typecast=float, idx=0))
-                elif "Best acquisition" in line:
-                    line = lines[i + 1]
-                    best_acq.append(parse_values(line, typecast=float, idx=0))
-                elif "Global minimum prediction" in line:
-                    line = lines[i + 1]
-                    global_min_prediction.append(
-                        parse_values(line, typecast=float, idx=0)
-                    )
-                elif "Global minimum prediction" in line:
-                    line = lines[i + 1]
-                    global_min_prediction_convergence.append(
-                        parse_values(line, typecast=float, idx=0)
-                    )
-                elif "GP model hyperparameters" in line:
-                    line = lines[i + 1]
-                    gp_hyperparam.append(parse_values(line, typecast=float, idx=0))
-                elif "Iteration time [s]:" in line:
-                    # If line contains str and float types, casting to str and then
-                    # manually to float again has to be done
-                    iter_times.append(float(parse_values(line, typecast=str, idx=3)[0]))
-                    # Here not needed because line only contains a float
-                    total_time.append(parse_values(line, typecast=float, idx=7)[0])
-                elif "Objective function evaluated" in line:
-                    acq_times.append(parse_values(line, typecast=float, idx=6)[0])
-                elif "initpts" in line:
-                    # This doesn't work yet with the MT output file
-                    self.data["initpts"] = parse_values(line, cut_idx=-2)[0]
-                    self.data["iterpts"] = parse_values(line, idx=3)
-                elif "inittype" in line:
-                    self.data["inittype"] = parse_values(line, typecast=str)
-                    self.data["num_tasks"] = len(self.data["inittype"])
-                elif "bounds" in line and len(self.data["bounds"]) == 0:
-                    tmp = " ".join(parse_values(line, typecast=str, idx=1))
-                    self.data["bounds"] = np.array(
-                        parse_values(tmp, typecast=str, sep=";", idx=0)
-                    )
-                # elif 'kernel' in line:
-                #     self.data['kernel'] = parse_values(line, typecast=str, idx=1)
-                elif "kerntype" in line:
-                    self.data["kernel"] = parse_values(line, typecast=str)
-                elif "yrange" in line:
-                    self.data["yrange"] = np.array(parse_values(line, typecast=str))
-                elif "thetainit" in line:
-                    self.data["thetainit"] = parse_values(line, typecast=str)
-                elif "thetapriorpar" in line:
-                    tmp = " ".join(parse_values(line, typecast=str))
-                    self.data["thetapriorpar"] = parse_values(
-                        tmp, typecast=str, sep=";", idx=0
-                    )
-                elif "|| Bayesian optimization completed" in line:
-                    self.data["run_completed"] = [True]
-
-        self.data["xy"] = np.array(xy)
-        self.data["dim"] = len(xy[0]) - 1
-        self.data["acq_times"] = np.array(acq_times)
-        self.data["best_acq"] = np.array(best_acq)
-        self.data["gmp"] = np.array(global_min_prediction)
-        self.data["gmp_convergence"] = global_min_prediction_convergence
-        self.data["GP_hyperparam"] = gp_hyperparam
-        self.data["iter_times"] = np.array(iter_times)
-        self.data["total_time"] = np.array(total_time)
-
-        # Get sample indices from the rst file
-        with open(self.rst_file_path, "r") as f:
-            start_reading_indices = False
-            for line in f:
-                if line.startswith("acqcost"):
-                    if "acqcost_as_timing" in line:
-                        continue
-                    if "None" in line:
-                        continue
-                    self.data["acqcost"] = parse_values(
-                        line, typecast=float, sep=" ", idx=1
-                    )
-                if line.startswith("RESULTS"):
-                    start_reading_indices = True
-                    continue
-                if start_reading_indices:
-                    self.data["sample_indices"].append(int(float(line.split()[2])))
+        # The files may also be stored compressed, e.g. as .out.gz
+        out_file_path = resolve_raw_file(
+            self.out_file_path.parent, self.out_file_path.name) \
+            or self.out_file_path
+        rst_file_path = resolve_raw_file(
+            self.rst_file_path.parent, self.rst_file_path.name) \
+            or self.rst_file_path
+        self.data = read_raw_data(out_file_path, rst_file_path)
 
     def calculate_cumulative_cost(self):
         costs = self.data["acqcost"] if self.artificial_cost is None \
@@ -175,8 +268,7 @@ class ParserToDataFrame:
         self.acqtimes = []
         self.iteration_times = []
         self.cumulative_costs = []
-        self.convergence_idx = []
-        self.convergence_cost = []
+        regrets = []
         for obj in self.parser_objects:
             name = str(obj.out_file_path).split("/")[-1].split(".")[0]
             if ("strategy" in name) or ("inseparable" in name):
@@ -200,25 +292,33 @@ class ParserToDataFrame:
             self.iteration_times.append(obj.data["iter_times"])
             self.cumulative_costs.append(
                 obj.data["cumulative_cost"][initpts - 1 :])
-            yhat_predicts = obj.data["gmp"][:, -2]
-            convergence_idx = self.get_convergence_index(
-                yhat_predicts - self.true_min, self.tolerance
-            )
-            self.convergence_idx.append(convergence_idx)
-            if convergence_idx is None:
-                self.convergence_cost.append(None)
-            else:
-                self.convergence_cost.append(
-                    self.cumulative_costs[-1][convergence_idx]
-                )
+            regrets.append(obj.data["gmp"][:, -2] - self.true_min)
+        # Series of different lengths are kept as ragged arrays, the
+        # dataframe columns hold views of their runs
+        self.sample_indices = RaggedArray.from_sequences(
+            self.sample_indices, dtype=int)
+        self.acqtimes = RaggedArray.from_sequences(self.acqtimes, dtype=float)
+        self.iteration_times = RaggedArray.from_sequences(
+            self.iteration_times, dtype=float)
+        self.cumulative_costs = RaggedArray.from_sequences(
+            self.cumulative_costs, dtype=float)
+        self.regrets = RaggedArray.from_sequences(regrets, dtype=float)
+        self.convergence_idx = self.get_convergence_indices(
+            self.regrets, self.tolerance)
+        self.convergence_cost = [
+            None if convergence_idx is None
+            else self.cumulative_costs[run_idx][convergence_idx]
+            for run_idx, convergence_idx in enumerate(self.convergence_idx)]
 
-    def get_convergence_index(self, y, tolerance):
-        mask = np.argwhere(np.abs(y) > tolerance)
-        if mask[-1] + 1 == len(y):
-            return None
-        else:
-            indices_within_tolerance = mask[-1] + 1
-            return int(indices_within_tolerance[0])
+    def get_convergence_indices(self, regrets, tolerance):
+        """Returns the index after which the regret of each run stays
+        within the tolerance, or None if the last regret is outside."""
+        outside = np.abs(regrets.values) > tolerance
+        last_outside = regrets.with_values(
+            np.where(outside, regrets.positions, -1)).reduce(
+                np.maximum, empty=-1)
+        return [int(idx) + 1 if idx + 1 < length else None
+                for idx, length in zip(last_outside, regrets.lengths)]
 
     def create_dataframe(self):
         self.df = pd.DataFrame(
@@ -229,11 +329,11 @@ class ParserToDataFrame:
                 "strategy": self.strategies,
                 "run_index": self.run_indices,
                 "num_tasks": self.num_tasks,
-                "sample_indices": self.sample_indices,
+                "sample_indices": list(self.sample_indices),
                 "acqcosts": self.acqcosts,
-                "acquisition times": self.acqtimes,
-                "iteration times": self.iteration_times,
-                "cumulative_costs": self.cumulative_costs,
+                "acquisition times": list(self.acqtimes),
+                "iteration times": list(self.iteration_times),
+                "cumulative_costs": list(self.cumulative_costs),
                 "convergence_idx": self.convergence_idx,
                 "convergence_cost": self.convergence_cost,
             }
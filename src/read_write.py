@@ -1,10 +1,24 @@
 import json
+import os
 import yaml
-import pandas as pd
+from collections.abc import MutableMapping
+from pathlib import Path
 import numpy as np
+from src.lazy import lazy_import
 
+pd = lazy_import('pandas')
 
-def load_experiments(experiments):
+# Loader of yaml files, the C implementation of FullLoader if available
+YAML_LOADER = getattr(yaml, 'CFullLoader', yaml.FullLoader)
+# Storage formats of processed runs, see save_npz
+STORAGE_FORMATS = ('json', 'npz')
+# Name of the array in a .npz file which holds the non-numeric entries
+NPZ_META_KEY = '__meta__'
+# Placeholder for dataframe entries of runs which do not have a key
+_MISSING = object()
+
+
+def load_experiments(experiments, fields=None, as_runs=False):
     """Given a list of experiment paths, load the data and return a list of
     the loaded experiments.
 
@@ -12,40 +26,138 @@ def load_experiments(experiments):
     ----------
     experiments : list
         List of Path objects to experiments
+    fields : list, optional
+        Keys needed from each run, by default None. If given, the runs are
+        returned as LazyRecord objects, which only contain these keys and
+        read them on first access. Only runs stored as .npz are read
+        partially; runs stored as .json are still parsed completely and
+        then filtered (see scripts/preprocess/convert_storage.py to store
+        the runs as .npz).
+    as_runs : bool, optional
+        If True, the runs are returned as src.run.Run objects (only with
+        the keys in fields, if given), which need less memory than dicts,
+        by default False.
 
     Returns
     -------
     list
         Loaded experiments.
     """
+    if as_runs:
+        # src.run imports this module
+        from src.run import Run
     experiments_data = []
     for experiment in experiments:
         exp_data = []
-        exp_runs = [exp for exp in experiment.iterdir() if exp.is_file()]
-        # The following sorts the experiments by the experiment number
-        # (e.g. exp_1, exp_2, ...)
-        exp_runs.sort(
-            key=lambda string: int(str(string).split('_')[-1].split('.')[0]))
-        for exp in exp_runs:
-            exp_data.append(load_json('', exp))
+        for exp in list_run_files(experiment):
+            if as_runs:
+                exp_data.append(Run.load(exp, fields))
+            elif fields is None:
+                exp_data.append(load_json('', exp))
+            else:
+                exp_data.append(LazyRecord(exp, fields))
         experiments_data.append(exp_data)
     return experiments_data
 
 
+def list_run_files(experiment):
+    """Returns the files of the processed runs of an experiment.
+
+    Parameters
+    ----------
+    experiment : Path
+        Path to the experiment.
+
+    Returns
+    -------
+    list
+        Paths of the .json and .npz files, sorted by the experiment number
+        (e.g. exp_1, exp_2, ...).
+    """
+    exp_runs = [exp for exp in Path(experiment).iterdir() if exp.is_file()
+                and exp.suffix in ('.json', '.npz')]
+    exp_runs.sort(
+        key=lambda string: int(str(string).split('_')[-1].split('.')[0]))
+    return exp_runs
+
+
 def load_statistics_to_dataframe(baseline_experiments, tl_experiments,
                                  num_exp=None):
-    columns = [key for key in tl_experiments[0][0].keys()]
-    df = pd.DataFrame(columns=columns)
+    """Creates a dataframe with one row per run, first for the baseline
+    runs and then for the transfer learning runs.
+
+    The entries are formatted as in correct_type_for_dataframe. The columns
+    are collected in one pass over the runs and the dataframe is created
+    once. Names are stored as categoricals, integer entries as integers
+    (as floats with NaN, if some runs do not have them, like concatenated
+    rows) and lists as objects. Like rows created one by one, all rows have
+    the index 0.
+
+    Parameters
+    ----------
+    baseline_experiments : list
+        Loaded baseline experiments, see load_experiments.
+    tl_experiments : list
+        Loaded transfer learning experiments, see load_experiments.
+    num_exp : int, optional
+        Maximum number of runs per experiment, by default None (all runs).
+
+    Returns
+    -------
+    Dataframe
+        Statistics of all runs.
+    """
+    columns = {key: [] for key in tl_experiments[0][0].keys()}
+    num_rows = 0
+    for experiment in [*baseline_experiments, *tl_experiments]:
+        for run in experiment[:num_exp]:
+            if 'cumulative_num_highest_fidelity_samples' not in run.keys():
+                run['cumulative_num_highest_fidelity_samples'] = \
+                    calc_cumulative_num_highest_fidelity_samples(run)
+            for key in run:
+                if key not in columns:
+                    columns[key] = [_MISSING] * num_rows
+                columns[key].append(_format_dataframe_entry(run[key]))
+            num_rows += 1
+            for values in columns.values():
+                if len(values) < num_rows:
+                    values.append(_MISSING)
+    return pd.DataFrame(
+        {key: _to_dataframe_column(key, values)
+         for key, values in columns.items()},
+        index=np.zeros(num_rows, dtype=int))
+
 
-    for baseline_experiment in baseline_experiments:
-        for baseline_run in baseline_experiment[:num_exp]:
-            entry = correct_type_for_dataframe(baseline_run)
-            df = pd.concat([df, entry], axis=0)
-    for tl_experiment in tl_experiments:
-        for tl_run in tl_experiment[:num_exp]:
-            entry = correct_type_for_dataframe(tl_run)
-            df = pd.concat([df, entry], axis=0)
-    return df
+def _format_dataframe_entry(value):
+    if isinstance(value, list) and len(value) == 1:
+        return value[0]
+    return value
+
+
+def _to_dataframe_column(key, values):
+    """Returns the entries of a column with a suitable dtype."""
+    present = [value for value in values
+               if value is not _MISSING and value is not None]
+    is_complete = len(present) == len(values)
+    if key == 'name' and all(isinstance(value, str) for value in present):
+        return pd.Categorical(
+            [value if value is not _MISSING else None for value in values])
+    if len(present) > 0 and \
+            all(isinstance(value, bool) for value in present):
+        if is_complete:
+            return np.array(values, dtype=bool)
+    elif len(present) > 0 and \
+            all(isinstance(value, (int, float, np.integer, np.floating))
+                for value in present):
+        if is_complete and all(isinstance(value, (int, np.integer))
+                               for value in present):
+            return np.array(values, dtype=np.int64)
+        return np.array([np.nan if value is _MISSING or value is None
+                         else value for value in values], dtype=float)
+    column = np.empty(len(values), dtype=object)
+    for idx, value in enumerate(values):
+        column[idx] = np.nan if value is _MISSING else value
+    return column
 
 
 def correct_type_for_dataframe(result):
@@ -94,15 +206,256 @@ def calc_cumulative_num_highest_fidelity_samples(data):
 
 
 def load_json(path, filename):
-    with open(f'{path}{filename}', 'r') as f:
+    """Loads a json file.
+
+    Runs stored as .npz (see save_npz) are loaded transparently, either if
+    the filename ends with .npz or if only the .npz version of the
+    requested .json file exists.
+
+    Parameters
+    ----------
+    path : str
+        Path of the folder (or empty string, if filename is a full path).
+    filename : str
+        Name of the json file.
+
+    Returns
+    -------
+    dict
+        Loaded data.
+    """
+    file_path = f'{path}{filename}'
+    if file_path.endswith('.npz'):
+        return load_npz('', file_path)
+    if file_path.endswith('.json') and not os.path.exists(file_path):
+        npz_path = file_path[:-len('.json')] + '.npz'
+        if os.path.exists(npz_path):
+            return load_npz('', npz_path)
+    with open(file_path, 'r') as f:
         return json.load(f)
 
 
 def save_json(data, path, filename):
-    with open(f'{path}{filename}', 'w') as f:
-        json.dump(data, f, indent=4)
+    """Saves data to a json file.
+
+    The data is first written to a temporary file next to the target,
+    which then replaces the target. Readers and parallel writers therefore
+    never see a partially written file.
+
+    Parameters
+    ----------
+    data : dict
+        Data to save.
+    path : str
+        Path of the folder (or empty string, if filename is a full path).
+    filename : str
+        Name of the json file.
+    """
+    file_path = f'{path}{filename}'
+    tmp_path = f'{file_path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def to_numeric_array(value):
+    """Returns value as numeric array, or None if it can not be stored as
+    one without losing information (strings, None entries, ragged lists).
+    """
+    if not isinstance(value, list) or len(value) == 0:
+        return None
+    try:
+        array = np.asarray(value)
+    except ValueError:
+        return None
+    if array.dtype.kind not in 'biuf' or array.tolist() != value:
+        return None
+    return array
+
+
+def save_npz(data, path, filename):
+    """Saves data to a .npz file.
+
+    Numeric lists (e.g. 'xy', 'gmp', 'total_time') are stored as typed
+    arrays. All other entries (e.g. 'header', 'name', lists with None) are
+    stored as json string, each in an array of its own, so that every entry
+    can be loaded separately. The array '__meta__' holds the order of the
+    keys and which entries are json strings.
+
+    Parameters
+    ----------
+    data : dict
+        Data to save.
+    path : str
+        Path of the folder (or empty string, if filename is a full path).
+    filename : str
+        Name of the .npz file.
+    """
+    arrays, meta = {}, {'keys': list(data.keys()), 'json_keys': []}
+    for key, value in data.items():
+        array = to_numeric_array(value)
+        if array is None:
+            arrays[key] = np.array(json.dumps(value))
+            meta['json_keys'].append(key)
+        else:
+            arrays[key] = array
+    arrays[NPZ_META_KEY] = np.array(json.dumps(meta))
+    file_path = f'{path}{filename}'
+    tmp_path = f'{file_path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _load_npz_entry(npz, key, json_keys, as_arrays=False):
+    if key in json_keys:
+        return json.loads(str(npz[key]))
+    if as_arrays:
+        return npz[key]
+    return npz[key].tolist()
+
+
+def load_npz(path, filename, as_arrays=False, fields=None):
+    """Loads a .npz file written by save_npz.
+
+    Parameters
+    ----------
+    path : str
+        Path of the folder (or empty string, if filename is a full path).
+    filename : str
+        Name of the .npz file.
+    as_arrays : bool, optional
+        If True, numeric entries are returned as numpy arrays instead of
+        lists, by default False.
+    fields : list, optional
+        Keys to load, by default None, i.e. all keys. Other entries are not
+        read from the file.
+
+    Returns
+    -------
+    dict
+        Loaded data, with the same keys and order as the saved data.
+    """
+    with np.load(f'{path}{filename}', allow_pickle=False) as npz:
+        meta = json.loads(str(npz[NPZ_META_KEY]))
+        keys = meta['keys'] if fields is None else \
+            [key for key in meta['keys'] if key in fields]
+        return {key: _load_npz_entry(npz, key, meta['json_keys'], as_arrays)
+                for key in keys}
+
+
+class LazyRecord(MutableMapping):
+    """Data of a processed run, which is read from disk on first access.
+
+    Only the entries in 'fields' are part of the record. For runs stored as
+    .npz, each entry is read separately when it is first accessed, so that
+    large entries which are never used (e.g. 'xy', 'header') are never
+    read. Runs stored as .json are read completely on first access, but
+    only the requested entries are kept.
+
+    Parameters
+    ----------
+    file_path : Path
+        Path to .json or .npz file of the run.
+    fields : list, optional
+        Keys of the record, by default None, i.e. all keys in the file.
+    """
+
+    def __init__(self, file_path, fields=None):
+        self.file_path = Path(file_path)
+        self.fields = None if fields is None else list(fields)
+        self._data = {}
+        self._keys = None
+        self._json_keys = None
+
+    def _read_keys(self):
+        if self.file_path.suffix == '.npz':
+            with np.load(self.file_path, allow_pickle=False) as npz:
+                meta = json.loads(str(npz[NPZ_META_KEY]))
+            keys, self._json_keys = meta['keys'], meta['json_keys']
+        else:
+            self._data = load_json('', self.file_path)
+            if self.fields is not None:
+                self._data = {key: value for key, value in self._data.items()
+                              if key in self.fields}
+            keys = list(self._data.keys())
+        if self.fields is not None:
+            keys = [key for key in keys if key in self.fields]
+        self._keys = keys
+
+    def _get_keys(self):
+        if self._keys is None:
+            self._read_keys()
+        return self._keys
+
+    def __getitem__(self, key):
+        if key not in self._data:
+            if key not in self._get_keys():
+                raise KeyError(key)
+            if key not in self._data:
+                with np.load(self.file_path, allow_pickle=False) as npz:
+                    self._data[key] = _load_npz_entry(npz, key,
+                                                      self._json_keys)
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        keys = self._get_keys()
+        if key not in keys:
+            keys.append(key)
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        self._get_keys().remove(key)
+        self._data.pop(key, None)
+
+    def __iter__(self):
+        return iter(list(self._get_keys()))
+
+    def __len__(self):
+        return len(self._get_keys())
+
+    def __repr__(self):
+        return f'LazyRecord({str(self.file_path)!r}, fields={self.fields})'
+
+
+def convert_run_file(file_path, storage):
+    """Converts a processed run file to the given storage format and
+    removes the original file.
+
+    Parameters
+    ----------
+    file_path : Path
+        Path to .json or .npz file.
+    storage : str
+        Either 'json' or 'npz'.
+
+    Returns
+    -------
+    Path
+        Path of the converted file.
+    """
+    if storage not in STORAGE_FORMATS:
+        raise ValueError(f'Unknown storage format {storage}')
+    new_path = file_path.with_suffix(f'.{storage}')
+    if new_path == file_path:
+        return file_path
+    data = load_json('', file_path)
+    if storage == 'npz':
+        save_npz(data, '', new_path)
+    else:
+        save_json(data, '', new_path)
+    file_path.unlink()
+    return new_path
 
 
 def load_yaml(path, filename):
     with open(f'{path}{filename}', 'r') as f:
-        return yaml.load(f, Loader=yaml.FullLoader)
+        return yaml.load(f, Loader=YAML_LOADER)
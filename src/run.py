@@ -0,0 +1,217 @@
+from collections.abc import MutableMapping
+from pathlib import Path
+import numpy as np
+from src.read_write import load_json, load_npz, to_numeric_array
+
+# Entries of the processed runs, see scripts/preprocess/preprocess.py
+FIELDS = ('name', 'header', 'initpts', 'iterpts', 'bounds', 'dim', 'tasks',
+          'num_tasks', 'kernel', 'yrange', 'thetainit', 'thetapriorparam',
+          'acqcost', 'truemin', 'run_completed', 'xy', 'sample_indices',
+          'acq_times', 'iter_times', 'total_time', 'best_acq', 'gmp',
+          'gmp_convergence', 'GP_hyperparam', 'highest_fidelity_iterations',
+          'model_time', 'B', 'tolerance_levels',
+          'iterations_to_gmp_convergence', 'totaltime_to_gmp_convergence',
+          'observations_to_gmp_convergence',
+          'highest_fidelity_iterations_to_gmp_convergence')
+# Numeric series, which are stored as arrays if this loses no information
+# (i.e. if they are not ragged and have no None entries)
+SERIES_FIELDS = ('truemin', 'xy', 'sample_indices', 'acq_times',
+                 'iter_times', 'total_time', 'best_acq', 'gmp',
+                 'gmp_convergence', 'GP_hyperparam',
+                 'highest_fidelity_iterations', 'model_time', 'B')
+# Entries which are calculated from the others, if a run does not have them
+DERIVED_FIELDS = ('model_time', 'B')
+# Slots of the entries which are properties, see Run.model_time
+_DERIVED_SLOTS = {field: f'_{field}' for field in DERIVED_FIELDS}
+_SLOTS = {field: _DERIVED_SLOTS.get(field, field) for field in FIELDS}
+
+
+class Run(MutableMapping):
+    """Processed run, which is used like the dict loaded from its .json file
+    (e.g. run['gmp']) but needs less memory.
+
+    The entries in FIELDS are stored in slots instead of a dict, and the
+    numeric series in SERIES_FIELDS as arrays instead of lists of Python
+    numbers. Other entries (e.g. added by a script) are kept in a dict.
+    to_dict returns the entries in the original order with arrays as
+    lists, i.e. the content of the .json file.
+
+    The model times, B matrices and the cumulative number of highest
+    fidelity samples are also attributes (run.model_time, run.B,
+    run.cumulative_num_highest_fidelity_samples), which are calculated
+    on first access if the run does not store them.
+
+    Parameters
+    ----------
+    data : dict, optional
+        Entries of the run, by default None.
+    """
+
+    __slots__ = tuple(_SLOTS.values()) + (
+        '_keys', '_extra', '_cumulative_num_highest_fidelity_samples')
+
+    def __init__(self, data=None):
+        self._keys = []
+        self._extra = {}
+        for key, value in (data or {}).items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data)
+
+    @classmethod
+    def load(cls, file_path, fields=None):
+        """Loads a processed run from a .json or .npz file.
+
+        Parameters
+        ----------
+        file_path : Path
+            Path to the .json or .npz file of the run.
+        fields : list, optional
+            Keys to load, by default None (all keys).
+
+        Returns
+        -------
+        Run
+            Loaded run.
+        """
+        file_path = Path(file_path)
+        if file_path.suffix == '.npz':
+            data = load_npz('', file_path, as_arrays=True, fields=fields)
+        else:
+            data = load_json('', file_path)
+            if fields is not None:
+                data = {key: value for key, value in data.items()
+                        if key in fields}
+        return cls(data)
+
+    def to_dict(self):
+        """Returns the run in the schema of the processed .json files."""
+        return {key: _to_json_value(self[key]) for key in self._keys}
+
+    def copy(self, fields=None):
+        """Returns a shallow copy, which only has the entries in fields (by
+        default all entries). The arrays are shared."""
+        run = Run()
+        for key in self._keys:
+            if fields is None or key in fields:
+                run._keys.append(key)
+                if key in _SLOTS:
+                    setattr(run, _SLOTS[key], getattr(self, _SLOTS[key]))
+                else:
+                    run._extra[key] = self._extra[key]
+        return run
+
+    def __getitem__(self, key):
+        if key not in _SLOTS:
+            return self._extra[key]
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, _SLOTS[key])
+
+    def __setitem__(self, key, value):
+        if key in _SLOTS:
+            if key in SERIES_FIELDS and not isinstance(value, np.ndarray):
+                array = to_numeric_array(value)
+                value = value if array is None else array
+            setattr(self, _SLOTS[key], value)
+            if key == 'sample_indices':
+                self._clear_cumulative_samples()
+        else:
+            self._extra[key] = value
+        if key not in self._keys:
+            self._keys.append(key)
+
+    def __delitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        self._keys.remove(key)
+        if key in _SLOTS:
+            delattr(self, _SLOTS[key])
+        else:
+            del self._extra[key]
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(list(self._keys))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        name = self['name'] if 'name' in self else None
+        return f'Run({name!r}, {len(self)} entries)'
+
+    @property
+    def model_time(self):
+        """Time of the GP model of each iteration (iteration time minus
+        acquisition time)."""
+        if not hasattr(self, '_model_time'):
+            iter_times = np.asarray(self['iter_times'], dtype=float)
+            acq_times = np.asarray(self['acq_times'], dtype=float)
+            # The times are aligned at the last iteration
+            length = min(len(iter_times), len(acq_times))
+            self._model_time = iter_times[len(iter_times) - length:] - \
+                acq_times[len(acq_times) - length:]
+        return self._model_time
+
+    @property
+    def B(self):
+        """Flattened coregionalization matrix B = W W^T + diag(kappa) of
+        each iteration, or None for single task runs."""
+        if not hasattr(self, '_B'):
+            self._B = calculate_B(self['GP_hyperparam'], self['dim'],
+                                  self['tasks'], len(self['xy'][0]) - 1)
+        return self._B
+
+    @property
+    def cumulative_num_highest_fidelity_samples(self):
+        """Number of highest fidelity samples after each observation."""
+        if 'cumulative_num_highest_fidelity_samples' in self._extra:
+            return self._extra['cumulative_num_highest_fidelity_samples']
+        if not hasattr(self, '_cumulative_num_highest_fidelity_samples'):
+            self._cumulative_num_highest_fidelity_samples = np.cumsum(
+                np.asarray(self['sample_indices']) == 0)
+        return self._cumulative_num_highest_fidelity_samples
+
+    def _clear_cumulative_samples(self):
+        if hasattr(self, '_cumulative_num_highest_fidelity_samples'):
+            del self._cumulative_num_highest_fidelity_samples
+
+
+def calculate_B(gp_hyperparam, dim, tasks, xy_dim):
+    """Returns the flattened B matrices of all iterations at once, as
+    preprocess.calculate_B.
+
+    Parameters
+    ----------
+    gp_hyperparam : array_like
+        GP hyperparameters of each iteration.
+    dim : int
+        Dimension of the search space.
+    tasks : int
+        Number of tasks.
+    xy_dim : int
+        Number of input columns of 'xy' (dim + 1 for multi-task runs).
+
+    Returns
+    -------
+    ndarray or None
+        Shape (iterations, tasks * tasks), None for single task runs.
+    """
+    if dim == xy_dim:
+        return None
+    params = np.asarray(gp_hyperparam, dtype=float)
+    W = params[:, dim:-tasks].reshape(len(params), -1, tasks)
+    kappa = params[:, -tasks:]
+    B = W @ W.transpose(0, 2, 1) + kappa[:, None, :] * np.eye(tasks)
+    return B.reshape(len(params), -1)
+
+
+def _to_json_value(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value
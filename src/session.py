@@ -0,0 +1,197 @@
+import multiprocessing
+from pathlib import Path
+from src.ragged import RaggedArray
+from src.read_write import list_run_files, load_json
+from src.run import Run
+from src.summary import load_summary
+
+DATA_DIR = Path(__file__).resolve().parent.parent / 'data'
+# Session of the parent process, inherited by the forked workers of
+# DatasetSession.render
+_SESSION = None
+
+
+class DatasetSession:
+    """Processed runs of the experiments, loaded once and kept in memory.
+
+    The figure functions of the analyse scripts take a session as their
+    first argument and get their runs from it, so that several figures can
+    be rendered in one process without loading the same experiments again.
+    The records handed out are shallow copies of the cached runs: entries
+    can be added or replaced without changing the cache, but the values
+    themselves are shared and must not be modified in place.
+
+    Parameters
+    ----------
+    data_dir : Path, optional
+        Folder with the data of the setups, by default the data folder of
+        the repository.
+    as_runs : bool, optional
+        If True, the runs are cached and handed out as src.run.Run objects
+        instead of dicts, which needs less memory when many runs are
+        loaded, by default False.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, as_runs=False):
+        self.data_dir = Path(data_dir)
+        self.as_runs = as_runs
+        self._experiments = {}
+        self._summaries = {}
+
+    def get_experiment_path(self, setup, exp):
+        return self.data_dir / setup / 'processed' / exp
+
+    def get_summary(self, setup):
+        """Returns the run summary of a setup (see src/summary.py), which
+        is enough for figures that only need the convergence statistics.
+
+        Parameters
+        ----------
+        setup : str
+            'transfer_learning' or 'multi_task_learning'.
+
+        Returns
+        -------
+        RunSummary
+            Summary of the processed runs of the setup.
+        """
+        if setup not in self._summaries:
+            self._summaries[setup] = load_summary(
+                self.data_dir / setup / 'processed')
+        return self._summaries[setup]
+
+    def _get_cached_runs(self, setup, exp):
+        key = (setup, exp)
+        if key not in self._experiments:
+            load = Run.load if self.as_runs else \
+                (lambda run: load_json('', run))
+            self._experiments[key] = {
+                run.name[:-len(run.suffix)]: load(run)
+                for run in list_run_files(
+                    self.get_experiment_path(setup, exp))}
+        return self._experiments[key]
+
+    def get_runs(self, setup, exp, fields=None):
+        """Returns the runs of an experiment by run name.
+
+        Parameters
+        ----------
+        setup : str
+            'transfer_learning' or 'multi_task_learning'.
+        exp : str
+            Name of experiment.
+        fields : list, optional
+            Keys needed from each run, by default None (all keys).
+
+        Returns
+        -------
+        dict
+            Runs by run name (e.g. 'exp_1'), sorted by the experiment
+            number.
+        """
+        return {name: _copy_record(data, fields)
+                for name, data in self._get_cached_runs(setup, exp).items()}
+
+    def get_series(self, setup, exp, key, column=None):
+        """Returns an entry of the runs of an experiment (e.g. 'gmp' or
+        'total_time') as RaggedArray, see src/ragged.py.
+
+        Parameters
+        ----------
+        setup : str
+            'transfer_learning' or 'multi_task_learning'.
+        exp : str
+            Name of experiment.
+        key : str
+            Entry of the runs.
+        column : int, optional
+            Column of a 2D entry to keep, e.g. -2 for the predicted minimum
+            of 'gmp', by default None (all columns).
+
+        Returns
+        -------
+        RaggedArray
+            Entry of each run, sorted by the experiment number.
+        """
+        return RaggedArray.from_records(
+            list(self._get_cached_runs(setup, exp).values()), key, column)
+
+    def load_experiments(self, setup, experiments, fields=None):
+        """Returns the runs of several experiments, in the same layout as
+        read_write.load_experiments.
+
+        Parameters
+        ----------
+        setup : str
+            'transfer_learning' or 'multi_task_learning'.
+        experiments : list
+            Names of experiments.
+        fields : list, optional
+            Keys needed from each run, by default None (all keys).
+
+        Returns
+        -------
+        list
+            List of runs of each experiment.
+        """
+        return [list(self.get_runs(setup, exp, fields).values())
+                for exp in experiments]
+
+    def load_setup(self, setup):
+        """Loads all processed experiments of a setup into the cache.
+
+        Parameters
+        ----------
+        setup : str
+            'transfer_learning' or 'multi_task_learning'.
+        """
+        processed_data_dir = self.data_dir / setup / 'processed'
+        for experiment in sorted(processed_data_dir.iterdir()):
+            if experiment.is_dir():
+                self._get_cached_runs(setup, experiment.name)
+
+    def render(self, figures, jobs=1):
+        """Renders figures with the runs of this session.
+
+        With more than one job, the figures are rendered by a pool of
+        forked processes. The workers inherit the session, so the
+        experiments loaded before the call (e.g. with load_setup) are
+        shared copy-on-write instead of being read or sent to each worker.
+        Experiments which are loaded by a worker stay in that worker.
+
+        Parameters
+        ----------
+        figures : list
+            Pairs of a figure function, which is called with the session
+            as first argument, and a dict of its keyword arguments. The
+            functions have to be importable, i.e. defined at module level.
+        jobs : int, optional
+            Number of processes, by default 1 (render in this process).
+
+        Returns
+        -------
+        list
+            Return values of the figure functions.
+        """
+        if jobs <= 1 or len(figures) <= 1:
+            return [function(self, **kwargs) for function, kwargs in figures]
+        global _SESSION
+        _SESSION = self
+        try:
+            context = multiprocessing.get_context('fork')
+            with context.Pool(min(jobs, len(figures))) as pool:
+                return pool.starmap(_render_figure, figures, chunksize=1)
+        finally:
+            _SESSION = None
+
+
+def _render_figure(function, kwargs):
+    return function(_SESSION, **kwargs)
+
+
+def _copy_record(data, fields):
+    if isinstance(data, Run):
+        return data.copy(fields)
+    if fields is None:
+        return dict(data)
+    return {key: value for key, value in data.items() if key in fields}
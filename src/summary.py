@@ -0,0 +1,368 @@
+import os
+from pathlib import Path
+import numpy as np
+from src.lazy import lazy_import
+from src.read_write import LazyRecord, list_run_files
+
+pd = lazy_import('pandas')
+
+SUMMARY_NAME = 'summary.npz'
+# Increase when the columns or their calculation change, so that summaries
+# of older versions are built again instead of being extended
+SUMMARY_VERSION = 1
+# Entries of the processed runs which are summarized ('xy' is only read if
+# a run has no 'sample_indices')
+FIELDS = ['name', 'dim', 'initpts', 'gmp', 'acq_times', 'sample_indices',
+          'xy', 'iterations_to_gmp_convergence',
+          'totaltime_to_gmp_convergence',
+          'highest_fidelity_iterations_to_gmp_convergence']
+# Columns with one value per run
+RUN_COLUMNS = ('experiment', 'run', 'run_index', 'name', 'dimension',
+               'initpts', 'secondary_initpts', 'final_regret')
+# Columns with one value per run and tolerance level, NaN if the run did
+# not converge
+TOLERANCE_COLUMNS = ('iterations', 'totaltime',
+                     'highest_fidelity_iterations', 'highest_fidelity_samples',
+                     'lower_fidelity_samples', 'cost')
+STRING_COLUMNS = ('experiment', 'run', 'name')
+INTEGER_COLUMNS = ('run_index', 'dimension', 'initpts', 'secondary_initpts')
+
+
+class RunSummary:
+    """Table with the convergence statistics of all processed runs of a
+    setup, which is written by the derive stage (see
+    parse_raw_data.run_derive_stage) to processed/summary.npz.
+
+    Each column is one array with a row per run. The columns in
+    RUN_COLUMNS hold one value per run: experiment, run, run index, name,
+    dimension, initial points of the primary and secondary task (-1 if
+    missing) and the regret of the last global minimum prediction. The
+    columns in TOLERANCE_COLUMNS hold one value per tolerance level:
+    iterations, total time [s], highest fidelity iterations, number of
+    highest and lower fidelity samples and the cumulative acquisition time
+    [s] at convergence.
+
+    Parameters
+    ----------
+    columns : dict
+        Arrays of the columns in RUN_COLUMNS and TOLERANCE_COLUMNS.
+    tolerances : array_like
+        Tolerance levels in kcal/mol.
+    hashes : dict, optional
+        Hash of the derivation inputs of each experiment, by default None.
+    """
+
+    def __init__(self, columns, tolerances, hashes=None):
+        self.columns = columns
+        self.tolerances = np.asarray(tolerances, dtype=float)
+        self.hashes = {} if hashes is None else dict(hashes)
+
+    def __len__(self):
+        return len(self.columns['experiment'])
+
+    def __repr__(self):
+        return (f'RunSummary({len(self)} runs, '
+                f'{len(self.hashes)} experiments)')
+
+    def tolerance_index(self, tolerance):
+        """Returns the index of a tolerance level in the summary.
+
+        Raises
+        ------
+        ValueError
+            If the tolerance level is not in the summary.
+        """
+        matches = np.flatnonzero(self.tolerances == tolerance)
+        if len(matches) == 0:
+            raise ValueError(f'Invalid tolerance level, chose from '
+                             f'{self.tolerances.tolist()}')
+        return int(matches[0])
+
+    def select(self, experiments, num_runs=None):
+        """Returns the rows of the runs of experiments.
+
+        Parameters
+        ----------
+        experiments : list
+            Names of experiments. The rows are returned in the same order,
+            an experiment listed twice is returned twice.
+        num_runs : int, optional
+            Maximum number of runs per experiment (the ones with the lowest
+            run index), by default None (all runs).
+
+        Returns
+        -------
+        ndarray
+            Row indices.
+        """
+        rows = []
+        for exp in experiments:
+            exp_rows = np.flatnonzero(self.columns['experiment'] == exp)
+            rows.append(exp_rows[:num_runs])
+        return np.concatenate(rows) if len(rows) > 0 \
+            else np.zeros(0, dtype=int)
+
+    def column(self, name, tolerance=None):
+        """Returns a column, for the columns in TOLERANCE_COLUMNS at a
+        tolerance level."""
+        if name in TOLERANCE_COLUMNS:
+            if tolerance is None:
+                raise ValueError(f'A tolerance is needed for column {name}')
+            return self.columns[name][:, self.tolerance_index(tolerance)]
+        return self.columns[name]
+
+    def to_dataframe(self, experiments, tolerance, num_runs=None):
+        """Returns the runs of experiments at a tolerance level.
+
+        Parameters
+        ----------
+        experiments : list
+            Names of experiments, see select.
+        tolerance : float
+            Tolerance level of the columns in TOLERANCE_COLUMNS.
+        num_runs : int, optional
+            Maximum number of runs per experiment, by default None.
+
+        Returns
+        -------
+        Dataframe
+            One row per run and one column per entry of RUN_COLUMNS and
+            TOLERANCE_COLUMNS.
+        """
+        rows = self.select(experiments, num_runs)
+        data = {name: self.column(name)[rows] for name in RUN_COLUMNS}
+        for name in TOLERANCE_COLUMNS:
+            data[name] = self.column(name, tolerance)[rows]
+        for name in STRING_COLUMNS:
+            data[name] = data[name].astype(object)
+        return pd.DataFrame(data)
+
+    def save(self, path):
+        """Saves the summary to a .npz file, see load_summary."""
+        arrays = {**self.columns,
+                  'tolerances': self.tolerances,
+                  'hashed_experiments': np.array(list(self.hashes), dtype=str),
+                  'hashes': np.array(list(self.hashes.values()), dtype=str),
+                  'version': np.array(SUMMARY_VERSION)}
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def load_summary(processed_data_dir):
+    """Loads the run summary of a setup.
+
+    Parameters
+    ----------
+    processed_data_dir : Path
+        Path to processed data.
+
+    Returns
+    -------
+    RunSummary
+        Summary of the processed runs.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the summary was not written yet (or by an older version), i.e.
+        scripts/preprocess/parse_raw_data.py has to be run.
+    """
+    summary_path = Path(processed_data_dir) / SUMMARY_NAME
+    summary = _read_summary(summary_path)
+    if summary is None:
+        raise FileNotFoundError(
+            f'No run summary {summary_path}, run '
+            f'scripts/preprocess/parse_raw_data.py first')
+    return summary
+
+
+def write_summary(processed_data_dir, derived_manifest, config,
+                  derived_experiments=()):
+    """Writes the run summary of a setup to processed/summary.npz.
+
+    Only the experiments whose hash changed or which were derived again are
+    read, the rows of the others are taken from the previous summary.
+
+    Parameters
+    ----------
+    processed_data_dir : Path
+        Path to processed data.
+    derived_manifest : dict
+        Hash of the derivation inputs of each experiment.
+    config : Config
+        Content of config_tl.yaml or config_mt.yaml.
+    derived_experiments : iterable, optional
+        Experiments which were derived again, by default ().
+
+    Returns
+    -------
+    RunSummary
+        Written summary.
+    """
+    derived_experiments = set(derived_experiments)
+    processed_data_dir = Path(processed_data_dir)
+    summary_path = processed_data_dir / SUMMARY_NAME
+    tolerances = np.asarray(config['tolerances'], dtype=float)
+    previous = _read_summary(summary_path)
+    if previous is not None and not np.array_equal(previous.tolerances,
+                                                   tolerances):
+        previous = None
+    blocks = []
+    for exp, exp_hash in sorted(derived_manifest.items()):
+        if previous is not None and exp not in derived_experiments and \
+                previous.hashes.get(exp) == exp_hash:
+            rows = previous.select([exp])
+            blocks.append({name: values[rows]
+                           for name, values in previous.columns.items()})
+        else:
+            blocks.append(summarize_experiment(
+                exp, processed_data_dir / exp, len(tolerances)))
+    summary = RunSummary(_concatenate(blocks, len(tolerances)), tolerances,
+                         derived_manifest)
+    summary.save(summary_path)
+    return summary
+
+
+def summarize_experiment(exp, processed_exp_dir, num_tolerances):
+    """Returns the summary columns of the runs of an experiment."""
+    rows = []
+    if processed_exp_dir.is_dir():
+        for path in list_run_files(processed_exp_dir):
+            run = path.name[:-len(path.suffix)]
+            row = summarize_run(LazyRecord(path, FIELDS), num_tolerances)
+            row.update({'experiment': exp, 'run': run,
+                        'run_index': int(run.split('_')[-1])})
+            rows.append(row)
+    return _concatenate(
+        [{name: np.array([row[name] for row in rows])
+          for name in RUN_COLUMNS + TOLERANCE_COLUMNS}] if len(rows) > 0
+        else [], num_tolerances)
+
+
+def summarize_run(record, num_tolerances):
+    """Returns the summary of a processed run, see RunSummary.
+
+    The number of samples and the acquisition time at convergence are
+    counted up to the observation of the converged iteration, i.e. they
+    include the initial points.
+
+    Parameters
+    ----------
+    record : dict
+        Processed run with the entries in FIELDS.
+    num_tolerances : int
+        Number of tolerance levels.
+
+    Returns
+    -------
+    dict
+        Values of the columns in RUN_COLUMNS (except 'experiment', 'run'
+        and 'run_index') and TOLERANCE_COLUMNS.
+    """
+    iterations = _to_float_array(
+        record.get('iterations_to_gmp_convergence'), num_tolerances)
+    gmp = record.get('gmp') or []
+    sample_indices = record.get('sample_indices')
+    if sample_indices is None:
+        # Single task runs only sample the highest fidelity
+        sample_indices = [0] * len(record.get('xy') or [])
+    sample_indices = np.asarray(sample_indices)
+    num_observations = len(sample_indices)
+    # The first global minimum prediction is made after the initial points,
+    # each later one after one more sample
+    observations = np.clip(num_observations - len(gmp) + 1 + iterations, 0,
+                           num_observations)
+    acq_times = np.asarray(record.get('acq_times') or [], dtype=float)
+    # Acquisition times of restarted ('_r') runs are stacked over the
+    # subruns, the last subrun holds the times of all observations
+    acq_times = acq_times[-num_observations:] \
+        if len(acq_times) >= num_observations else np.full(num_observations,
+                                                           np.nan)
+    highest_fidelity_samples = _take_cumulative(sample_indices == 0,
+                                                observations)
+    initpts = record.get('initpts')
+    if initpts is not None and not isinstance(initpts, (list, tuple)):
+        initpts = [initpts]
+    initpts = [] if initpts is None else list(initpts)
+    return {
+        'name': record.get('name') or '',
+        'dimension': record.get('dim') if record.get('dim') is not None
+        else -1,
+        'initpts': initpts[0] if len(initpts) > 0 else -1,
+        'secondary_initpts': initpts[1] if len(initpts) > 1 else -1,
+        'final_regret': float(np.atleast_2d(gmp)[-1, -2])
+        if len(gmp) > 0 else np.nan,
+        'iterations': iterations,
+        'totaltime': _to_float_array(
+            record.get('totaltime_to_gmp_convergence'), num_tolerances),
+        'highest_fidelity_iterations': _to_float_array(
+            record.get('highest_fidelity_iterations_to_gmp_convergence'),
+            num_tolerances),
+        'highest_fidelity_samples': highest_fidelity_samples,
+        'lower_fidelity_samples': observations - highest_fidelity_samples,
+        'cost': _take_cumulative(acq_times, observations)}
+
+
+def _take_cumulative(values, counts):
+    """Returns the sums of the first counts values, NaN for NaN counts."""
+    cumulative = np.concatenate([[0], np.cumsum(values, dtype=float)])
+    converged = ~np.isnan(counts)
+    sums = np.full(len(counts), np.nan)
+    sums[converged] = cumulative[counts[converged].astype(int)]
+    return sums
+
+
+def _to_float_array(values, length):
+    """Returns values (which may contain None) as float array, NaN if the
+    values are missing."""
+    if values is None:
+        return np.full(length, np.nan)
+    return np.array([np.nan if value is None else value
+                     for value in values], dtype=float)
+
+
+def _concatenate(blocks, num_tolerances):
+    """Concatenates the columns of several blocks of runs."""
+    columns = {}
+    for name in RUN_COLUMNS + TOLERANCE_COLUMNS:
+        values = [block[name] for block in blocks]
+        if name in STRING_COLUMNS:
+            values = [np.asarray(value, dtype=str) for value in values]
+            columns[name] = np.concatenate(values) if len(values) > 0 \
+                else np.zeros(0, dtype=str)
+        elif name in INTEGER_COLUMNS:
+            columns[name] = np.concatenate(
+                [np.asarray(value, dtype=np.int64) for value in values]) \
+                if len(values) > 0 else np.zeros(0, dtype=np.int64)
+        elif name in TOLERANCE_COLUMNS:
+            columns[name] = np.concatenate(
+                [np.asarray(value, dtype=float).reshape(-1, num_tolerances)
+                 for value in values]) if len(values) > 0 \
+                else np.zeros((0, num_tolerances))
+        else:
+            columns[name] = np.concatenate(
+                [np.asarray(value, dtype=float) for value in values]) \
+                if len(values) > 0 else np.zeros(0)
+    return columns
+
+
+def _read_summary(summary_path):
+    """Returns the summary saved in a file, or None if there is no summary
+    of the current version."""
+    try:
+        with np.load(summary_path, allow_pickle=False) as npz:
+            if int(npz['version']) != SUMMARY_VERSION:
+                return None
+            columns = {name: npz[name]
+                       for name in RUN_COLUMNS + TOLERANCE_COLUMNS}
+            hashes = dict(zip(npz['hashed_experiments'].tolist(),
+                              npz['hashes'].tolist()))
+            return RunSummary(columns, npz['tolerances'], hashes)
+    except (OSError, KeyError, ValueError):
+        return None
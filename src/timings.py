@@ -0,0 +1,145 @@
+import numpy as np
+
+
+def get_reset_indices(timings):
+    """Returns the indices at which a timer was restarted, i.e. where the
+    time decreases (e.g. the first time of each subrun of a restarted
+    run).
+
+    Parameters
+    ----------
+    timings : array_like
+        Times as written by the (restarted) timer.
+
+    Returns
+    -------
+    np.ndarray
+        Indices of the first time after each restart.
+    """
+    timings = np.asarray(timings, dtype=float)
+    return np.flatnonzero(timings[1:] < timings[:-1]) + 1
+
+
+def get_segment_offsets(segment_end_times):
+    """Returns the time offset of each segment of a restarted timer, which
+    is the sum of the end times of all preceding segments.
+
+    Parameters
+    ----------
+    segment_end_times : array_like
+        Last time of each segment (e.g. subrun), as written by the timer.
+
+    Returns
+    -------
+    np.ndarray
+        Offset of each segment, 0 for the first one.
+    """
+    segment_end_times = np.asarray(segment_end_times, dtype=float)
+    return np.concatenate([[0.], np.cumsum(segment_end_times[:-1])])
+
+
+class TimingCorrector:
+    """Makes the times of a restarted timer cumulative, e.g. the total
+    times of the subruns of a restarted run, which each start from 0.
+
+    At each restart (see get_reset_indices) the last time before the
+    restart, as written by the timer, is added to all following times, so
+    that each segment continues where the previous one ended. The times can
+    be given in chunks (down to single times, e.g. line by line while
+    merging boss.out files): the offset and the previous time are kept
+    between the chunks.
+
+    Examples
+    --------
+    >>> corrector = TimingCorrector()
+    >>> corrector.correct([1, 2, 3, 1, 2])
+    array([1., 2., 3., 4., 5.])
+    >>> corrector.correct([1, 2])
+    array([6., 7.])
+    """
+
+    def __init__(self):
+        self.offset = 0.
+        self.previous_timing = None
+
+    def correct(self, timings):
+        """Returns the cumulative times of the next chunk of times.
+
+        Parameters
+        ----------
+        timings : array_like
+            Next times as written by the timer.
+
+        Returns
+        -------
+        np.ndarray
+            Cumulative times.
+        """
+        timings = np.atleast_1d(np.asarray(timings, dtype=float))
+        if len(timings) == 0:
+            return timings.copy()
+        # The previous time is prepended, so that a restart at the start of
+        # the chunk is found as well
+        previous = timings[0] if self.previous_timing is None \
+            else self.previous_timing
+        chunk = np.concatenate([[previous], timings])
+        resets = get_reset_indices(chunk)
+        offsets = self.offset + get_segment_offsets(
+            np.append(chunk[resets - 1], 0.))
+        segments = np.searchsorted(resets, np.arange(1, len(chunk)),
+                                   side='right')
+        self.offset = offsets[-1]
+        self.previous_timing = timings[-1]
+        return timings + offsets[segments]
+
+
+def accumulate_acquisition_times(acq_times):
+    """Returns the time spent on all acquisitions up to (and including)
+    each acquisition.
+
+    Parameters
+    ----------
+    acq_times : array_like
+        Time of each acquisition.
+
+    Returns
+    -------
+    list
+        Cumulative acquisition times.
+    """
+    return np.cumsum(np.asarray(acq_times, dtype=float)).tolist()
+
+
+def add_init_data_cost(total_time, init_data_cost, begin, initpts):
+    """Adds the cost of initialization data taken from another run to the
+    total times.
+
+    The total time of the k-th initial point (k < initpts) after 'begin'
+    is increased by init_data_cost[k]. All later total times are increased
+    by the cost of all initial points, init_data_cost[initpts-1].
+
+    Parameters
+    ----------
+    total_time : array_like
+        Total time after each iteration.
+    init_data_cost : array_like
+        Cumulative cost of the initialization data, see
+        accumulate_acquisition_times.
+    begin : int
+        Index of the total time of the first initial point.
+    initpts : int
+        Number of initial points taken from the other run.
+
+    Returns
+    -------
+    np.ndarray
+        Total times including the cost of the initialization data.
+    """
+    total_time = np.array(total_time, dtype=float)
+    init_data_cost = np.asarray(init_data_cost, dtype=float)
+    end = begin + initpts
+    if end > len(total_time) or initpts > len(init_data_cost):
+        raise IndexError('Not enough total times or initialization costs')
+    total_time[begin:end] += init_data_cost[:initpts]
+    total_time[end:] += init_data_cost[initpts-1]
+    return total_time